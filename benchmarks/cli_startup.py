@@ -0,0 +1,63 @@
+"""
+Benchmark of CLI startup: wall time of `easy_sm <group> --help` for every command group, in a new
+interpreter each run like a user typing the command. Most of it is importing the commands and their
+dependencies (click, docker, the sagemaker SDK), which every command pays before doing anything.
+
+    python benchmarks/cli_startup.py --runs 10
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+_REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# '' is the top level `easy_sm --help`
+GROUPS = ['', 'init', 'build', 'push', 'local', 'cloud']
+
+# Runs of benchmark() by run.py, it already takes the median of several runs per group
+REPEATS = 1
+
+# Results compared with the baseline by run.py, and whether lower or higher is better
+METRICS = {'groups.{}.median_seconds'.format(group or 'easy_sm'): 'lower' for group in GROUPS}
+
+
+def _startup_seconds(group):
+    command = [sys.executable, '-c', 'from easy_sm.__main__ import cli; cli(prog_name="easy_sm")']
+    command += ([group] if group else []) + ['--help']
+    start = time.perf_counter()
+    subprocess.check_call(command, cwd=_REPO_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def benchmark(runs=7):
+    """
+    Startup time of every command group
+    :param runs: [int, default=7], runs per group, after one warm up run filling the OS file cache
+    :return: [dict], median and minimum seconds per group
+    """
+    groups = {}
+    for group in GROUPS:
+        _startup_seconds(group)
+        seconds = [_startup_seconds(group) for _ in range(runs)]
+        groups[group or 'easy_sm'] = {
+            'median_seconds': round(statistics.median(seconds), 3),
+            'min_seconds': round(min(seconds), 3),
+        }
+
+    return {'parameters': {'runs': runs}, 'groups': groups}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=7, help='runs per command group')
+    args = parser.parse_args()
+
+    print(json.dumps(benchmark(**vars(args)), indent=4))
+
+
+if __name__ == '__main__':
+    main()
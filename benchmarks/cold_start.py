@@ -0,0 +1,72 @@
+"""
+Benchmark of container cold start of a built image: seconds until serve answers /ping, until it is
+healthy and until train prints its first line, see easy_sm/bench/cold_start.py. Needs docker and an
+image built with `easy_sm build`, the benchmark is skipped without them.
+
+    python benchmarks/cold_start.py --image my-app:latest --test-dir my-app/easy_sm_base/local_test/test_dir
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), '..'))
+from easy_sm.bench import cold_start  # noqa: E402
+
+# Results compared with the baseline by run.py, and whether lower or higher is better
+METRICS = {
+    'serve_listening_seconds': 'lower',
+    'serve_healthy_seconds': 'lower',
+    'train_first_output_seconds': 'lower',
+}
+
+
+def _docker_available():
+    try:
+        return subprocess.call(['docker', 'info'], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL) == 0
+    except OSError:
+        return False
+
+
+def benchmark(image=None, test_dir=None, runs=3):
+    """
+    Median cold start times of an image
+    :param image: [optional[str]], image with tag, the benchmark is skipped without it
+    :param test_dir: [optional[str]], local test directory mounted at /opt/ml, defaults to an empty one
+    :param runs: [int, default=3], containers started for each measurement
+    :return: [dict], median seconds, or 'skipped' with the reason
+    """
+    if not image:
+        return {'skipped': 'no image given'}
+    if not _docker_available():
+        return {'skipped': 'docker is not available'}
+
+    empty_test_dir = None
+    if test_dir is None:
+        empty_test_dir = test_dir = tempfile.mkdtemp(prefix='easy_sm_cold_start_')
+        for directory in ['model', 'output', 'input/data/training']:
+            os.makedirs(os.path.join(test_dir, directory))
+    try:
+        result = cold_start.benchmark(image, os.path.abspath(test_dir), runs)
+    finally:
+        if empty_test_dir:
+            shutil.rmtree(empty_test_dir, ignore_errors=True)
+
+    return dict(result, parameters={'image': image, 'runs': runs})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--image', required=True, help='image with tag')
+    parser.add_argument('--test-dir', help='local test directory mounted at /opt/ml, defaults to an empty one')
+    parser.add_argument('--runs', type=int, default=3, help='containers started for each measurement')
+    args = parser.parse_args()
+
+    print(json.dumps(benchmark(**vars(args)), indent=4))
+
+
+if __name__ == '__main__':
+    main()
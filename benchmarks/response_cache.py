@@ -0,0 +1,122 @@
+"""
+Benchmark of the serving template's response cache under skewed (Zipf distributed) traffic.
+
+Replays requests drawn from a pool of distinct rows, where a few rows are requested far more
+often than the rest, through the same parse and predict path as prediction/serve with and
+without the cache, and reports latency percentiles and CPU time.
+
+    python benchmarks/response_cache.py --requests 5000 --rows-per-request 20 --zipf 1.1
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from io import StringIO
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), '..', 'easy_sm', 'template'))
+from easy_sm_base.prediction.response_cache import ResponseCache, predict_rows  # noqa: E402
+
+
+class _Model(object):
+    """Stand-in for a CPU bound model, a few dense layers"""
+    def __init__(self, width, depth=8, hidden=256):
+        rng = np.random.default_rng(0)
+        self.layers = [rng.standard_normal((width if i == 0 else hidden, hidden)) for i in range(depth)]
+
+    def predict(self, X):
+        h = X.to_numpy(dtype=float)
+        for layer in self.layers:
+            h = np.tanh(h @ layer)
+        return h.sum(axis=1)
+
+
+def _predict_csv(csv, model):
+    return model.predict(pd.read_csv(StringIO(csv), header=None))
+
+
+def _requests(n_requests, rows_per_request, n_distinct, width, zipf, seed=0):
+    rng = random.Random(seed)
+    pool = [','.join('{:.3f}'.format(rng.uniform(-1, 1)) for _ in range(width)) for _ in range(n_distinct)]
+    weights = [1 / (rank ** zipf) for rank in range(1, n_distinct + 1)]
+    return [rng.choices(pool, weights=weights, k=rows_per_request) for _ in range(n_requests)]
+
+
+def _run(requests, model, cache):
+    latencies = []
+    cpu_start = time.process_time()
+    for rows in requests:
+        start = time.perf_counter()
+        if cache is None:
+            _predict_csv('\n'.join(rows), model)
+        else:
+            predict_rows(cache, rows, 'v1', lambda missing: _predict_csv('\n'.join(missing), model))
+        latencies.append((time.perf_counter() - start) * 1000)
+    cpu_seconds = time.process_time() - cpu_start
+
+    return {
+        'p50_ms': round(float(np.percentile(latencies, 50)), 3),
+        'p90_ms': round(float(np.percentile(latencies, 90)), 3),
+        'p99_ms': round(float(np.percentile(latencies, 99)), 3),
+        'mean_ms': round(float(np.mean(latencies)), 3),
+        'cpu_seconds': round(cpu_seconds, 3),
+    }
+
+
+# Results compared with the baseline by run.py, and whether lower or higher is better
+METRICS = {
+    'uncached.p50_ms': 'lower',
+    'cached.p50_ms': 'lower',
+    'p50_speedup': 'higher',
+}
+
+
+def benchmark(requests=5000, rows_per_request=20, distinct_rows=5000, width=20, zipf=1.1, cache_size=100000):
+    """
+    Latency of the same requests with and without the response cache
+    :param requests: [int, default=5000], number of requests
+    :param rows_per_request: [int, default=20], rows in every request
+    :param distinct_rows: [int, default=5000], rows requests are drawn from
+    :param width: [int, default=20], number of features per row
+    :param zipf: [float, default=1.1], skew of the row distribution
+    :param cache_size: [int, default=100000], maximum cache entries
+    :return: [dict], latency percentiles and cpu time with and without the cache
+    """
+    parameters = {'requests': requests, 'rows_per_request': rows_per_request, 'distinct_rows': distinct_rows,
+                  'width': width, 'zipf': zipf, 'cache_size': cache_size}
+    replayed = _requests(requests, rows_per_request, distinct_rows, width, zipf)
+    model = _Model(width)
+
+    uncached = _run(replayed, model, None)
+    cache = ResponseCache(max_entries=cache_size)
+    cached = _run(replayed, model, cache)
+
+    return {
+        'parameters': parameters,
+        'uncached': uncached,
+        'cached': cached,
+        'cache': cache.stats(),
+        'p50_speedup': round(uncached['p50_ms'] / cached['p50_ms'], 2),
+        'cpu_saving': round(1 - cached['cpu_seconds'] / uncached['cpu_seconds'], 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--rows-per-request', type=int, default=20)
+    parser.add_argument('--distinct-rows', type=int, default=5000)
+    parser.add_argument('--width', type=int, default=20, help='number of features per row')
+    parser.add_argument('--zipf', type=float, default=1.1, help='skew of the row distribution')
+    parser.add_argument('--cache-size', type=int, default=100000)
+    args = parser.parse_args()
+
+    print(json.dumps(benchmark(**vars(args)), indent=4))
+
+
+if __name__ == '__main__':
+    main()
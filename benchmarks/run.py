@@ -0,0 +1,158 @@
+"""
+Run the benchmarks and compare their results with the JSON baselines in benchmarks/baselines.
+
+Every benchmark module has a benchmark() function returning its results and METRICS, the results
+compared with the baseline. Benchmarks run REPEATS times (a module constant, or --repeats) and every
+number of the results is the median of the repeats, so one slow run on a busy machine doesn't show as
+a regression. A metric regresses when it is worse than the baseline by more than the tolerance.
+Baselines are machine dependent, save them again on the same machine after a change that is meant to
+change performance, the diff of the baseline files shows the change in review.
+
+    python benchmarks/run.py                        # run all and compare with the baselines
+    python benchmarks/run.py serve upload_data      # run some
+    python benchmarks/run.py --save                 # replace the baselines with the results
+    python benchmarks/run.py cold_start --image my-app:latest
+"""
+import os
+import sys
+import json
+import argparse
+import platform
+import statistics
+
+sys.path.insert(1, os.path.dirname(os.path.abspath(__file__)))
+import cli_startup  # noqa: E402
+import upload_data  # noqa: E402
+import serve  # noqa: E402
+import response_cache  # noqa: E402
+import cold_start  # noqa: E402
+
+BENCHMARKS = {
+    'cli_startup': cli_startup,
+    'upload_data': upload_data,
+    'serve': serve,
+    'response_cache': response_cache,
+    'cold_start': cold_start,
+}
+
+DEFAULT_REPEATS = 5
+
+DEFAULT_BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+
+
+def _machine():
+    return {
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version(),
+    }
+
+
+def median_results(results):
+    """
+    Median of every number of the results of repeated runs, other values are taken from the first run
+    :param results: [list[dict]], results of the runs, with the same keys
+    :return: [dict], results with medians
+    """
+    first = results[0]
+    if isinstance(first, dict):
+        return {key: median_results([r[key] for r in results]) for key in first}
+    if all(isinstance(r, (int, float)) and not isinstance(r, bool) for r in results):
+        median = statistics.median(results)
+        return round(median, 3) if isinstance(median, float) else median
+    return first
+
+
+def _value(result, path):
+    for key in path.split('.'):
+        if not isinstance(result, dict) or key not in result:
+            return None
+        result = result[key]
+    return result
+
+
+def compare(result, baseline, metrics, tolerance):
+    """
+    Compare results with a baseline
+    :param result: [dict], results of a benchmark
+    :param baseline: [dict], baseline results of the benchmark
+    :param metrics: [dict], dotted path of a result: 'lower' or 'higher', which is better
+    :param tolerance: [float], relative change allowed before a metric regresses
+    :return: [list[dict]], metric, baseline, result, relative change and whether it regressed
+    """
+    comparison = []
+    for metric, better in metrics.items():
+        base, value = _value(baseline, metric), _value(result, metric)
+        if not base or value is None:
+            continue
+        change = (value - base) / base
+        regressed = change > tolerance if better == 'lower' else change < -tolerance
+        comparison.append({'metric': metric, 'baseline': base, 'result': value, 'change': round(change, 3),
+                           'regressed': regressed})
+    return comparison
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('benchmarks', nargs='*', metavar='BENCHMARK',
+                        help='benchmarks to run, all by default: {}'.format(', '.join(sorted(BENCHMARKS))))
+    parser.add_argument('--baseline-dir', default=DEFAULT_BASELINE_DIR)
+    parser.add_argument('--save', action='store_true', help='replace the baselines with the results')
+    # Medians of the repeats vary by a few percent between runs on the same machine
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help='relative change of a metric allowed before it regresses')
+    parser.add_argument('--repeats', type=int, default=None,
+                        help='runs of every benchmark whose median is compared, defaults to the REPEATS of the '
+                             'benchmark or {}'.format(DEFAULT_REPEATS))
+    parser.add_argument('--image', help='image with tag for the cold_start benchmark, skipped without it')
+    args = parser.parse_args()
+    unknown = set(args.benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error("unknown benchmarks: {}".format(', '.join(sorted(unknown))))
+
+    regressions = 0
+    for name in args.benchmarks or list(BENCHMARKS):
+        module = BENCHMARKS[name]
+        repeats = args.repeats or getattr(module, 'REPEATS', DEFAULT_REPEATS)
+        results = []
+        for repeat in range(repeats):
+            print("Running {} ({}/{})".format(name, repeat + 1, repeats), flush=True)
+            results.append(module.benchmark(image=args.image) if name == 'cold_start' else module.benchmark())
+            if 'skipped' in results[-1]:
+                break
+        if 'skipped' in results[-1]:
+            print("Skipped {}: {}".format(name, results[-1]['skipped']))
+            continue
+        result = median_results(results)
+        result['repeats'] = repeats
+        result['machine'] = _machine()
+
+        baseline_path = os.path.join(args.baseline_dir, name + '.json')
+        if os.path.isfile(baseline_path):
+            with open(baseline_path) as f:
+                baseline = json.load(f)
+            if baseline.get('machine') != result['machine']:
+                print("The baseline of {} was saved on another machine, changes may not be regressions".format(name))
+            for row in compare(result, baseline, module.METRICS, args.tolerance):
+                regressions += row['regressed']
+                print("{:<50} {:>12} {:>12} {:>+8.1%}{}".format(
+                    row['metric'], row['baseline'], row['result'], row['change'],
+                    '  REGRESSED' if row['regressed'] else ''))
+        else:
+            print("No baseline for {}".format(name))
+
+        if args.save:
+            os.makedirs(args.baseline_dir, exist_ok=True)
+            with open(baseline_path, 'w') as f:
+                json.dump(result, f, indent=4)
+                f.write('\n')
+            print("Saved baseline {}".format(baseline_path))
+
+    if regressions and not args.save:
+        print("{} metrics regressed by more than {:.0%}".format(regressions, args.tolerance))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
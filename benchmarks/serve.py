@@ -0,0 +1,123 @@
+"""
+Benchmark of the serving template, prediction/serve, for text/csv requests of varying width.
+
+The app is served in process by werkzeug with a model that costs next to nothing, so the numbers are
+the overhead of serve itself (request handling, CSV parsing and encoding) that every model pays on top
+of predicting. Requests are sent with the closed loop of `easy_sm local load-test`.
+
+    python benchmarks/serve.py --width 10 --width 1000 --rows-per-request 10 --concurrency 1 --concurrency 8
+"""
+import os
+import sys
+import json
+import logging
+import argparse
+import threading
+import importlib.machinery
+import importlib.util
+
+import numpy as np
+import pandas as pd
+from werkzeug.serving import make_server
+
+_TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), '..', 'easy_sm', 'template')
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(1, _TEMPLATE_DIR)
+from easy_sm.bench import load_test  # noqa: E402
+
+DEFAULT_WIDTHS = [10, 100, 1000]
+DEFAULT_CONCURRENCY = [1, 8]
+
+# Runs of benchmark() by run.py, each runs a load test stage per width and concurrency
+REPEATS = 3
+
+# Results compared with the baseline by run.py, and whether lower or higher is better
+METRICS = dict(
+    [('widths.{}.concurrency_{}.throughput_rps'.format(w, c), 'higher')
+     for w in DEFAULT_WIDTHS for c in DEFAULT_CONCURRENCY] +
+    # Latency under concurrency follows from throughput, it is only compared without
+    [('widths.{}.concurrency_1.p50_ms'.format(w), 'lower') for w in DEFAULT_WIDTHS]
+)
+
+
+class _Model(object):
+    """Linear model, predicting is negligible next to serving"""
+    def __init__(self, width):
+        self.weights = np.random.default_rng(0).standard_normal(width)
+
+    def predict(self, X):
+        return X.to_numpy(dtype=float) @ self.weights
+
+
+def _load_serve():
+    """Import prediction/serve, a script without .py suffix, as a module"""
+    path = os.path.join(_TEMPLATE_DIR, 'easy_sm_base', 'prediction', 'serve')
+    loader = importlib.machinery.SourceFileLoader('easy_sm_serve', path)
+    spec = importlib.util.spec_from_loader(loader.name, loader)
+    serve = importlib.util.module_from_spec(spec)
+    loader.exec_module(serve)
+    serve._model_loaded.wait(10)
+    return serve
+
+
+def _payloads(width, rows_per_request, count=100):
+    rng = np.random.default_rng(0)
+    return [
+        pd.DataFrame(rng.uniform(-1, 1, (rows_per_request, width)).round(4)).to_csv(header=False, index=False)
+        .encode('utf-8')
+        for _ in range(count)
+    ]
+
+
+def benchmark(widths=None, rows_per_request=10, concurrency=None, stage_seconds=5):
+    """
+    Throughput and latency of serve per request width and concurrency
+    :param widths: [optional[list[int]]], features per row, defaults to DEFAULT_WIDTHS
+    :param rows_per_request: [int, default=10], rows in every request
+    :param concurrency: [optional[list[int]]], concurrent clients, defaults to DEFAULT_CONCURRENCY
+    :param stage_seconds: [float, default=5], duration of each load test stage
+    :return: [dict], load test summary per width and concurrency
+    """
+    widths = widths or DEFAULT_WIDTHS
+    concurrency = concurrency or DEFAULT_CONCURRENCY
+    serve = _load_serve()
+    # Request logs would be most of the work
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, serve.app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    send = load_test.http_sender('http://127.0.0.1:{}/invocations'.format(server.server_port))
+
+    results = {}
+    try:
+        for width in widths:
+            serve.model = _Model(width)
+            stages = load_test.run(send, _payloads(width, rows_per_request), concurrency, mode='closed',
+                                   stage_seconds=stage_seconds)
+            results[str(width)] = {'concurrency_{}'.format(stage['concurrency']): stage for stage in stages}
+    finally:
+        server.shutdown()
+        thread.join()
+
+    return {
+        'parameters': {'widths': widths, 'rows_per_request': rows_per_request, 'concurrency': concurrency,
+                       'stage_seconds': stage_seconds},
+        'widths': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--width', type=int, action='append', dest='widths',
+                        help='features per row, can be given several times')
+    parser.add_argument('--rows-per-request', type=int, default=10)
+    parser.add_argument('--concurrency', type=int, action='append',
+                        help='concurrent clients, can be given several times')
+    parser.add_argument('--stage-seconds', type=float, default=5, help='duration of each load test stage')
+    args = parser.parse_args()
+
+    print(json.dumps(benchmark(**vars(args)), indent=4))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Benchmark of SageMakerClient.upload_data against a local S3 stand-in (moto server), for mixes of many
+small files and few large ones. Absolute numbers say little about real S3, whose latency is higher,
+but changes in them show changes in per file overhead and transfer throughput of easy_sm's side.
+
+    python benchmarks/upload_data.py --mix small:1000:4 --mix large:4:16384
+"""
+import os
+import sys
+import json
+import time
+import logging
+import shutil
+import argparse
+import tempfile
+import contextlib
+
+import boto3
+from moto.server import ThreadedMotoServer
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), '..'))
+from easy_sm.sagemaker.sagemaker import SageMakerClient  # noqa: E402
+
+_BUCKET = 'easy-sm-benchmark'
+_ROLE = 'arn:aws:iam::123456789012:role/easy-sm-benchmark'
+
+# name: (number of files, KB per file)
+DEFAULT_MIXES = {
+    'small_files': (1000, 4),
+    'medium_files': (400, 256),
+    'large_files': (8, 16 * 1024),
+}
+
+# Results compared with the baseline by run.py, and whether lower or higher is better
+METRICS = {'mixes.{}.seconds'.format(name): 'lower' for name in DEFAULT_MIXES}
+
+
+@contextlib.contextmanager
+def s3_stand_in():
+    """
+    Run a moto server and point AWS clients created meanwhile to it, with fake credentials
+    :return: [str], endpoint url of the server
+    """
+    # Request logs of the server
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = ThreadedMotoServer(ip_address='127.0.0.1', port=0, verbose=False)
+    server.start()
+    endpoint_url = 'http://{}:{}'.format(*server.get_host_and_port())
+    environment = {
+        'AWS_ENDPOINT_URL': endpoint_url,
+        'AWS_ACCESS_KEY_ID': 'testing',
+        'AWS_SECRET_ACCESS_KEY': 'testing',
+        'AWS_SESSION_TOKEN': 'testing',
+        'AWS_DEFAULT_REGION': 'us-east-1',
+    }
+    previous = {name: os.environ.get(name) for name in environment}
+    os.environ.update(environment)
+    try:
+        yield endpoint_url
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        server.stop()
+
+
+def _write_files(directory, count, size_kb):
+    os.makedirs(directory)
+    content = os.urandom(size_kb * 1024)
+    for i in range(count):
+        with open(os.path.join(directory, 'part-{:05d}.csv'.format(i)), 'wb') as f:
+            f.write(content)
+
+
+def benchmark(mixes=None):
+    """
+    Upload time of every mix of files
+    :param mixes: [optional[dict]], name: (number of files, KB per file), defaults to DEFAULT_MIXES
+    :return: [dict], seconds, files and MB per second per mix
+    """
+    mixes = mixes or DEFAULT_MIXES
+    results = {}
+    work_dir = tempfile.mkdtemp(prefix='easy_sm_upload_benchmark_')
+    try:
+        with s3_stand_in():
+            boto3.client('s3').create_bucket(Bucket=_BUCKET)
+            client = SageMakerClient(None, 'us-east-1', aws_role=_ROLE)
+            for name, (count, size_kb) in mixes.items():
+                input_dir = os.path.join(work_dir, name)
+                _write_files(input_dir, count, size_kb)
+                start = time.perf_counter()
+                client.upload_data(input_dir, 's3://{}/{}'.format(_BUCKET, name))
+                seconds = time.perf_counter() - start
+                results[name] = {
+                    'files': count,
+                    'mb': round(count * size_kb / 1024, 1),
+                    'seconds': round(seconds, 3),
+                    'files_per_second': round(count / seconds, 1),
+                    'mb_per_second': round(count * size_kb / 1024 / seconds, 1),
+                }
+                shutil.rmtree(input_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {'parameters': {'mixes': mixes}, 'mixes': results}
+
+
+def _mix(value):
+    name, count, size_kb = value.split(':')
+    return name, (int(count), int(size_kb))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mix', type=_mix, action='append', dest='mixes', metavar='NAME:FILES:KB_PER_FILE',
+                        help='mix of files to upload, can be given several times')
+    args = parser.parse_args()
+
+    print(json.dumps(benchmark(dict(args.mixes) if args.mixes else None), indent=4))
+
+
+if __name__ == '__main__':
+    main()
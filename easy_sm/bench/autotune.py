@@ -0,0 +1,149 @@
+"""
+Find the serverless memory size to deploy a model with by running the serving container locally
+under each memory size serverless endpoints support.
+"""
+import os
+import time
+import subprocess
+import urllib.request
+
+from easy_sm.bench import load_test
+from easy_sm.sagemaker.instance_types import serverless_price_per_second
+
+# Serverless endpoints get compute proportional to their memory size without AWS publishing the ratio, this
+# is the one of Lambda, on which they run. Measured latency is an approximation of the endpoint's
+MB_PER_VCPU = 1769
+
+
+def cpus(memory_size_in_mb):
+    """
+    CPUs of a container standing in for a serverless endpoint, at most those of this machine
+    :param memory_size_in_mb: [int], memory size of the endpoint
+    :return: [float], value of docker run --cpus
+    """
+    return round(min(memory_size_in_mb / MB_PER_VCPU, float(os.cpu_count() or 1)), 2)
+
+
+def _wait_until_healthy(process, url, timeout):
+    """Poll /ping until the model is loaded, return False if the container exits or the timeout passes"""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            return False
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return True
+        except OSError:
+            pass
+        time.sleep(0.1)
+
+    return False
+
+
+def measure(local_deploy_script_path, test_path, docker_tag, image_name, memory_size_in_mb, payloads,
+            stage_seconds=20, startup_timeout=300):
+    """
+    Serve the model locally with the memory and CPU of a serverless memory size and measure cold start,
+    latency and peak memory
+    :param local_deploy_script_path: [str], path to deploy_local.sh
+    :param test_path: [str], absolute path to local test directory mounted at /opt/ml
+    :param docker_tag: [str], the Docker tag for the image
+    :param image_name: [str], the name of the Docker image
+    :param memory_size_in_mb: [int], memory limit of the container
+    :param payloads: [list[bytes]], representative text/csv payloads
+    :param stage_seconds: [float, default=20], duration of the steady state latency measurement
+    :param startup_timeout: [float, default=300], seconds to wait for the model to load
+    :return: [dict], measurements, with 'failure' set if the container did not start or ran out of memory
+    """
+    import docker
+
+    container_name = "{}-autotune-{}-{}".format(image_name, memory_size_in_mb, os.getpid())
+    start = time.perf_counter()
+    serving = subprocess.Popen(
+        [
+            local_deploy_script_path,
+            test_path,
+            docker_tag,
+            image_name,
+            "--name", container_name,
+            "--memory", "{}m".format(memory_size_in_mb),
+            "--memory-swap", "{}m".format(memory_size_in_mb),  # No swap, exceeding the limit is an OOM kill
+            "--cpus", str(cpus(memory_size_in_mb)),
+        ],
+        # Without a terminal on stdin deploy_local.sh doesn't run the container with -it, which would take over
+        # the user's terminal and Ctrl-C
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL
+    )
+    result = {'memory_size_in_mb': memory_size_in_mb, 'cpus': cpus(memory_size_in_mb), 'failure': None}
+    try:
+        if not _wait_until_healthy(serving, 'http://localhost:8080/ping', startup_timeout):
+            result['failure'] = 'container did not become healthy within {} seconds'.format(startup_timeout)
+            return result
+        result['cold_start_seconds'] = round(time.perf_counter() - start, 2)
+
+        container = docker.from_env().containers.get(container_name)
+        send = load_test.http_sender('http://localhost:8080/invocations')
+        first_request = time.perf_counter()
+        try:
+            send(payloads[0])
+        except Exception as e:
+            result['failure'] = 'first request failed: {}'.format(e)
+            return result
+        result['first_request_ms'] = round((time.perf_counter() - first_request) * 1000, 2)
+
+        # Serverless endpoints process one request at a time per instance
+        with load_test.ContainerMemorySampler(container) as sampler:
+            stage, = load_test.run(send, payloads, [1], mode='closed', stage_seconds=stage_seconds)
+        result.update({k: stage[k] for k in ('throughput_rps', 'error_rate', 'mean_ms', 'p50_ms', 'p99_ms')})
+        result['peak_memory_mb'] = sampler.peak_mb
+
+        # The container is removed once it exits, an exit while serving means it was killed for exceeding memory
+        if serving.poll() is not None:
+            result['failure'] = 'out of memory'
+        elif stage['mean_ms'] is not None:
+            result['usd_per_million_requests'] = round(
+                serverless_price_per_second(memory_size_in_mb) * stage['mean_ms'] / 1000 * 10 ** 6, 4)
+    finally:
+        subprocess.call(["docker", "stop", container_name], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        serving.wait()
+
+    return result
+
+
+def autotune(local_deploy_script_path, test_path, docker_tag, image_name, payloads, latency_slo_ms=None,
+             stage_seconds=20, max_error_rate=0.01, headroom=0.9):
+    """
+    Measure every serverless memory size and pick the cheapest one meeting the latency SLO
+    :param local_deploy_script_path: [str], path to deploy_local.sh
+    :param test_path: [str], absolute path to local test directory mounted at /opt/ml
+    :param docker_tag: [str], the Docker tag for the image
+    :param image_name: [str], the name of the Docker image
+    :param payloads: [list[bytes]], representative text/csv payloads
+    :param latency_slo_ms: [optional[float]], p99 latency that must not be exceeded
+    :param stage_seconds: [float, default=20], duration of the latency measurement per memory size
+    :param max_error_rate: [float, default=0.01], highest acceptable error rate
+    :param headroom: [float, default=0.9], fraction of the memory size peak memory may reach
+    :return: [tuple], (recommended memory size or None, measurements of every memory size)
+    """
+    measurements = []
+    for memory_size_in_mb in load_test.SERVERLESS_MEMORY_SIZES_MB:
+        print("Measuring {} MB...".format(memory_size_in_mb), flush=True)
+        result = measure(local_deploy_script_path, test_path, docker_tag, image_name, memory_size_in_mb,
+                         payloads, stage_seconds=stage_seconds)
+        if result['failure'] is None:
+            if result['error_rate'] > max_error_rate:
+                result['failure'] = 'error rate {}'.format(result['error_rate'])
+            elif result['peak_memory_mb'] and result['peak_memory_mb'] > memory_size_in_mb * headroom:
+                result['failure'] = 'peak memory {} MB leaves less than {:.0%} headroom'.format(
+                    result['peak_memory_mb'], 1 - headroom)
+            elif latency_slo_ms is not None and result['p99_ms'] > latency_slo_ms:
+                result['failure'] = 'p99 {} ms exceeds the SLO'.format(result['p99_ms'])
+        print("{} MB: {}".format(memory_size_in_mb, result), flush=True)
+        measurements.append(result)
+
+    # Billing is per GB-second, so a larger size that is proportionally faster can cost less
+    candidates = [m for m in measurements if m['failure'] is None]
+    best = min(candidates, key=lambda m: (m['usd_per_million_requests'], m['memory_size_in_mb']), default=None)
+    return (best['memory_size_in_mb'] if best else None), measurements
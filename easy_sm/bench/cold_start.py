@@ -0,0 +1,104 @@
+"""
+Cold start benchmark of a built image: how long a new container takes until it serves (first
+successful /ping) and until training starts (first line of output from train).
+"""
+import os
+import time
+import socket
+import statistics
+import subprocess
+import urllib.error
+import urllib.request
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('', 0))
+        return s.getsockname()[1]
+
+
+def serve_cold_start(image, test_path, timeout=300):
+    """
+    Seconds from docker run until /ping first succeeds
+    :param image: [str], image with tag
+    :param test_path: [str], absolute path to local test directory mounted at /opt/ml
+    :param timeout: [float, default=300], seconds to wait for the model to load
+    :return: [dict], 'listening_seconds' until /ping first answered, 'healthy_seconds' until it returned 200
+    """
+    port = _free_port()
+    container_name = "easy-sm-cold-start-{}".format(os.getpid())
+    start = time.perf_counter()
+    subprocess.check_call(
+        ["docker", "run", "--detach", "--rm", "--name", container_name, "-v", "{}:/opt/ml".format(test_path),
+         "-p", "{}:8080".format(port), image, "serve"],
+        stdout=subprocess.DEVNULL
+    )
+    result = {'listening_seconds': None, 'healthy_seconds': None}
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen('http://localhost:{}/ping'.format(port), timeout=1) as response:
+                    status = response.status
+            except urllib.error.HTTPError as e:
+                status = e.code
+            except OSError:
+                status = None
+            if status is not None and result['listening_seconds'] is None:
+                result['listening_seconds'] = round(time.perf_counter() - start, 3)
+            if status == 200:
+                result['healthy_seconds'] = round(time.perf_counter() - start, 3)
+                break
+            if status == 500:
+                # The model failed to load, e.g. there is no model in local_test/test_dir/model
+                break
+            time.sleep(0.02)
+    finally:
+        subprocess.call(["docker", "kill", container_name], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    return result
+
+
+def train_cold_start(image, test_path):
+    """
+    Seconds from docker run until train prints its first line, training is stopped after that
+    :param image: [str], image with tag
+    :param test_path: [str], absolute path to local test directory mounted at /opt/ml
+    :return: [optional[float]], seconds, None if train printed nothing
+    """
+    container_name = "easy-sm-cold-start-{}".format(os.getpid())
+    start = time.perf_counter()
+    training = subprocess.Popen(
+        ["docker", "run", "--rm", "--name", container_name, "-v", "{}:/opt/ml".format(test_path), image, "train"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL
+    )
+    try:
+        first_line = training.stdout.readline()
+        seconds = round(time.perf_counter() - start, 3)
+        return seconds if first_line else None
+    finally:
+        subprocess.call(["docker", "kill", container_name], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        training.wait()
+
+
+def benchmark(image, test_path, runs=3):
+    """
+    Median cold start times over several runs
+    :param image: [str], image with tag
+    :param test_path: [str], absolute path to local test directory mounted at /opt/ml
+    :param runs: [int, default=3], number of containers started for each measurement
+    :return: [dict], median seconds until serving, until healthy and until training starts
+    """
+    serve = [serve_cold_start(image, test_path) for _ in range(runs)]
+    train = [train_cold_start(image, test_path) for _ in range(runs)]
+
+    def median(values):
+        values = [v for v in values if v is not None]
+        return round(statistics.median(values), 3) if values else None
+
+    return {
+        'runs': runs,
+        'serve_listening_seconds': median([r['listening_seconds'] for r in serve]),
+        'serve_healthy_seconds': median([r['healthy_seconds'] for r in serve]),
+        'train_first_output_seconds': median(train),
+    }
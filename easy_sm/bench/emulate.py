@@ -0,0 +1,166 @@
+"""
+Emulation of SageMaker instance types in local containers: the container is limited to the vCPUs and
+memory of the instance type, its peak usage is sampled with docker stats and the cheapest instance type
+the job would have fit on is recommended.
+"""
+import math
+import threading
+
+from easy_sm.sagemaker.instance_types import INSTANCE_TYPES, price_per_hour
+
+# Instance families with accelerators, only recommended when one of them is emulated
+_GPU_FAMILIES = ('ml.g4dn.', 'ml.g5.', 'ml.p3.')
+
+
+def docker_options(instance_type, container_name):
+    """
+    docker run options limiting a container to the resources of an instance type
+    :param instance_type: [str], ec2 instance type e.g. ml.m5.large
+    :param container_name: [str], name given to the container, to sample its stats
+    :return: [list[str]], docker run options
+    """
+    if instance_type not in INSTANCE_TYPES:
+        raise ValueError("Unknown instance type {}, known types are: {}".format(
+            instance_type, ', '.join(sorted(INSTANCE_TYPES))))
+
+    resources = INSTANCE_TYPES[instance_type]
+    memory_mb = int(resources['memory_gib'] * 1024)
+    return [
+        "--name", container_name,
+        "--cpus", str(resources['vcpu']),
+        "--memory", "{}m".format(memory_mb),
+        # No swap, instances don't have any
+        "--memory-swap", "{}m".format(memory_mb),
+        # /dev/shm is half of the memory on instances, docker defaults to 64 MB which breaks e.g. torch data loaders
+        "--shm-size", "{}m".format(memory_mb // 2),
+    ]
+
+
+class ContainerStatsSampler(object):
+    """Samples memory and CPU usage of a container with docker stats, from when it starts until it exits"""
+    def __init__(self, container_name):
+        """
+        :param container_name: [str], name of the container, it may not be started yet
+        """
+        self.container_name = container_name
+        self.peak_bytes = 0
+        self.peak_cpus = 0.0
+        self.cpu_samples = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _container(self, client):
+        import docker
+        while not self._stop.is_set():
+            try:
+                return client.containers.get(self.container_name)
+            except docker.errors.NotFound:
+                self._stop.wait(0.1)
+        return None
+
+    def _sample(self):
+        import docker
+        try:
+            client = docker.from_env()
+            container = self._container(client)
+            if container is None:
+                return
+            # Streamed stats arrive about once a second, with the previous cpu counters to compute usage from
+            for stats in container.stats(stream=True, decode=True):
+                if self._stop.is_set():
+                    return
+                self._record(stats)
+        except docker.errors.DockerException:
+            return
+
+    def _record(self, stats):
+        memory_stats = stats.get('memory_stats', {})
+        # Page cache can be reclaimed, docker stats leaves it out of usage the same way
+        memory_detail = memory_stats.get('stats', {})
+        cache = memory_detail.get('inactive_file', memory_detail.get('total_inactive_file', 0))
+        self.peak_bytes = max(self.peak_bytes, memory_stats.get('usage', 0) - cache)
+
+        cpu, precpu = stats.get('cpu_stats', {}), stats.get('precpu_stats', {})
+        cpu_delta = cpu.get('cpu_usage', {}).get('total_usage', 0) - precpu.get('cpu_usage', {}).get('total_usage', 0)
+        system_delta = cpu.get('system_cpu_usage', 0) - precpu.get('system_cpu_usage', 0)
+        if cpu_delta > 0 and system_delta > 0:
+            cpus = cpu_delta / system_delta * cpu.get('online_cpus', 1)
+            self.cpu_samples.append(cpus)
+            self.peak_cpus = max(self.peak_cpus, cpus)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._stop.set()
+        self._thread.join(timeout=5)
+
+    @property
+    def peak_mb(self):
+        return round(self.peak_bytes / 2 ** 20, 1) if self.peak_bytes else None
+
+    @property
+    def mean_cpus(self):
+        return round(sum(self.cpu_samples) / len(self.cpu_samples), 2) if self.cpu_samples else None
+
+
+def recommend(peak_memory_mb, peak_cpus, emulated_instance_type, headroom=1.2):
+    """
+    Cheapest instance type with enough memory and vCPUs for the measured peak usage
+    :param peak_memory_mb: [float], peak memory used
+    :param peak_cpus: [float], peak number of cpus used
+    :param emulated_instance_type: [str], instance type the job ran on, GPU types are only considered if it is one
+    :param headroom: [float, default=1.2], factor applied to the peak memory
+    :return: [optional[str]], instance type, None if no known instance type fits
+    """
+    gpu = emulated_instance_type.startswith(_GPU_FAMILIES)
+    # The peak is rounded up since a job using part of a cpu still needs a whole vCPU
+    cpus = max(1, math.ceil(round(peak_cpus, 1)))
+    candidates = [
+        instance_type for instance_type, resources in INSTANCE_TYPES.items()
+        if instance_type.startswith(_GPU_FAMILIES) == gpu
+        and resources['memory_gib'] * 1024 >= peak_memory_mb * headroom
+        and resources['vcpu'] >= cpus
+        and price_per_hour(instance_type) is not None
+    ]
+    return min(candidates, key=price_per_hour) if candidates else None
+
+
+def report(instance_type, samplers, return_codes):
+    """
+    Print peak usage of emulated containers and the recommended instance type
+    :param instance_type: [str], emulated instance type
+    :param samplers: [list[ContainerStatsSampler]], one per container (host)
+    :param return_codes: [list[int]], exit codes of the containers
+    :return: [optional[str]], recommended instance type, None if it can't be recommended
+    """
+    resources = INSTANCE_TYPES[instance_type]
+    peak_mb = max((s.peak_mb for s in samplers if s.peak_mb is not None), default=None)
+    peak_cpus = max(s.peak_cpus for s in samplers)
+    mean_cpus = [s.mean_cpus for s in samplers if s.mean_cpus is not None]
+
+    print("\nEmulated {} ({} vCPU, {} GiB):".format(instance_type, resources['vcpu'], resources['memory_gib']))
+    if peak_mb is None:
+        print("  No docker stats were sampled, the container may have exited too quickly")
+        return None
+    print("  Peak memory: {} MB ({:.0f}% of the instance)".format(
+        peak_mb, 100 * peak_mb / (resources['memory_gib'] * 1024)))
+    print("  CPU: peak {:.2f}, mean {} of {} vCPUs".format(
+        peak_cpus, round(sum(mean_cpus) / len(mean_cpus), 2) if mean_cpus else None, resources['vcpu']))
+
+    # 137 is SIGKILL, which the kernel sends when the memory limit is reached
+    if 137 in return_codes:
+        print("  The job was killed, most likely for running out of memory. Try a larger instance type")
+        return None
+
+    recommendation = recommend(peak_mb, peak_cpus, instance_type)
+    if recommendation is None:
+        print("  No known instance type fits the measured usage")
+        return None
+    print("  Cheapest instance type that fits: {} ({} USD/hour), pass it as --ec2-type to the cloud command".format(
+        recommendation, price_per_hour(recommendation)))
+    if peak_cpus >= 0.9 * resources['vcpu']:
+        print("  The job used all vCPUs of {} and may run faster on an instance type with more".format(instance_type))
+
+    return recommendation
@@ -0,0 +1,274 @@
+import math
+import time
+import json
+import asyncio
+import threading
+import http.client
+from io import StringIO
+from urllib.parse import urlparse
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+# Memory sizes serverless endpoints can be configured with
+SERVERLESS_MEMORY_SIZES_MB = [1024, 2048, 3072, 4096, 5120, 6144]
+SERVERLESS_MAX_CONCURRENCY = 200
+
+
+def load_payloads(path, rows_per_request=1):
+    """
+    Read a CSV or Parquet sample into text/csv request payloads
+    :param path: [str], path to a .csv (without header, like endpoint input) or .parquet file
+    :param rows_per_request: [int, default=1], number of rows sent per request
+    :return: [list[bytes]], payloads
+    """
+    if path.endswith('.parquet'):
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_csv(path, header=None)
+
+    payloads = []
+    for start in range(0, len(df), rows_per_request):
+        out = StringIO()
+        df.iloc[start:start + rows_per_request].to_csv(out, header=False, index=False)
+        payloads.append(out.getvalue().encode('utf-8'))
+
+    return payloads
+
+
+def http_sender(url):
+    """
+    Send payloads to a serving container over HTTP, keeping one connection per thread
+    :param url: [str], invocations url e.g. http://localhost:8080/invocations
+    :return: [callable], sends a payload and raises if the response is not successful
+    """
+    parsed = urlparse(url)
+    local = threading.local()
+
+    def send(payload):
+        if not hasattr(local, 'connection'):
+            local.connection = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=60)
+        try:
+            local.connection.request('POST', parsed.path, body=payload, headers={'Content-Type': 'text/csv'})
+            response = local.connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            del local.connection
+            raise
+        if response.status >= 300:
+            raise RuntimeError('HTTP {}'.format(response.status))
+
+    return send
+
+
+def endpoint_sender(runtime_client, endpoint_name):
+    """
+    Send payloads to a SageMaker endpoint
+    :param runtime_client: [botocore client], sagemaker-runtime client
+    :param endpoint_name: [str], name of the endpoint
+    :return: [callable], sends a payload and raises if the invocation fails
+    """
+    def send(payload):
+        response = runtime_client.invoke_endpoint(EndpointName=endpoint_name, ContentType='text/csv', Body=payload)
+        response['Body'].read()
+
+    return send
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(math.ceil(q / 100 * len(values))) - 1)], 2)
+
+
+def _summarise(mode, level, latencies, errors, elapsed):
+    requests = len(latencies) + errors
+    return {
+        'mode': mode,
+        'concurrency' if mode == 'closed' else 'rate': level,
+        'requests': requests,
+        'errors': errors,
+        'error_rate': round(errors / requests, 4) if requests else None,
+        'throughput_rps': round(len(latencies) / elapsed, 2),
+        'mean_ms': round(sum(latencies) / len(latencies), 2) if latencies else None,
+        'p50_ms': _percentile(latencies, 50),
+        'p90_ms': _percentile(latencies, 90),
+        'p99_ms': _percentile(latencies, 99),
+        'max_ms': round(max(latencies), 2) if latencies else None,
+    }
+
+
+async def _closed_loop(send, payloads, concurrency, duration, executor):
+    """Each of concurrency clients sends its next request as soon as the previous one returns"""
+    loop = asyncio.get_running_loop()
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+    counter = iter(range(10 ** 12))
+
+    async def client():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            payload = payloads[next(counter) % len(payloads)]
+            start = time.perf_counter()
+            try:
+                await loop.run_in_executor(executor, send, payload)
+                latencies.append((time.perf_counter() - start) * 1000)
+            except Exception:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(concurrency)])
+    return _summarise('closed', concurrency, latencies, errors, time.perf_counter() - start)
+
+
+async def _open_loop(send, payloads, rate, duration, executor):
+    """Requests arrive at a fixed rate whether or not earlier ones returned, latency includes queueing"""
+    loop = asyncio.get_running_loop()
+    latencies = []
+    errors = 0
+
+    async def request(i, scheduled):
+        nonlocal errors
+        try:
+            await loop.run_in_executor(executor, send, payloads[i % len(payloads)])
+            latencies.append((time.perf_counter() - scheduled) * 1000)
+        except Exception:
+            errors += 1
+
+    start = time.perf_counter()
+    tasks = []
+    for i in range(int(rate * duration)):
+        scheduled = start + i / rate
+        await asyncio.sleep(max(0, scheduled - time.perf_counter()))
+        tasks.append(asyncio.ensure_future(request(i, scheduled)))
+    await asyncio.gather(*tasks)
+    return _summarise('open', rate, latencies, errors, time.perf_counter() - start)
+
+
+def run(send, payloads, levels, mode='closed', stage_seconds=30, max_workers=256):
+    """
+    Run a load test ramping through concurrency levels (closed loop) or request rates (open loop)
+    :param send: [callable], sends a payload, see http_sender and endpoint_sender
+    :param payloads: [list[bytes]], payloads to send in turn
+    :param levels: [list[int]], concurrency levels or request rates per second, one stage each
+    :param mode: [str, default='closed'], 'closed' or 'open' loop
+    :param stage_seconds: [float, default=30], duration of each stage
+    :param max_workers: [int, default=256], maximum requests in flight for open loop stages
+    :return: [list[dict]], summary of every stage
+    """
+    stages = []
+    for level in levels:
+        with ThreadPoolExecutor(max_workers=level if mode == 'closed' else max_workers) as executor:
+            if mode == 'closed':
+                stage = asyncio.run(_closed_loop(send, payloads, level, stage_seconds, executor))
+            else:
+                stage = asyncio.run(_open_loop(send, payloads, level, stage_seconds, executor))
+        print("{} {}: {} rps, p50 {} ms, p90 {} ms, p99 {} ms, max {} ms, error rate {}".format(
+            'concurrency' if mode == 'closed' else 'rate', level, stage['throughput_rps'], stage['p50_ms'],
+            stage['p90_ms'], stage['p99_ms'], stage['max_ms'], stage['error_rate']), flush=True)
+        stages.append(stage)
+
+    return stages
+
+
+def recommend(stages, latency_slo_ms=None, peak_memory_mb=None, max_error_rate=0.01):
+    """
+    Recommend serverless settings from a load test
+    :param stages: [list[dict]], stages from run
+    :param latency_slo_ms: [optional[float]], p99 latency that must not be exceeded
+    :param peak_memory_mb: [optional[float]], peak memory used by the serving container
+    :param max_error_rate: [float, default=0.01], highest acceptable error rate
+    :return: [dict], recommended MemorySizeInMB and MaxConcurrency with the stage they are based on
+    """
+    acceptable = [
+        s for s in stages
+        if s['p99_ms'] is not None and s['error_rate'] <= max_error_rate
+        and (latency_slo_ms is None or s['p99_ms'] <= latency_slo_ms)
+    ]
+    best = max(acceptable, key=lambda s: s['throughput_rps']) if acceptable else None
+
+    max_concurrency = None
+    if best:
+        # Little's law: requests in flight = throughput x latency
+        max_concurrency = min(SERVERLESS_MAX_CONCURRENCY,
+                              max(1, math.ceil(best['throughput_rps'] * best['mean_ms'] / 1000)))
+
+    memory_size_in_mb = None
+    if peak_memory_mb is not None:
+        # Leave headroom for request spikes and memory not seen during the test
+        memory_size_in_mb = next((m for m in SERVERLESS_MEMORY_SIZES_MB if m >= peak_memory_mb * 1.2), None)
+
+    return {
+        'MemorySizeInMB': memory_size_in_mb,
+        'MaxConcurrency': max_concurrency,
+        'peak_memory_mb': peak_memory_mb,
+        'based_on_stage': best,
+    }
+
+
+class ContainerMemorySampler(object):
+    """Samples the memory usage of a local container in the background to find its peak"""
+    def __init__(self, container):
+        """
+        :param container: [docker.models.containers.Container], container to sample
+        """
+        self.container = container
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stop.is_set():
+            try:
+                memory_stats = self.container.stats(stream=False).get('memory_stats', {})
+            except Exception:
+                return
+            self.peak_bytes = max(self.peak_bytes, memory_stats.get('max_usage', 0), memory_stats.get('usage', 0))
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._stop.set()
+        self._thread.join()
+
+    @property
+    def peak_mb(self):
+        return round(self.peak_bytes / 2 ** 20, 1) if self.peak_bytes else None
+
+
+def find_container(port=8080):
+    """
+    Find the running container publishing a port
+    :param port: [int, default=8080], published port
+    :return: [optional[docker.models.containers.Container]]
+    """
+    import docker
+    try:
+        containers = docker.from_env().containers.list(filters={'publish': str(port)})
+    except docker.errors.DockerException:
+        return None
+    return containers[0] if containers else None
+
+
+def save(path, target, parameters, stages, recommendation):
+    """
+    Save load test results as json for comparison across builds
+    :param path: [str], output file path
+    :param target: [str], url or endpoint name that was tested
+    :param parameters: [dict], parameters of the test
+    :param stages: [list[dict]], stages from run
+    :param recommendation: [dict], from recommend
+    """
+    with open(path, 'w') as f:
+        json.dump({
+            'recorded_at': datetime.now(timezone.utc).isoformat(),
+            'target': target,
+            'parameters': parameters,
+            'stages': stages,
+            'recommendation': recommendation,
+        }, f, indent=4)
@@ -0,0 +1,79 @@
+"""
+Options of the local and cloud bench commands. Kept apart from load_test, which imports pandas, so
+defining the commands doesn't slow down CLI startup.
+"""
+import click
+
+
+def parse_levels(ctx, param, value):
+    """click callback parsing comma separated concurrency levels or request rates"""
+    try:
+        levels = [int(level) for level in value.split(',')]
+    except ValueError:
+        levels = []
+    if not levels or min(levels) < 1:
+        raise click.BadParameter("{} is not a comma separated list of positive integers".format(value))
+    return levels
+
+
+# In the order they are listed in --help
+BENCH_OPTIONS = [
+    click.option(
+        u"-f",
+        u"--input-file",
+        required=True,
+        type=click.Path(exists=True, dir_okay=False),
+        help="CSV (without header) or Parquet file whose rows are sent as requests"
+    ),
+    click.option(
+        u"--rows-per-request",
+        required=False,
+        default=1,
+        type=click.IntRange(1),
+        help="Number of rows sent per request"
+    ),
+    click.option(
+        u"--mode",
+        required=False,
+        default=u"closed",
+        type=click.Choice(['closed', 'open']),
+        help="closed: each client waits for its response before sending the next request. "
+             "open: requests arrive at a fixed rate, which shows queueing once the endpoint is saturated"
+    ),
+    click.option(
+        u"-l",
+        u"--levels",
+        required=False,
+        default=u"1,2,4,8,16",
+        callback=parse_levels,
+        help="Comma separated concurrency levels (closed mode) or requests per second (open mode), one stage each"
+    ),
+    click.option(
+        u"--stage-seconds",
+        required=False,
+        default=30,
+        type=click.FLOAT,
+        help="Duration of each stage in seconds"
+    ),
+    click.option(
+        u"--latency-slo-ms",
+        required=False,
+        default=None,
+        type=click.FLOAT,
+        help="p99 latency in ms stages must meet to be considered for the recommendation"
+    ),
+    click.option(
+        u"-o",
+        u"--output-file",
+        required=False,
+        default=u"easy_sm_bench.json",
+        help="File to save the results to as json"
+    ),
+]
+
+
+def bench_options(command):
+    """Decorator adding BENCH_OPTIONS to a click command"""
+    for option in reversed(BENCH_OPTIONS):
+        command = option(command)
+    return command
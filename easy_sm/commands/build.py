@@ -2,6 +2,7 @@ import sys
 import click
 import os
 import subprocess
+from easy_sm.bench import cold_start
 from easy_sm.config.config import ConfigManager
 
 def _config(app_name):
@@ -57,6 +58,21 @@ def _build(source_dir, requirements_dir, image_name, docker_tag, python_version)
 
 
 @click.command()
+@click.option(
+    u"-b",
+    u"--benchmark-cold-start",
+    is_flag=True,
+    default=False,
+    help="Measure how long new containers of the image take to serve (until /ping succeeds, "
+         "with the model in local_test/test_dir/model) and to start training"
+)
+@click.option(
+    u"--cold-start-runs",
+    required=False,
+    default=3,
+    type=click.IntRange(1),
+    help="Number of containers started for each cold start measurement"
+)
 @click.option(
     u"-a",
     u"--app-name",
@@ -64,7 +80,7 @@ def _build(source_dir, requirements_dir, image_name, docker_tag, python_version)
     help="The app name whose json file will be referenced for setting up command"
 )
 @click.pass_obj
-def build(obj, app_name):
+def build(obj, benchmark_cold_start, cold_start_runs, app_name):
     """
     Command to build SageMaker app
     """
@@ -79,3 +95,16 @@ def build(obj, app_name):
         python_version=config.python_version)
 
     print("Docker image built successfully!")
+
+    if benchmark_cold_start:
+        print("\nMeasuring cold start...")
+        test_path = os.path.join(config.easy_sm_module_dir, 'easy_sm_base', 'local_test', 'test_dir')
+        result = cold_start.benchmark(
+            "{}:{}".format(config.image_name, obj['docker_tag']),
+            os.path.abspath(test_path),
+            runs=cold_start_runs
+        )
+        print("Median of {} runs:".format(result['runs']))
+        print("  Serving, until /ping answers: {} s".format(result['serve_listening_seconds']))
+        print("  Serving, until the model is loaded: {} s".format(result['serve_healthy_seconds']))
+        print("  Training, until the first output: {} s".format(result['train_first_output_seconds']))
@@ -1,8 +1,15 @@
 import os
 import sys
+import tempfile
 import click
+from datetime import datetime, timezone
+from easy_sm.bench.options import bench_options
 from easy_sm.config.config import ConfigManager
-from easy_sm.sagemaker import sagemaker
+from easy_sm.config.state import StateManager
+from easy_sm.data import prepare as prepare_data
+from easy_sm.sagemaker import boto, sagemaker
+from easy_sm.sagemaker.download import DEFAULT_CACHE_DIR
+from easy_sm.sagemaker import invoke as file_scoring
 
 
 def _config(app_name):
@@ -13,12 +20,49 @@ def _config(app_name):
         return ConfigManager(config_file_path).get_config()
 
 
+def _channels(ctx, param, values):
+    """Parse NAME=S3_URI[,option...] channel specifications into dicts"""
+    allowed_options = {'input_channels': {'sharded', 'pipe'}, 'output_channels': {'continuous'}}[param.name]
+    channels = []
+    for value in values:
+        name, _, spec = value.partition('=')
+        s3_uri, *options = spec.split(',')
+        if not name or not s3_uri.startswith('s3://') or not set(options) <= allowed_options:
+            raise click.BadParameter(
+                "{} is not of the form NAME=S3_URI[,option...] with options from {}".format(
+                    value, ', '.join(sorted(allowed_options)))
+            )
+        if name in [c['name'] for c in channels]:
+            raise click.BadParameter("Channel {} is specified more than once".format(name))
+        channels.append(dict({'name': name, 's3_uri': s3_uri}, **{o: True for o in options}))
+
+    return channels
+
+
+def _print_api_summary():
+    summary = boto.stats.summary()
+    if summary:
+        print(summary)
+
+
+def _state(app_name):
+    return StateManager(os.path.join(f'{app_name}-state.json'))
+
+
 @click.group()
-def cloud():
+@click.option(
+    u"--metrics-file",
+    required=False,
+    default=u"easy_sm_metrics.jsonl",
+    help="File to append timing and cost metrics of finished jobs to, as json lines"
+)
+@click.pass_context
+def cloud(ctx, metrics_file):
     """
     Commands for AWS operations: upload data, train and deploy
     """
-    pass
+    ctx.obj['metrics_file'] = metrics_file
+    ctx.call_on_close(_print_api_summary)
 
 
 @click.command(name='upload-data')
@@ -29,6 +73,51 @@ def cloud():
     help="s3 location to upload data",
     type=click.Path()
 )
+@click.option(
+    u"-p",
+    u"--prepare",
+    is_flag=True,
+    default=False,
+    help="Convert CSV files in the input directory into compressed Parquet shards before uploading, "
+         "see 'local prepare-data'"
+)
+@click.option(
+    u"--shard-size-mb",
+    required=False,
+    default=128,
+    type=click.FLOAT,
+    help="Target compressed size of a Parquet shard in MB"
+)
+@click.option(
+    u"--instance-count",
+    required=False,
+    default=None,
+    type=click.IntRange(1),
+    help="Re-shard into a multiple of this many shards with the same number of rows, so ShardedByS3Key "
+         "gives every instance the same amount of data"
+)
+@click.option(
+    u"--compression",
+    required=False,
+    default=u"zstd",
+    type=click.Choice(['zstd', 'snappy', 'gzip', 'none']),
+    help="Parquet compression codec"
+)
+@click.option(
+    u"--no-header",
+    is_flag=True,
+    default=False,
+    help="CSV files have no header row, columns are named f0, f1, ..."
+)
+@click.option(
+    u"--column-type",
+    u"column_types",
+    required=False,
+    multiple=True,
+    callback=prepare_data.parse_column_types,
+    help="NAME=TYPE, arrow type (e.g. double, int64, string) of a column. Types are otherwise inferred from "
+         "the first 16 MB of each file. Can be repeated"
+)
 @click.option(
     u"-r",
     u"--iam-role-arn",
@@ -41,17 +130,113 @@ def cloud():
     required=True,
     help="The app name whose json file will be referenced for setting up command"
 )
-def upload_data(input_dir, target_dir, iam_role_arn, app_name):
+def upload_data(input_dir, target_dir, prepare, shard_size_mb, instance_count, compression, no_header, column_types,
+                iam_role_arn, app_name):
     """
     Command to upload data to S3
     """
-    print("Started uploading data to S3...\n")
     config = _config(app_name)
     sage_maker_client = sagemaker.SageMakerClient(config.aws_profile, config.aws_region, iam_role_arn)
-    target_path = sage_maker_client.upload_data(input_dir, target_dir)
+    if prepare:
+        with tempfile.TemporaryDirectory() as prepared_dir:
+            try:
+                manifest = prepare_data.prepare(
+                    input_dir,
+                    prepared_dir,
+                    shard_size_mb=shard_size_mb,
+                    instance_count=instance_count,
+                    compression=compression,
+                    header=not no_header,
+                    column_types=column_types
+                )
+            except ValueError as e:
+                raise click.ClickException(str(e))
+            print("Converted {} MB of CSV into {} Parquet shard(s) of {} MB in total".format(
+                round(manifest['source_bytes'] / 2 ** 20, 1), len(manifest['shards']),
+                round(manifest['bytes'] / 2 ** 20, 1)))
+            print("Started uploading data to S3...\n")
+            target_path = sage_maker_client.upload_data(prepared_dir, target_dir)
+    else:
+        print("Started uploading data to S3...\n")
+        target_path = sage_maker_client.upload_data(input_dir, target_dir)
     print("Data uploaded to {} successfully".format(target_path))
 
 
+@click.command(name='download')
+@click.option(
+    u"-s",
+    u"--s3-location",
+    required=True,
+    help="s3 location of an object e.g. the model tar.gz printed by train, or of a prefix e.g. a processing output"
+)
+@click.option(
+    u"-o",
+    u"--output-dir",
+    required=False,
+    default=None,
+    type=click.Path(file_okay=False),
+    help="Local directory to download to. Defaults to local_test/test_dir/model, where local deploy loads the model from"
+)
+@click.option(
+    u"--no-extract",
+    is_flag=True,
+    default=False,
+    help="Save .tar.gz archives as they are instead of extracting them"
+)
+@click.option(
+    u"--no-cache",
+    is_flag=True,
+    default=False,
+    help="Download even if the same object was downloaded before, and don't keep it in the cache"
+)
+@click.option(
+    u"--cache-dir",
+    required=False,
+    default=DEFAULT_CACHE_DIR,
+    type=click.Path(file_okay=False),
+    help="Directory downloads are cached in, keyed by bucket, key and ETag"
+)
+@click.option(
+    u"-w",
+    u"--max-workers",
+    required=False,
+    default=16,
+    type=click.IntRange(1),
+    help="Number of concurrent ranged GETs"
+)
+@click.option(
+    u"-r",
+    u"--iam-role-arn",
+    required=True,
+    help="The AWS role to use for the download command"
+)
+@click.option(
+    u"-a",
+    u"--app-name",
+    required=True,
+    help="The app name whose json file will be referenced for setting up command"
+)
+def download(s3_location, output_dir, no_extract, no_cache, cache_dir, max_workers, iam_role_arn, app_name):
+    """
+    Command to download job outputs and models from S3
+    """
+    config = _config(app_name)
+    if output_dir is None:
+        output_dir = os.path.join(config.easy_sm_module_dir, 'easy_sm_base', 'local_test', 'test_dir', 'model')
+
+    print("Downloading {} to {}...\n".format(s3_location, output_dir))
+    sage_maker_client = sagemaker.SageMakerClient(config.aws_profile, config.aws_region, iam_role_arn)
+    summary = sage_maker_client.download(
+        s3_location,
+        output_dir,
+        extract=not no_extract,
+        cache_dir=None if no_cache else cache_dir,
+        max_workers=max_workers
+    )
+    print("Downloaded {} object(s), {} MB, and copied {} from the cache".format(
+        summary['downloaded'], round(summary['bytes'] / 2 ** 20, 1), summary['cached']))
+
+
 @click.command(name='train')
 @click.option(
     u"-i", u"--input-s3-dir",
@@ -79,6 +264,78 @@ def upload_data(input_dir, target_dir, iam_role_arn, app_name):
     required=True,
     help="Prefix for the SageMaker training job."
 )
+@click.option(
+    u"--spot",
+    is_flag=True,
+    default=False,
+    help="Use managed spot training. Checkpoints are synced to S3 so interrupted jobs resume"
+)
+@click.option(
+    u"--max-run",
+    required=False,
+    default=24 * 60 * 60,
+    type=click.INT,
+    help="Maximum training time in seconds"
+)
+@click.option(
+    u"--max-wait",
+    required=False,
+    default=None,
+    type=click.INT,
+    help="Maximum time in seconds to wait for spot capacity plus training time. Defaults to --max-run"
+)
+@click.option(
+    u"--checkpoint-s3-dir",
+    required=False,
+    default=None,
+    help="s3 location to sync /opt/ml/checkpoints with. Defaults to <output-s3-dir>/checkpoints with --spot",
+    type=click.Path()
+)
+@click.option(
+    u"--uncompressed-model",
+    is_flag=True,
+    default=False,
+    help="Upload model files uncompressed under an S3 prefix instead of as model.tar.gz. "
+         "Endpoints load large models faster without untarring"
+)
+@click.option(
+    u"--keep-alive-seconds",
+    required=False,
+    default=None,
+    type=click.IntRange(1, 3600),
+    help="Keep instances in a warm pool for this long after training, so that subsequent jobs with the same "
+         "image, instance type and count skip provisioning. Warm pools are recorded in <app-name>-state.json"
+)
+@click.option(
+    u"--force",
+    is_flag=True,
+    default=False,
+    help="Train even if an identical run (same image, inputs, instances and hyperparameters) already "
+         "produced a model"
+)
+@click.option(
+    u"--run-cache-ttl-days",
+    required=False,
+    default=30,
+    type=click.FloatRange(min=0),
+    help="Days models of earlier identical runs are reused for, 0 disables reuse. Runs are cached in "
+         "<output-s3-dir>/.easy_sm-run-cache"
+)
+@click.option(
+    u"-p",
+    u"--profile",
+    is_flag=True,
+    default=False,
+    help="Sample resource usage and the python stack while training. The profile is uploaded "
+         "with the job output to <output-s3-dir>/<job name>/output/output.tar.gz"
+)
+@click.option(
+    u"--code-overlay",
+    is_flag=True,
+    default=False,
+    help="Upload the current code of the module and run it instead of the code in the image, "
+         "so code changes don't need a build and push. Requirements still come from the image"
+)
 @click.option(
     u"-a",
     u"--app-name",
@@ -94,6 +351,16 @@ def train(
         instance_count,
         iam_role_arn,
         base_job_name,
+        spot,
+        max_run,
+        max_wait,
+        checkpoint_s3_dir,
+        uncompressed_model,
+        keep_alive_seconds,
+        force,
+        run_cache_ttl_days,
+        profile,
+        code_overlay,
         app_name
 ):
     """
@@ -102,7 +369,8 @@ def train(
 
     print("Started training on SageMaker...\n")
     config = _config(app_name)
-    sage_maker_client = sagemaker.SageMakerClient(config.aws_profile, config.aws_region, iam_role_arn)
+    sage_maker_client = sagemaker.SageMakerClient(config.aws_profile, config.aws_region, iam_role_arn,
+                                                   metrics_file=obj['metrics_file'])
 
     image_name = config.image_name+':'+obj['docker_tag']
 
@@ -112,7 +380,18 @@ def train(
         train_instance_type=ec2_type,
         instance_count=instance_count,
         output_path=output_s3_dir,
-        base_job_name=base_job_name
+        base_job_name=base_job_name,
+        use_spot_instances=spot,
+        max_run=max_run,
+        max_wait=max_wait,
+        checkpoint_s3_uri=checkpoint_s3_dir,
+        keep_alive_period_in_seconds=keep_alive_seconds,
+        warm_pools=_state(app_name),
+        compress_model=not uncompressed_model,
+        profile=profile,
+        code_overlay_s3_uri=sage_maker_client.upload_code_overlay(config.easy_sm_module_dir) if code_overlay else None,
+        run_cache_ttl_days=run_cache_ttl_days or None,
+        force=force
     )
 
     print("Training on SageMaker succeeded")
@@ -124,14 +403,87 @@ def train(
 @click.option(
     u"-m", u"--s3-model-location",
     required=True,
-    help="s3 location to model tar.gz",
+    help="s3 location to model tar.gz, or to a prefix with uncompressed model files",
     type=click.Path()
 )
 @click.option(u"-s",
               u"--memory-size-in-mb",
-              required=True,
+              required=False,
+              default=None,
               type=click.INT,
-              help="memory size in MB for serverless endpoint")
+              help="memory size in MB for serverless endpoint. Required unless --autotune is used")
+@click.option(
+    u"--autotune",
+    is_flag=True,
+    default=False,
+    help="Pick the memory size by serving the model in local_test/test_dir/model locally under every "
+         "serverless memory size and choosing the cheapest one meeting --latency-slo-ms"
+)
+@click.option(
+    u"--payload-file",
+    required=False,
+    default=None,
+    type=click.Path(exists=True, dir_okay=False),
+    help="CSV (without header) or Parquet file of representative requests for --autotune"
+)
+@click.option(
+    u"--rows-per-request",
+    required=False,
+    default=1,
+    type=click.IntRange(1),
+    help="Number of rows of --payload-file sent per request"
+)
+@click.option(
+    u"--latency-slo-ms",
+    required=False,
+    default=None,
+    type=click.FLOAT,
+    help="p99 latency in ms the memory size picked by --autotune must meet"
+)
+@click.option(
+    u"--recommend-only",
+    is_flag=True,
+    default=False,
+    help="Only print the memory size picked by --autotune, without deploying"
+)
+@click.option(
+    u"--traffic-routing",
+    required=False,
+    default=None,
+    type=click.Choice(['all-at-once', 'canary', 'linear']),
+    help="Update an existing endpoint blue/green, shifting all traffic to the new model at once while rollback "
+         "alarms watch it. Defaults to all-at-once when rollback alarms are given. canary and linear are rejected, "
+         "serverless endpoints have no instance capacity to shift in steps"
+)
+@click.option(
+    u"--baking-seconds",
+    required=False,
+    default=600,
+    type=click.IntRange(0, 3600),
+    help="Seconds the new model serves all traffic, while alarms can still roll it back, "
+         "before the old one is terminated"
+)
+@click.option(
+    u"--rollback-p99-latency-ms",
+    required=False,
+    default=None,
+    type=click.FLOAT,
+    help="Create an alarm rolling back the update when p99 model latency of a minute exceeds this"
+)
+@click.option(
+    u"--rollback-max-5xx-errors",
+    required=False,
+    default=None,
+    type=click.IntRange(0),
+    help="Create an alarm rolling back the update when a minute has more 5xx errors than this"
+)
+@click.option(
+    u"--rollback-alarm",
+    u"rollback_alarms",
+    required=False,
+    multiple=True,
+    help="Name of an existing CloudWatch alarm that rolls back the update. Can be repeated"
+)
 @click.option(
     u"-r",
     u"--iam-role-arn",
@@ -156,6 +508,16 @@ def deploy_serverless(
         obj,
         s3_model_location,
         memory_size_in_mb,
+        autotune,
+        payload_file,
+        rows_per_request,
+        latency_slo_ms,
+        recommend_only,
+        traffic_routing,
+        baking_seconds,
+        rollback_p99_latency_ms,
+        rollback_max_5xx_errors,
+        rollback_alarms,
         iam_role_arn,
         endpoint_name,
         app_name
@@ -163,16 +525,122 @@ def deploy_serverless(
     """
     Command to deploy ML model(s) on SageMaker
     """
+    if traffic_routing in ('canary', 'linear'):
+        raise click.UsageError("--traffic-routing {} shifts traffic by instance capacity, serverless endpoints have "
+                               "no instances, use all-at-once".format(traffic_routing))
+    if autotune == (memory_size_in_mb is not None):
+        raise click.UsageError("Exactly one of --memory-size-in-mb and --autotune is required")
+    if autotune and payload_file is None:
+        raise click.UsageError("--payload-file is required with --autotune")
 
-    print("Started deployment on SageMaker ...\n")
     config = _config(app_name)
     image_name = config.image_name+':'+obj['docker_tag']
 
+    if autotune:
+        from easy_sm.bench import autotune as serverless_autotune, load_test
+
+        easy_sm_module_path = os.path.join(config.easy_sm_module_dir, 'easy_sm_base')
+        print("Autotuning memory size with the model in local_test/test_dir/model ...\n")
+        memory_size_in_mb, _ = serverless_autotune.autotune(
+            os.path.join(easy_sm_module_path, 'local_test', 'deploy_local.sh'),
+            os.path.abspath(os.path.join(easy_sm_module_path, 'local_test', 'test_dir')),
+            obj['docker_tag'],
+            config.image_name,
+            load_test.load_payloads(payload_file, rows_per_request),
+            latency_slo_ms=latency_slo_ms
+        )
+        if memory_size_in_mb is None:
+            raise click.ClickException("No serverless memory size meets the latency SLO without running out of memory")
+        print("Recommended memory size: {} MB".format(memory_size_in_mb))
+        if recommend_only:
+            return
+
+    print("Started deployment on SageMaker ...\n")
+
     sage_maker_client = sagemaker.SageMakerClient(config.aws_profile, config.aws_region, iam_role_arn)
+
+    guardrails = traffic_routing or rollback_alarms or rollback_p99_latency_ms is not None \
+        or rollback_max_5xx_errors is not None
+    if guardrails and not sage_maker_client.endpoint_exists(endpoint_name):
+        # Checked before creating alarms, they would watch an endpoint that is created without guardrails
+        raise click.UsageError("--traffic-routing and rollback alarms only apply to updates of an existing "
+                               "endpoint, {} does not exist yet".format(endpoint_name))
+
+    deployment_config = None
+    alarm_names = list(rollback_alarms) + sage_maker_client.create_rollback_alarms(
+        endpoint_name,
+        p99_latency_ms=rollback_p99_latency_ms,
+        max_5xx_errors=rollback_max_5xx_errors
+    )
+    if traffic_routing or alarm_names:
+        deployment_config = sage_maker_client.deployment_config(
+            traffic_routing='ALL_AT_ONCE',
+            termination_wait_in_seconds=baking_seconds,
+            alarm_names=alarm_names
+        )
+
     endpoint_name = sage_maker_client.deploy_serverless(
         image_name=image_name,
         s3_model_location=s3_model_location,
         memory_size_in_mb=memory_size_in_mb,
+        endpoint_name=endpoint_name,
+        deployment_config=deployment_config
+    )
+
+    print("Endpoint name: {}".format(endpoint_name))
+
+
+@click.command(name='deploy-multi-model')
+@click.option(
+    u"-m", u"--s3-model-prefix",
+    required=True,
+    help="s3 prefix containing the model tar.gz files to serve",
+    type=click.Path()
+)
+@click.option(u"-e", u"--ec2-type", required=True, help="ec2 instance type")
+@click.option(u"-c", u"--instance-count", required=False, default=1, help="ec2 instance count")
+@click.option(
+    u"-r",
+    u"--iam-role-arn",
+    required=True,
+    help="The AWS role to use for the deploy command"
+)
+@click.option(
+    u"-n",
+    u"--endpoint-name",
+    required=True,
+    help="Name for the SageMaker endpoint"
+)
+@click.option(
+    u"-a",
+    u"--app-name",
+    required=True,
+    help="The app name whose json file will be referenced for setting up command"
+)
+@click.pass_obj
+def deploy_multi_model(
+        obj,
+        s3_model_prefix,
+        ec2_type,
+        instance_count,
+        iam_role_arn,
+        endpoint_name,
+        app_name
+):
+    """
+    Command to deploy all models under an S3 prefix to a multi model endpoint on SageMaker
+    """
+
+    print("Started multi model deployment on SageMaker ...\n")
+    config = _config(app_name)
+    image_name = config.image_name+':'+obj['docker_tag']
+
+    sage_maker_client = sagemaker.SageMakerClient(config.aws_profile, config.aws_region, iam_role_arn)
+    endpoint_name = sage_maker_client.deploy_multi_model(
+        image_name=image_name,
+        s3_model_prefix=s3_model_prefix,
+        instance_type=ec2_type,
+        instance_count=instance_count,
         endpoint_name=endpoint_name
     )
 
@@ -248,7 +716,8 @@ def batch_transform(
     config = _config(app_name)
     image_name = config.image_name+':'+obj['docker_tag']
 
-    sage_maker_client = sagemaker.SageMakerClient(config.aws_profile, config.aws_region, iam_role_arn)
+    sage_maker_client = sagemaker.SageMakerClient(config.aws_profile, config.aws_region, iam_role_arn,
+                                                   metrics_file=obj['metrics_file'])
     status = sage_maker_client.batch_transform(
         image_name=image_name,
         s3_model_location=s3_model_location,
@@ -295,6 +764,41 @@ def delete_endpoint(endpoint_name, iam_role_arn, app_name):
     print(f"Endpoint {endpoint_name} has been deleted")
 
 
+@click.command(name='rollback')
+@click.option(
+    u"-n",
+    u"--endpoint-name",
+    required=True,
+    help="Name of the SageMaker endpoint"
+)
+@click.option(
+    u"--endpoint-config-name",
+    required=False,
+    default=None,
+    help="Endpoint config to restore. Defaults to the one deployed before the current one"
+)
+@click.option(
+    u"-r",
+    u"--iam-role-arn",
+    required=True,
+    help="The AWS role to use for the rollback command"
+)
+@click.option(
+    u"-a",
+    u"--app-name",
+    required=True,
+    help="The app name whose json file will be referenced for setting up command"
+)
+def rollback(endpoint_name, endpoint_config_name, iam_role_arn, app_name):
+    """
+    Command to restore the previous deployment of an endpoint
+    """
+    config = _config(app_name)
+    sage_maker_client = sagemaker.SageMakerClient(config.aws_profile, config.aws_region, iam_role_arn)
+    endpoint_config_name = sage_maker_client.rollback_endpoint(endpoint_name, endpoint_config_name)
+    print(f"Update in progress for endpoint {endpoint_name} to {endpoint_config_name}")
+
+
 @click.command(name='process')
 @click.option(u"-e", u"--ec2-type", required=True, help="ec2 instance type")
 @click.option(u"-c", u"--instance-count", required=False, default=1, help="ec2 instance count")
@@ -337,6 +841,29 @@ def delete_endpoint(endpoint_name, iam_role_arn, app_name):
     default=False,
     help="Flag to indicate if input data should be sharded (distributed on machines)",
 )
+@click.option(
+    u"--input-channel",
+    u"input_channels",
+    multiple=True,
+    callback=_channels,
+    help="Named input NAME=S3_URI[,sharded][,pipe] mounted at /opt/ml/processing/input/NAME. "
+         "sharded distributes files across instances, pipe streams data in Pipe mode. Can be repeated"
+)
+@click.option(
+    u"--output-channel",
+    u"output_channels",
+    multiple=True,
+    callback=_channels,
+    help="Named output NAME=S3_URI[,continuous] uploaded from /opt/ml/processing/output/NAME. "
+         "continuous uploads files while the job runs. Can be repeated"
+)
+@click.option(
+    u"--code-overlay",
+    is_flag=True,
+    default=False,
+    help="Upload the current code of the module and run it instead of the code in the image, "
+         "so code changes don't need a build and push. Requirements still come from the image"
+)
 @click.option(
     u"-a",
     u"--app-name",
@@ -354,6 +881,9 @@ def process(
         s3_input_location,
         s3_output_location,
         input_sharded,
+        input_channels,
+        output_channels,
+        code_overlay,
         app_name
 ):
     """
@@ -362,7 +892,8 @@ def process(
 
     print("Started processing job on SageMaker...\n")
     config = _config(app_name)
-    sage_maker_client = sagemaker.SageMakerClient(config.aws_profile, config.aws_region, iam_role_arn)
+    sage_maker_client = sagemaker.SageMakerClient(config.aws_profile, config.aws_region, iam_role_arn,
+                                                   metrics_file=obj['metrics_file'])
 
     image_name = config.image_name+':'+obj['docker_tag']
 
@@ -374,7 +905,10 @@ def process(
         s3_input_location=s3_input_location,
         input_sharded=input_sharded,
         s3_output_location=s3_output_location,
-        base_job_name=base_job_name
+        base_job_name=base_job_name,
+        input_channels=input_channels,
+        output_channels=output_channels,
+        code_overlay_s3_uri=sage_maker_client.upload_code_overlay(config.easy_sm_module_dir) if code_overlay else None
     )
 
     print("Processing job on SageMaker succeeded")
@@ -423,6 +957,29 @@ def process(
     default=False,
     help="Flag to indicate if input data should be sharded (distributed on machines)",
 )
+@click.option(
+    u"--input-channel",
+    u"input_channels",
+    multiple=True,
+    callback=_channels,
+    help="Named input NAME=S3_URI[,sharded][,pipe] mounted at /opt/ml/processing/input/NAME. "
+         "sharded distributes files across instances, pipe streams data in Pipe mode. Can be repeated"
+)
+@click.option(
+    u"--output-channel",
+    u"output_channels",
+    multiple=True,
+    callback=_channels,
+    help="Named output NAME=S3_URI[,continuous] uploaded from /opt/ml/processing/output/NAME. "
+         "continuous uploads files while the job runs. Can be repeated"
+)
+@click.option(
+    u"--code-overlay",
+    is_flag=True,
+    default=False,
+    help="Upload the current code of the module and run it instead of the code in the image, "
+         "so code changes don't need a build and push. Requirements still come from the image"
+)
 @click.option(
     u"-a",
     u"--app-name",
@@ -440,6 +997,9 @@ def make(
         s3_input_location,
         input_sharded,
         s3_output_location,
+        input_channels,
+        output_channels,
+        code_overlay,
         app_name
 ):
     """
@@ -448,7 +1008,8 @@ def make(
 
     print(f"Building {target} on SageMaker...\n")
     config = _config(app_name)
-    sage_maker_client = sagemaker.SageMakerClient(config.aws_profile, config.aws_region, iam_role_arn)
+    sage_maker_client = sagemaker.SageMakerClient(config.aws_profile, config.aws_region, iam_role_arn,
+                                                   metrics_file=obj['metrics_file'])
 
     image_name = config.image_name+':'+obj['docker_tag']
 
@@ -460,16 +1021,220 @@ def make(
         s3_input_location=s3_input_location,
         input_sharded=input_sharded,
         s3_output_location=s3_output_location,
-        base_job_name=base_job_name
+        base_job_name=base_job_name,
+        input_channels=input_channels,
+        output_channels=output_channels,
+        code_overlay_s3_uri=sage_maker_client.upload_code_overlay(config.easy_sm_module_dir) if code_overlay else None
     )
 
     print(f"{target} built on Sagemaker successfully!")
 
 
+@click.command(name='logs')
+@click.argument(u"job-name")
+@click.option(
+    u"-t",
+    u"--job-type",
+    required=False,
+    default=None,
+    type=click.Choice(['training', 'processing', 'transform']),
+    help="Type of the job. Looked up if not specified"
+)
+@click.option(
+    u"-f",
+    u"--follow",
+    is_flag=True,
+    default=False,
+    help="Keep streaming new log events until the job has finished"
+)
+@click.option(
+    u"-b",
+    u"--buffer-size",
+    required=False,
+    default=1000,
+    type=click.INT,
+    help="Maximum number of log events buffered per instance"
+)
+@click.option(
+    u"-r",
+    u"--iam-role-arn",
+    required=True,
+    help="The AWS role to use for the logs command"
+)
+@click.option(
+    u"-a",
+    u"--app-name",
+    required=True,
+    help="The app name whose json file will be referenced for setting up command"
+)
+def logs(job_name, job_type, follow, buffer_size, iam_role_arn, app_name):
+    """
+    Command to stream CloudWatch logs of all instances of a training, processing or transform job
+    """
+    config = _config(app_name)
+    sage_maker_client = sagemaker.SageMakerClient(config.aws_profile, config.aws_region, iam_role_arn)
+    events = sage_maker_client.tail_logs(job_name, job_type=job_type, follow=follow, buffer_size=buffer_size)
+    for stream_name, timestamp, message in events:
+        instance = stream_name[len(job_name) + 1:]
+        time = datetime.fromtimestamp(timestamp / 1000, tz=timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3]
+        print(f"[{instance}] {time} {message}", flush=True)
+
+
+@click.command(name='bench')
+@click.option(
+    u"-n",
+    u"--endpoint-name",
+    required=True,
+    help="Name of the SageMaker endpoint to load test"
+)
+@bench_options
+@click.option(
+    u"-r",
+    u"--iam-role-arn",
+    required=True,
+    help="The AWS role to use for the bench command"
+)
+@click.option(
+    u"-a",
+    u"--app-name",
+    required=True,
+    help="The app name whose json file will be referenced for setting up command"
+)
+def bench(endpoint_name, input_file, rows_per_request, mode, levels, stage_seconds, latency_slo_ms, output_file,
+          iam_role_arn, app_name):
+    """
+    Command to load test a SageMaker endpoint and recommend serverless settings
+    """
+    from easy_sm.bench import load_test
+
+    config = _config(app_name)
+    payloads = load_test.load_payloads(input_file, rows_per_request)
+
+    print("Load testing endpoint {} with {} payloads...\n".format(endpoint_name, len(payloads)))
+    sage_maker_client = sagemaker.SageMakerClient(config.aws_profile, config.aws_region, iam_role_arn)
+    stages, recommendation = sage_maker_client.bench_endpoint(
+        endpoint_name,
+        payloads,
+        levels,
+        mode=mode,
+        stage_seconds=stage_seconds,
+        latency_slo_ms=latency_slo_ms
+    )
+    load_test.save(output_file, endpoint_name, {
+        'input_file': input_file, 'rows_per_request': rows_per_request, 'mode': mode, 'levels': levels,
+        'stage_seconds': stage_seconds, 'latency_slo_ms': latency_slo_ms
+    }, stages, recommendation)
+
+    print("\nCurrent serverless config: {}".format(recommendation['current_serverless_config']))
+    print("Recommended MemorySizeInMB: {}, MaxConcurrency: {}".format(
+        recommendation['MemorySizeInMB'], recommendation['MaxConcurrency']))
+    print("Results saved to {}".format(output_file))
+
+
+@click.command(name='invoke')
+@click.option(
+    u"-n",
+    u"--endpoint-name",
+    required=False,
+    default=None,
+    help="Name of the SageMaker endpoint to send the rows to, not needed with --local"
+)
+@click.option(
+    u"-f",
+    u"--input-file",
+    required=True,
+    help="CSV (without header) or Parquet file, local or on S3 (s3://bucket/key), whose rows are scored"
+)
+@click.option(
+    u"-o",
+    u"--output-file",
+    required=True,
+    help="Local file to write predictions to, one line per input row in the same order. "
+         "An interrupted run resumes when started again with the same arguments"
+)
+@click.option(
+    u"--local",
+    is_flag=True,
+    default=False,
+    help="Send the rows to the model deployed with 'local deploy' at localhost:8080 instead of an endpoint"
+)
+@click.option(
+    u"--chunk-rows",
+    required=False,
+    default=10000,
+    type=click.IntRange(1),
+    help="Number of rows read, scored and written at a time"
+)
+@click.option(
+    u"--max-payload-mb",
+    required=False,
+    default=4.0,
+    type=click.FloatRange(0, 6, min_open=True),
+    help="Maximum size of a request in MB, rows are packed into requests up to this size. "
+         "Serverless endpoints accept up to 4 MB, other endpoints up to 6 MB"
+)
+@click.option(
+    u"--max-concurrency",
+    required=False,
+    default=64,
+    type=click.IntRange(1),
+    help="Maximum number of requests in flight. Concurrency starts low, grows while requests succeed "
+         "and halves when the endpoint throttles"
+)
+@click.option(
+    u"-r",
+    u"--iam-role-arn",
+    required=False,
+    default=None,
+    help="The AWS role to use for the invoke command"
+)
+@click.option(
+    u"-a",
+    u"--app-name",
+    required=True,
+    help="The app name whose json file will be referenced for setting up command"
+)
+def invoke(endpoint_name, input_file, output_file, local, chunk_rows, max_payload_mb, max_concurrency, iam_role_arn,
+           app_name):
+    """
+    Command to score a CSV or Parquet file through an endpoint
+    """
+    config = _config(app_name)
+    options = {
+        'chunk_rows': chunk_rows,
+        'max_payload_bytes': int(max_payload_mb * 2 ** 20),
+        'max_concurrency': max_concurrency,
+    }
+
+    if local:
+        print("Scoring {} with the local deployment...\n".format(input_file))
+        s3_client = None
+        if input_file.startswith('s3://'):
+            s3_client = boto.session(config.aws_profile, config.aws_region).client('s3')
+        result = file_scoring.score(input_file, output_file,
+                                    file_scoring.http_invoker('http://localhost:8080/invocations'),
+                                    s3_client=s3_client, **options)
+    else:
+        if endpoint_name is None:
+            raise click.UsageError("--endpoint-name is required unless --local is given")
+        print("Scoring {} with endpoint {}...\n".format(input_file, endpoint_name))
+        sage_maker_client = sagemaker.SageMakerClient(config.aws_profile, config.aws_region, iam_role_arn)
+        result = sage_maker_client.score_file(endpoint_name, input_file, output_file, **options)
+
+    print("\nScored {} rows in {} s ({} throttled requests, final concurrency {}), predictions written to {}".format(
+        result['rows'], result['seconds'], result['throttled'], result['concurrency'], output_file))
+
+
 cloud.add_command(upload_data)
+cloud.add_command(download)
 cloud.add_command(train)
 cloud.add_command(deploy_serverless)
+cloud.add_command(deploy_multi_model)
 cloud.add_command(batch_transform)
 cloud.add_command(delete_endpoint)
+cloud.add_command(rollback)
 cloud.add_command(process)
-cloud.add_command(make)
\ No newline at end of file
+cloud.add_command(make)
+cloud.add_command(logs)
+cloud.add_command(bench)
+cloud.add_command(invoke)
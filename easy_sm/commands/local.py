@@ -1,9 +1,17 @@
 import os
 import sys
+import json
 import click
+import shutil
 import subprocess
+import contextlib
+from urllib.parse import urlparse
 
+from easy_sm.bench import emulate
+from easy_sm.bench.options import bench_options
 from easy_sm.config.config import ConfigManager
+from easy_sm.data import prepare, s3_proxy
+from easy_sm.sagemaker.instance_types import INSTANCE_TYPES
 
 def _config(app_name):
     config_file_path = os.path.join(f'{app_name}.json')
@@ -21,7 +29,155 @@ def local():
     pass
 
 
+def _dev_container_name(image_name):
+    return "{}-dev".format(image_name)
+
+
+def _dev_container_running(image_name):
+    """Check if the dev container started by 'local dev' is running"""
+    output = subprocess.check_output(
+        ["docker", "ps", "--quiet", "--filter", "name=^{}$".format(_dev_container_name(image_name))]
+    )
+    return bool(output.strip())
+
+
+def _dev_exec(image_name, arguments, options=None, interactive=False):
+    """
+    Command running the container entrypoint with arguments in the dev container, instead of a new container
+
+    :param image_name: [str], the name of the Docker image
+    :param arguments: [list[str]], arguments of executor.sh e.g. ['process', 'job.py']
+    :param options: [optional[list[str]]], docker exec options e.g. ['-e', 'NAME=value']
+    :param interactive: [bool, default=False], attach a terminal if there is one
+    :return: [list[str]], command
+    """
+    command = ["docker", "exec"] + (options or [])
+    if interactive and sys.stdin.isatty():
+        command.append("-it")
+    return command + [_dev_container_name(image_name), "easy_sm_base/executor.sh"] + arguments
+
+
+@contextlib.contextmanager
+def _s3_cache(config, enabled, size_gb):
+    """
+    Run the S3 caching proxy while a job runs and print its hit and miss counts after
+
+    :param config: [ConfigManager config], app config whose aws profile and region the proxy uses
+    :param enabled: [bool], start the proxy
+    :param size_gb: [float], maximum size of the cache
+    :return: [optional[S3CachingProxy]], the running proxy, None if it is not enabled
+    """
+    if not enabled:
+        yield None
+        return
+    proxy = s3_proxy.S3CachingProxy(
+        config.aws_profile,
+        config.aws_region,
+        max_bytes=int(size_gb * 2 ** 30),
+        host=s3_proxy.docker_bridge_address()
+    ).start()
+    print("Caching S3 reads in {}\n".format(proxy.cache.cache_dir))
+    try:
+        yield proxy
+    finally:
+        proxy.stop()
+        print(proxy.summary())
+
+
+def _run_emulated(commands, instance_type, image_name):
+    """
+    Run local script commands in containers limited to the resources of an instance type and report their
+    peak usage with the cheapest instance type that fits
+
+    :param commands: [list[list[str]]], local script commands, one per container
+    :param instance_type: [str], instance type to emulate
+    :param image_name: [str], the name of the Docker image
+    """
+    container_names = ["{}-emulated-{}-{}".format(image_name, os.getpid(), i) for i in range(len(commands))]
+    samplers = [emulate.ContainerStatsSampler(name) for name in container_names]
+    with contextlib.ExitStack() as stack:
+        for sampler in samplers:
+            stack.enter_context(sampler)
+        containers = [
+            subprocess.Popen(command + emulate.docker_options(instance_type, name))
+            for command, name in zip(commands, container_names)
+        ]
+        return_codes = [container.wait() for container in containers]
+
+    emulate.report(instance_type, samplers, return_codes)
+    for command, return_code in zip(commands, return_codes):
+        if return_code != 0:
+            raise subprocess.CalledProcessError(return_code, command)
+
+
+def _simulate_interruption(local_train_script_path, test_path, docker_tag, image_name, seconds):
+    """
+    Start local training and kill the container after some time, the way a spot interruption would.
+
+    :param local_train_script_path: [str], path to train_local.sh
+    :param test_path: [str], absolute path to local test directory mounted at /opt/ml
+    :param docker_tag: [str], the Docker tag for the image
+    :param image_name: [str], the name of the Docker image
+    :param seconds: [int], seconds after which the training container is killed
+    :return: [bool], True if training was interrupted, False if it finished before being killed
+    """
+    container_name = "{}-train-interrupted-{}".format(image_name, os.getpid())
+    training = subprocess.Popen(
+        [
+            "{}".format(local_train_script_path),
+            test_path,
+            docker_tag,
+            image_name,
+            "--name",
+            container_name
+        ]
+    )
+    try:
+        training.wait(timeout=seconds)
+        return False
+    except subprocess.TimeoutExpired:
+        subprocess.check_call(["docker", "kill", container_name])
+        training.wait()
+
+    checkpoint_path = os.path.join(test_path, 'checkpoints')
+    checkpoints = os.listdir(checkpoint_path) if os.path.isdir(checkpoint_path) else []
+    checkpoints = [c for c in checkpoints if c != '.gitkeep']
+    print("Training interrupted after {} seconds with {} checkpoint(s) in {}".format(
+        seconds, len(checkpoints), checkpoint_path))
+    if not checkpoints:
+        print("Warning: no checkpoints were written before the interruption, training will start from scratch")
+
+    return True
+
+
 @click.command()
+@click.option(
+    u"-s",
+    u"--simulate-interruption",
+    required=False,
+    default=None,
+    type=click.INT,
+    help="Kill training after given seconds and restart it, to verify resuming from checkpoints "
+         "in local_test/test_dir/checkpoints"
+)
+@click.option(
+    u"-p",
+    u"--profile",
+    is_flag=True,
+    default=False,
+    help="Sample resource usage and the python stack while training and print a summary. "
+         "The profile is written to local_test/test_dir/output/data/profile"
+)
+@click.option(
+    u"-e",
+    u"--emulate-instance",
+    required=False,
+    default=None,
+    type=click.Choice(sorted(INSTANCE_TYPES)),
+    metavar="INSTANCE_TYPE",
+    help="Limit the container to the vCPUs, memory and shared memory of an instance type, report peak usage "
+         "and recommend the cheapest instance type that fits"
+)
 @click.option(
     u"-a",
     u"--app-name",
@@ -29,7 +185,7 @@ def local():
     help="The app name whose json file will be referenced for setting up command"
 )
 @click.pass_obj
-def train(obj, app_name):
+def train(obj, simulate_interruption, profile, emulate_instance, app_name):
     """
     Command to train ML model(s) locally
     """
@@ -45,18 +201,87 @@ def train(obj, app_name):
     if not os.path.isdir(test_path):
         raise ValueError("This is not a easy_sm directory: {}".format(dir))
 
-    output = subprocess.check_output(
-        [
-            "{}".format(local_train_script_path),
-            "{}".format(os.path.abspath(test_path)),
+    if simulate_interruption is not None:
+        interrupted = _simulate_interruption(
+            local_train_script_path,
+            os.path.abspath(test_path),
             docker_tag,
-            image_name
-        ]
-    )
-    print(output)
+            image_name,
+            simulate_interruption
+        )
+        if not interrupted:
+            print("Training finished before the interruption, nothing to resume")
+            return
+        print("Restarting local training to resume from checkpoints...\n")
+
+    options = ["-e", "EASY_SM_PROFILE=true"] if profile else []
+    command = [
+        "{}".format(local_train_script_path),
+        "{}".format(os.path.abspath(test_path)),
+        docker_tag,
+        image_name
+    ] + options
+    if emulate_instance:
+        # Resources can only be limited for a new container, so the dev container isn't used
+        _run_emulated([command], emulate_instance, image_name)
+    else:
+        if _dev_container_running(image_name):
+            print("Training in dev container {}...\n".format(_dev_container_name(image_name)))
+            command = _dev_exec(image_name, ["train"], options)
+        output = subprocess.check_output(command)
+        print(output)
 
     print("Local training completed successfully!")
 
+    if profile:
+        with open(os.path.join(test_path, 'output', 'data', 'profile', 'report.json')) as f:
+            print('\n'.join(json.load(f)['summary']))
+
+
+def _prepare_hosts(hosts_path, test_path, instance_count, input_sharded):
+    """
+    Set up per host directories that emulate a processing cluster of several instances.
+
+    Every host gets a resourceconfig.json and, if input is sharded, a share of the files in
+    test_dir/processing/input distributed the way ShardedByS3Key would.
+
+    :param hosts_path: [str], directory to create host directories in
+    :param test_path: [str], local test directory mounted at /opt/ml
+    :param instance_count: [int], number of hosts
+    :param input_sharded: [bool], distribute input files across hosts
+    :return: [list[str]], docker run options of each host
+    """
+    hosts = ['algo-{}'.format(i + 1) for i in range(instance_count)]
+    input_path = os.path.join(test_path, 'processing', 'input')
+    input_files = sorted(
+        os.path.relpath(os.path.join(root, f), input_path)
+        for root, _, files in os.walk(input_path) for f in files if f != '.gitkeep'
+    )
+
+    shutil.rmtree(hosts_path, ignore_errors=True)
+    host_options = []
+    for i, host in enumerate(hosts):
+        config_path = os.path.join(hosts_path, host, 'config')
+        os.makedirs(config_path)
+        with open(os.path.join(config_path, 'resourceconfig.json'), 'w') as f:
+            json.dump({'current_host': host, 'hosts': hosts}, f)
+
+        options = ['--hostname', host, '-v', '{}:/opt/ml/config'.format(config_path)]
+        if input_sharded:
+            host_input_path = os.path.join(hosts_path, host, 'input')
+            os.makedirs(host_input_path)
+            for input_file in input_files[i::instance_count]:
+                destination = os.path.join(host_input_path, input_file)
+                os.makedirs(os.path.dirname(destination), exist_ok=True)
+                try:
+                    os.link(os.path.join(input_path, input_file), destination)
+                except OSError:
+                    shutil.copy2(os.path.join(input_path, input_file), destination)
+            options += ['-v', '{}:/opt/ml/processing/input'.format(host_input_path)]
+        host_options.append(options)
+
+    return host_options
+
 
 @click.command()
 @click.option(
@@ -65,6 +290,44 @@ def train(obj, app_name):
     required=True,
     help="The name (not path) of python file to run as processing job"
 )
+@click.option(
+    u"-c",
+    u"--instance-count",
+    required=False,
+    default=1,
+    type=click.IntRange(1),
+    help="Number of instances to emulate, each one runs in its own container"
+)
+@click.option(
+    u"-is", u"--input-sharded",
+    is_flag=True,
+    default=False,
+    help="Flag to indicate if input data should be sharded (distributed on emulated instances)",
+)
+@click.option(
+    u"-e",
+    u"--emulate-instance",
+    required=False,
+    default=None,
+    type=click.Choice(sorted(INSTANCE_TYPES)),
+    metavar="INSTANCE_TYPE",
+    help="Limit the container to the vCPUs, memory and shared memory of an instance type, report peak usage "
+         "and recommend the cheapest instance type that fits"
+)
+@click.option(
+    u"--s3-cache",
+    is_flag=True,
+    default=False,
+    help="Route S3 reads of the job through a local caching proxy, so repeated reads of the same objects "
+         "are served from disk and work offline. Writes to S3 are rejected"
+)
+@click.option(
+    u"--s3-cache-size-gb",
+    required=False,
+    default=10,
+    type=click.FLOAT,
+    help="Maximum size of the S3 cache, least recently used objects are evicted beyond it"
+)
 @click.option(
     u"-a",
     u"--app-name",
@@ -72,7 +335,7 @@ def train(obj, app_name):
     help="The app name whose json file will be referenced for setting up command"
 )
 @click.pass_obj
-def process(obj, file, app_name):
+def process(obj, file, instance_count, input_sharded, emulate_instance, s3_cache, s3_cache_size_gb, app_name):
     """
     Command to run python files locally as processing job
     """
@@ -94,22 +357,62 @@ def process(obj, file, app_name):
     if not os.path.isfile(job_file_path):
         raise ValueError("Processing file does not exist: {}".format(job_file_path))
 
-    output = subprocess.check_output(
-        [
-            "{}".format(local_process_script_path),
-            "{}".format(os.path.abspath(test_path)),
-            docker_tag,
-            image_name,
-            file,
-            aws_profile,
-            aws_region
-        ]
-    )
-    print(output)
+    command = [
+        "{}".format(local_process_script_path),
+        "{}".format(os.path.abspath(test_path)),
+        docker_tag,
+        image_name,
+        file,
+        aws_profile,
+        aws_region
+    ]
+
+    with _s3_cache(config, s3_cache, s3_cache_size_gb) as proxy:
+        if proxy:
+            command += s3_proxy.container_options(proxy.port, proxy.token)
+        if emulate_instance:
+            if instance_count == 1 and not input_sharded:
+                _run_emulated([command], emulate_instance, image_name)
+            else:
+                hosts_path = os.path.abspath(os.path.join(easy_sm_module_path, 'local_test', 'hosts'))
+                host_options = _prepare_hosts(hosts_path, os.path.abspath(test_path), instance_count, input_sharded)
+                try:
+                    _run_emulated([command + options for options in host_options], emulate_instance, image_name)
+                finally:
+                    shutil.rmtree(hosts_path, ignore_errors=True)
+        elif instance_count == 1 and not input_sharded:
+            if _dev_container_running(image_name):
+                print("Processing in dev container {}...\n".format(_dev_container_name(image_name)))
+                exec_options = s3_proxy.container_options(proxy.port, proxy.token, add_host=False) if proxy \
+                    else None
+                command = _dev_exec(image_name, ["process", file], exec_options)
+            output = subprocess.check_output(command)
+            print(output)
+        else:
+            hosts_path = os.path.abspath(os.path.join(easy_sm_module_path, 'local_test', 'hosts'))
+            host_options = _prepare_hosts(hosts_path, os.path.abspath(test_path), instance_count, input_sharded)
+            try:
+                hosts = [subprocess.Popen(command + options) for options in host_options]
+                return_codes = [host.wait() for host in hosts]
+            finally:
+                shutil.rmtree(hosts_path, ignore_errors=True)
+            for i, return_code in enumerate(return_codes):
+                if return_code != 0:
+                    raise subprocess.CalledProcessError(return_code, command + host_options[i])
+
     print("Local processing completed successfully!")
 
 
 @click.command()
+@click.option(
+    u"-m",
+    u"--models-dir",
+    required=False,
+    default=None,
+    type=click.Path(exists=True, file_okay=False),
+    help="Serve a directory of models (model directories or model.tar.gz files) like a multi model endpoint. "
+         "Models are picked with the X-Amzn-SageMaker-Target-Model header"
+)
 @click.option(
     u"-a",
     u"--app-name",
@@ -117,7 +420,7 @@ def process(obj, file, app_name):
     help="The app name whose json file will be referenced for setting up command"
 )
 @click.pass_obj
-def deploy(obj, app_name):
+def deploy(obj, models_dir, app_name):
     """
     Command to deploy ML model(s) locally
     """
@@ -134,15 +437,23 @@ def deploy(obj, app_name):
     if not os.path.isdir(test_path):
         raise ValueError("This is not a easy_sm directory: {}".format(dir))
 
+    options = []
+    if models_dir:
+        options = ['-v', '{}:/opt/ml/models'.format(os.path.abspath(models_dir)), '-e', 'EASY_SM_MULTI_MODEL=true']
+
     print("Started local deployment at localhost:8080 ...\n")
-    output = subprocess.check_output(
-        [
+    if not models_dir and _dev_container_running(image_name):
+        # The app restarts when code in the mounted module changes
+        print("Serving from dev container {}, reloading on code changes\n".format(_dev_container_name(image_name)))
+        command = _dev_exec(image_name, ["serve"], ['-e', 'EASY_SM_RELOAD=true'], interactive=True)
+    else:
+        command = [
             "{}".format(local_deploy_script_path),
             "{}".format(os.path.abspath(test_path)),
             docker_tag,
             image_name
-        ]
-    )
+        ] + options
+    output = subprocess.check_output(command)
     print(output)
 
 
@@ -154,6 +465,30 @@ def deploy(obj, app_name):
     required=True,
     help="The name of target that needs to be built"
 )
+@click.option(
+    u"-e",
+    u"--emulate-instance",
+    required=False,
+    default=None,
+    type=click.Choice(sorted(INSTANCE_TYPES)),
+    metavar="INSTANCE_TYPE",
+    help="Limit the container to the vCPUs, memory and shared memory of an instance type, report peak usage "
+         "and recommend the cheapest instance type that fits"
+)
+@click.option(
+    u"--s3-cache",
+    is_flag=True,
+    default=False,
+    help="Route S3 reads of the job through a local caching proxy, so repeated reads of the same objects "
+         "are served from disk and work offline. Writes to S3 are rejected"
+)
+@click.option(
+    u"--s3-cache-size-gb",
+    required=False,
+    default=10,
+    type=click.FLOAT,
+    help="Maximum size of the S3 cache, least recently used objects are evicted beyond it"
+)
 @click.option(
     u"-a",
     u"--app-name",
@@ -161,7 +496,7 @@ def deploy(obj, app_name):
     help="The app name whose json file will be referenced for setting up command"
 )
 @click.pass_obj
-def make(obj, target, app_name):
+def make(obj, target, emulate_instance, s3_cache, s3_cache_size_gb, app_name):
     """
     Command to build make targets defined in a Makefile in easy_sm_base/processing
     """
@@ -182,22 +517,233 @@ def make(obj, target, app_name):
     if not os.path.isfile(makefile_path):
         raise ValueError("Makefile does not exist: {}".format(makefile_path))
 
-    output = subprocess.check_output(
+    command = [
+        "{}".format(local_make_script_path),
+        "{}".format(os.path.abspath(test_path)),
+        docker_tag,
+        image_name,
+        target,
+        aws_profile,
+        aws_region
+    ]
+    with _s3_cache(config, s3_cache, s3_cache_size_gb) as proxy:
+        if proxy:
+            command += s3_proxy.container_options(proxy.port, proxy.token)
+        if emulate_instance:
+            _run_emulated([command], emulate_instance, image_name)
+        else:
+            if _dev_container_running(image_name):
+                print("Building in dev container {}...\n".format(_dev_container_name(image_name)))
+                exec_options = s3_proxy.container_options(proxy.port, proxy.token, add_host=False) if proxy \
+                    else None
+                command = _dev_exec(image_name, ["make", target], exec_options)
+            output = subprocess.check_output(command)
+            print(output)
+    print(f"{target} built successfully!")
+
+
+@click.command(name='dev')
+@click.option(
+    u"--stop",
+    is_flag=True,
+    default=False,
+    help="Stop the dev container"
+)
+@click.option(
+    u"-a",
+    u"--app-name",
+    required=True,
+    help="The app name whose json file will be referenced for setting up command"
+)
+@click.pass_obj
+def dev(obj, stop, app_name):
+    """
+    Command to start a long lived container with the module mounted, that local train, process, make and deploy
+    run in until it is stopped, so code changes apply without rebuilding the image
+    """
+    config = _config(app_name)
+    image_name = config.image_name
+    container_name = _dev_container_name(image_name)
+
+    if stop:
+        subprocess.check_call(["docker", "stop", container_name], stdout=subprocess.DEVNULL)
+        print("Dev container {} stopped".format(container_name))
+        return
+
+    if _dev_container_running(image_name):
+        print("Dev container {} is already running".format(container_name))
+        return
+
+    module_path = os.path.abspath(config.easy_sm_module_dir)
+    easy_sm_module_path = os.path.join(module_path, 'easy_sm_base')
+    test_path = os.path.join(easy_sm_module_path, 'local_test', 'test_dir')
+    if not os.path.isdir(test_path):
+        raise ValueError("This is not a easy_sm directory: {}".format(module_path))
+
+    # The module replaces the copy in the image, at the working directory the image was built with
+    target_dir_name = os.path.basename(os.path.normpath(config.easy_sm_module_dir))
+    subprocess.check_call(
         [
-            "{}".format(local_make_script_path),
-            "{}".format(os.path.abspath(test_path)),
-            docker_tag,
-            image_name,
-            target,
-            aws_profile,
-            aws_region
-        ]
+            "docker", "run", "--detach", "--rm",
+            "--name", container_name,
+            "-v", "{}:/opt/program/{}".format(module_path, target_dir_name),
+            "-v", "{}:/opt/ml".format(test_path),
+            "-v", "{}:/root/.aws".format(os.path.expanduser('~/.aws')),
+            "-e", "AWS_PROFILE={}".format(config.aws_profile),
+            "-e", "AWS_DEFAULT_REGION={}".format(config.aws_region),
+            "-p", "8080:8080",
+            # Lets jobs in the container reach the S3 cache of 'local process --s3-cache' on the host
+            "--add-host", "host.docker.internal:host-gateway",
+            "--entrypoint", "sleep",
+            "{}:{}".format(image_name, obj['docker_tag']),
+            "infinity"
+        ],
+        stdout=subprocess.DEVNULL
     )
-    print(output)
-    print(f"{target} built successfully!")
+    print("Dev container {} started. local train, process, make and deploy now run in it "
+          "with the code in {}".format(container_name, module_path))
+    print("Rebuild the image and restart the container when requirements change")
+
+
+@click.command(name='bench')
+@bench_options
+@click.option(
+    u"--url",
+    required=False,
+    default=u"http://localhost:8080/invocations",
+    help="Invocations url of the locally deployed model"
+)
+def bench(input_file, rows_per_request, mode, levels, stage_seconds, latency_slo_ms, output_file, url):
+    """
+    Command to load test a locally deployed model and recommend serverless settings
+    """
+    from easy_sm.bench import load_test
+
+    payloads = load_test.load_payloads(input_file, rows_per_request)
+    port = urlparse(url).port or 80
+    container = load_test.find_container(port)
+    if container is None:
+        print("No container publishing port {} found, memory is not measured".format(port))
+
+    print("Load testing {} with {} payloads...\n".format(url, len(payloads)))
+    if container is not None:
+        with load_test.ContainerMemorySampler(container) as sampler:
+            stages = load_test.run(load_test.http_sender(url), payloads, levels, mode, stage_seconds)
+        peak_memory_mb = sampler.peak_mb
+    else:
+        stages = load_test.run(load_test.http_sender(url), payloads, levels, mode, stage_seconds)
+        peak_memory_mb = None
+
+    recommendation = load_test.recommend(stages, latency_slo_ms=latency_slo_ms, peak_memory_mb=peak_memory_mb)
+    load_test.save(output_file, url, {
+        'input_file': input_file, 'rows_per_request': rows_per_request, 'mode': mode, 'levels': levels,
+        'stage_seconds': stage_seconds, 'latency_slo_ms': latency_slo_ms
+    }, stages, recommendation)
+
+    print("\nPeak memory: {} MB".format(peak_memory_mb))
+    print("Recommended MemorySizeInMB: {}, MaxConcurrency: {}".format(
+        recommendation['MemorySizeInMB'], recommendation['MaxConcurrency']))
+    print("Results saved to {}".format(output_file))
+
+
+def _print_manifest(manifest, output_dir):
+    print("Converted {} CSV file(s), {} MB, into {} Parquet shard(s), {} MB, with {} rows in {}".format(
+        len(manifest['sources']), round(manifest['source_bytes'] / 2 ** 20, 1), len(manifest['shards']),
+        round(manifest['bytes'] / 2 ** 20, 1), manifest['rows'], output_dir))
+
+
+@click.command(name='prepare-data')
+@click.option(
+    u"-i",
+    u"--input-path",
+    required=True,
+    type=click.Path(exists=True),
+    help="CSV file or directory of CSV files (.csv or .csv.gz) to convert"
+)
+@click.option(
+    u"-o",
+    u"--output-dir",
+    required=True,
+    type=click.Path(file_okay=False),
+    help="Directory to write Parquet shards and _manifest.json to, replaced if it is the output of an earlier run"
+)
+@click.option(
+    u"--shard-size-mb",
+    required=False,
+    default=128,
+    type=click.FLOAT,
+    help="Target compressed size of a Parquet shard in MB"
+)
+@click.option(
+    u"--instance-count",
+    required=False,
+    default=None,
+    type=click.IntRange(1),
+    help="Re-shard into a multiple of this many shards with the same number of rows, so ShardedByS3Key "
+         "gives every instance the same amount of data"
+)
+@click.option(
+    u"--compression",
+    required=False,
+    default=u"zstd",
+    type=click.Choice(['zstd', 'snappy', 'gzip', 'none']),
+    help="Parquet compression codec"
+)
+@click.option(
+    u"--no-header",
+    is_flag=True,
+    default=False,
+    help="CSV files have no header row, columns are named f0, f1, ..."
+)
+@click.option(
+    u"--column-type",
+    u"column_types",
+    required=False,
+    multiple=True,
+    callback=prepare.parse_column_types,
+    help="NAME=TYPE, arrow type (e.g. double, int64, string) of a column. Types are otherwise inferred from "
+         "the first 16 MB of each file. Can be repeated"
+)
+@click.option(
+    u"-w",
+    u"--workers",
+    required=False,
+    default=None,
+    type=click.IntRange(1),
+    help="Number of processes converting files in parallel, defaults to the number of cpus"
+)
+@click.option(
+    u"--overwrite",
+    is_flag=True,
+    default=False,
+    help="Replace the output directory even if it has files other than the output of an earlier run"
+)
+def prepare_data(input_path, output_dir, shard_size_mb, instance_count, compression, no_header, column_types,
+                 workers, overwrite):
+    """
+    Command to convert CSV data into compressed Parquet shards before uploading it
+    """
+    try:
+        manifest = prepare.prepare(
+            input_path,
+            output_dir,
+            shard_size_mb=shard_size_mb,
+            instance_count=instance_count,
+            compression=compression,
+            header=not no_header,
+            workers=workers,
+            overwrite=overwrite,
+            column_types=column_types
+        )
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    _print_manifest(manifest, output_dir)
 
 
 local.add_command(train)
 local.add_command(deploy)
 local.add_command(process)
 local.add_command(make)
+local.add_command(bench)
+local.add_command(dev)
+local.add_command(prepare_data)
@@ -0,0 +1,72 @@
+import os
+import json
+from datetime import datetime, timezone
+
+
+class StateManager(object):
+    """
+    Local state that outlives single commands, such as the warm pools kept alive by training jobs
+    """
+    def __init__(self, state_file_path):
+        self._state_file_path = state_file_path
+
+    def _get_state(self):
+        if not os.path.isfile(self._state_file_path):
+            return {'warm_pools': []}
+
+        with open(self._state_file_path) as state_file:
+            return json.loads(state_file.read())
+
+    def _set_state(self, state):
+        with open(self._state_file_path, 'w') as state_file:
+            json.dump(state, state_file, indent=4)
+
+    def find_warm_pool(self, image, instance_type, instance_count):
+        """
+        Find a warm pool that has not expired yet for the given training configuration
+        :param image: [str], full image uri
+        :param instance_type: [str], ec2 instance type
+        :param instance_count: [int], ec2 instance count
+        :return: [optional[dict]], the warm pool record
+        """
+        now = datetime.now(timezone.utc)
+        for pool in self._get_state()['warm_pools']:
+            if (pool['image'], pool['instance_type'], pool['instance_count']) == (image, instance_type, instance_count) \
+                    and datetime.fromisoformat(pool['expires_at']) > now:
+                return pool
+
+        return None
+
+    def set_warm_pool(self, image, instance_type, instance_count, job_name, keep_alive_period_in_seconds, expires_at):
+        """
+        Record the warm pool retained by a training job, replacing any pool for the same configuration
+        :param image: [str], full image uri
+        :param instance_type: [str], ec2 instance type
+        :param instance_count: [int], ec2 instance count
+        :param job_name: [str], name of the training job that retained the pool
+        :param keep_alive_period_in_seconds: [int], keep alive period of the pool
+        :param expires_at: [datetime], time at which the pool is released
+        """
+        state = self._get_state()
+        state['warm_pools'] = [
+            p for p in state['warm_pools']
+            if (p['image'], p['instance_type'], p['instance_count']) != (image, instance_type, instance_count)
+        ]
+        state['warm_pools'].append({
+            'image': image,
+            'instance_type': instance_type,
+            'instance_count': instance_count,
+            'job_name': job_name,
+            'keep_alive_period_in_seconds': keep_alive_period_in_seconds,
+            'expires_at': expires_at.isoformat()
+        })
+        self._set_state(state)
+
+    def remove_warm_pool(self, job_name):
+        """
+        Forget the warm pool retained by a training job
+        :param job_name: [str], name of the training job that retained the pool
+        """
+        state = self._get_state()
+        state['warm_pools'] = [p for p in state['warm_pools'] if p['job_name'] != job_name]
+        self._set_state(state)
@@ -0,0 +1,211 @@
+"""
+Conversion of raw CSV input into compressed Parquet shards before it is uploaded.
+
+Parquet is smaller on the wire and much cheaper to parse than CSV for every job that reads it. CSV files
+are streamed in blocks, so files larger than memory can be converted, and converted in parallel, one file
+per process. Shards are rolled over at a target size and, for jobs with several instances reading the input
+with ShardedByS3Key, can be re-sharded into a multiple of the instance count with the same number of rows
+each, so every instance gets the same amount of data.
+
+A _manifest.json with the schema, row counts and shards is written next to the shards. Readers like
+pandas.read_parquet and pyarrow datasets skip files starting with an underscore.
+"""
+import os
+import json
+import math
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+MANIFEST_FILE = '_manifest.json'
+
+
+def _csv_files(input_path):
+    if os.path.isfile(input_path):
+        return [input_path]
+    return sorted(
+        os.path.join(root, f)
+        for root, _, files in os.walk(input_path) for f in files if f.endswith(('.csv', '.csv.gz'))
+    )
+
+
+def _check_output_dir(input_path, output_dir, overwrite):
+    """Raise if replacing output_dir could delete the input or files that are not from an earlier run"""
+    input_path, output_dir = os.path.realpath(input_path), os.path.realpath(output_dir)
+    if os.path.commonpath([input_path, output_dir]) in (input_path, output_dir):
+        raise ValueError("Output directory {} must not be or overlap the input {}".format(output_dir, input_path))
+    if os.path.isdir(output_dir) and os.listdir(output_dir) and not overwrite \
+            and not os.path.isfile(os.path.join(output_dir, MANIFEST_FILE)):
+        raise ValueError("Output directory {} is not empty and not the output of an earlier run, "
+                         "use --overwrite to replace it".format(output_dir))
+
+
+def parse_column_types(ctx, param, values):
+    """click callback parsing NAME=TYPE column types into a dict"""
+    import click
+
+    column_types = {}
+    for value in values:
+        name, _, column_type = value.partition('=')
+        if not name or not column_type:
+            raise click.BadParameter("{} is not of the form NAME=TYPE".format(value))
+        column_types[name] = column_type
+    return column_types
+
+
+def _convert_file(input_file, output_dir, file_index, shard_bytes, compression, header, block_mb, column_types):
+    """Stream one CSV file into Parquet shards, run in a worker process"""
+    import pyarrow as pa
+    import pyarrow.csv as pv
+    import pyarrow.parquet as pq
+
+    read_options = pv.ReadOptions(block_size=int(block_mb * 2 ** 20), autogenerate_column_names=not header)
+    convert_options = pv.ConvertOptions(
+        column_types={name: pa.type_for_alias(t) for name, t in (column_types or {}).items()}
+    )
+    reader = pv.open_csv(input_file, read_options=read_options, convert_options=convert_options)
+
+    shards = []
+    writer = sink = None
+    try:
+        for batch in reader:
+            if writer is None:
+                path = os.path.join(output_dir, 'part-{:05d}-{:05d}.parquet'.format(file_index, len(shards)))
+                sink = pa.OSFile(path, 'wb')
+                writer = pq.ParquetWriter(sink, reader.schema, compression=compression)
+                shards.append({'file': os.path.basename(path), 'rows': 0})
+            # Every batch is written as a row group, so the sink position tracks the compressed size
+            writer.write_batch(batch)
+            shards[-1]['rows'] += batch.num_rows
+            if sink.tell() >= shard_bytes:
+                writer.close()
+                sink.close()
+                writer = None
+    except pa.ArrowInvalid as e:
+        # Column types are inferred from the first block only, e.g. a column of integers there that has a
+        # decimal point further down can't be converted
+        raise ValueError("Converting {} failed after {} rows: {}. Column types are inferred from the first {} MB, "
+                         "set the types of columns whose values change further down with column_types "
+                         "(--column-type NAME=TYPE e.g. --column-type price=double)".format(
+                             input_file, sum(s['rows'] for s in shards), e, block_mb)) from None
+    finally:
+        if writer is not None:
+            writer.close()
+            sink.close()
+
+    return {'schema': reader.schema.to_string(show_schema_metadata=False), 'shards': shards}
+
+
+def reshard(output_dir, shards, shard_count, compression):
+    """
+    Rewrite shards into shard_count shards with the same number of rows, streaming row groups
+    :param output_dir: [str], directory the shards are in, they are replaced
+    :param shards: [list[dict]], 'file' and 'rows' of the shards, in order
+    :param shard_count: [int], number of shards to write
+    :param compression: [str], parquet compression codec
+    :return: [list[dict]], 'file' and 'rows' of the new shards
+    """
+    import pyarrow.parquet as pq
+
+    total_rows = sum(s['rows'] for s in shards)
+    rows_per_shard = math.ceil(total_rows / shard_count)
+    staging_dir = os.path.join(output_dir, '_resharding')
+    os.makedirs(staging_dir)
+
+    new_shards, writer = [], None
+    for shard in shards:
+        source = pq.ParquetFile(os.path.join(output_dir, shard['file']))
+        for batch in source.iter_batches():
+            while batch.num_rows:
+                if writer is None:
+                    new_shards.append({'file': 'part-{:05d}.parquet'.format(len(new_shards)), 'rows': 0})
+                    writer = pq.ParquetWriter(os.path.join(staging_dir, new_shards[-1]['file']), source.schema_arrow,
+                                              compression=compression)
+                take = min(batch.num_rows, rows_per_shard - new_shards[-1]['rows'])
+                writer.write_batch(batch.slice(0, take))
+                new_shards[-1]['rows'] += take
+                batch = batch.slice(take)
+                if new_shards[-1]['rows'] == rows_per_shard:
+                    writer.close()
+                    writer = None
+        os.remove(os.path.join(output_dir, shard['file']))
+    if writer is not None:
+        writer.close()
+
+    for shard in new_shards:
+        os.replace(os.path.join(staging_dir, shard['file']), os.path.join(output_dir, shard['file']))
+    os.rmdir(staging_dir)
+
+    return new_shards
+
+
+def prepare(input_path, output_dir, shard_size_mb=128, instance_count=None, compression='zstd', header=True,
+            workers=None, block_mb=16, overwrite=False, column_types=None):
+    """
+    Convert CSV files into Parquet shards with a manifest
+    :param input_path: [str], CSV file or directory of CSV files (.csv or .csv.gz)
+    :param output_dir: [str], directory to write shards to, replaced if it is empty or the output of an earlier run
+    :param shard_size_mb: [float, default=128], target compressed size of a shard
+    :param instance_count: [optional[int]], re-shard into a multiple of this many equal shards for ShardedByS3Key
+    :param compression: [str, default='zstd'], parquet compression codec
+    :param header: [bool, default=True], CSV files have a header row
+    :param workers: [optional[int]], processes converting files, defaults to the number of cpus
+    :param block_mb: [float, default=16], size of the CSV blocks read at a time
+    :param overwrite: [bool, default=False], replace output_dir even if it has other files
+    :param column_types: [optional[dict]], column name: arrow type name e.g. 'double' or 'string', for columns
+    whose type inferred from the first block doesn't hold for the whole file
+    :return: [dict], the manifest
+    """
+    _check_output_dir(input_path, output_dir, overwrite)
+    input_files = _csv_files(input_path)
+    if not input_files:
+        raise ValueError("No CSV files found in {}".format(input_path))
+
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.makedirs(output_dir)
+
+    shard_bytes = int(shard_size_mb * 2 ** 20)
+    try:
+        with ProcessPoolExecutor(max_workers=min(workers or os.cpu_count(), len(input_files))) as executor:
+            results = list(executor.map(
+                _convert_file,
+                input_files,
+                [output_dir] * len(input_files),
+                range(len(input_files)),
+                [shard_bytes] * len(input_files),
+                [compression] * len(input_files),
+                [header] * len(input_files),
+                [block_mb] * len(input_files),
+                [column_types] * len(input_files)
+            ))
+
+        schemas = {r['schema'] for r in results}
+        if len(schemas) > 1:
+            raise ValueError("CSV files have different schemas:\n{}".format('\n\n'.join(schemas)))
+    except Exception:
+        # Partial shards without a manifest would have to be replaced with overwrite on the next run
+        shutil.rmtree(output_dir, ignore_errors=True)
+        raise
+
+    shards = [shard for r in results for shard in r['shards']]
+    if instance_count:
+        total_bytes = sum(os.path.getsize(os.path.join(output_dir, s['file'])) for s in shards)
+        shard_count = math.ceil(max(1, math.ceil(total_bytes / shard_bytes)) / instance_count) * instance_count
+        shards = reshard(output_dir, shards, shard_count, compression)
+
+    for shard in shards:
+        shard['bytes'] = os.path.getsize(os.path.join(output_dir, shard['file']))
+    manifest = {
+        'sources': [os.path.relpath(f, input_path) if os.path.isdir(input_path) else os.path.basename(f)
+                    for f in input_files],
+        'source_bytes': sum(os.path.getsize(f) for f in input_files),
+        'schema': schemas.pop(),
+        'rows': sum(s['rows'] for s in shards),
+        'bytes': sum(s['bytes'] for s in shards),
+        'compression': compression,
+        'instance_count': instance_count,
+        'shards': shards,
+    }
+    with open(os.path.join(output_dir, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=4)
+
+    return manifest
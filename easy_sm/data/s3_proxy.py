@@ -0,0 +1,348 @@
+"""
+Local read-through caching proxy for S3, used by local processing jobs.
+
+Containers are pointed at the proxy with AWS_ENDPOINT_URL_S3, whose path starts with a random token of the
+run the proxy checks on every request, so other processes that can reach it can't use the credentials of the
+host. Only reads (GET and HEAD) are accepted, they are re-signed with the credentials of the host and
+forwarded to S3. Whole object GETs and listings are kept in a size bounded on-disk LRU
+cache: cached objects are revalidated with If-None-Match, so an unchanged object is not downloaded again,
+and when S3 can't be reached cached responses are served as they are, so jobs run offline on cached data.
+"""
+import os
+import hmac
+import json
+import shutil
+import socket
+import hashlib
+import secrets
+import tempfile
+import threading
+import subprocess
+from collections import OrderedDict
+from urllib.parse import urlsplit, parse_qsl, urlencode
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import urllib3
+from botocore.auth import S3SigV4Auth
+from botocore.awsrequest import AWSRequest
+
+from easy_sm.sagemaker import boto
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'easy_sm', 's3')
+
+# Signed again by the proxy, or only meaningful between the client and the proxy
+_REQUEST_HEADERS_NOT_FORWARDED = {
+    'host', 'authorization', 'x-amz-date', 'x-amz-content-sha256', 'x-amz-security-token', 'connection',
+    'expect', 'content-length', 'accept-encoding', 'if-none-match',
+}
+_RESPONSE_HEADERS_NOT_FORWARDED = {'connection', 'transfer-encoding', 'content-length', 'server', 'date'}
+_CACHED_RESPONSE_HEADERS = ('content-type', 'etag', 'last-modified', 'content-encoding', 'cache-control')
+_OFFLINE_ERRORS = (urllib3.exceptions.HTTPError, OSError)
+
+
+class DiskLRUCache(object):
+    """Responses on disk, the least recently used are evicted once the cache exceeds max_bytes"""
+    def __init__(self, cache_dir, max_bytes):
+        """
+        :param cache_dir: [str], directory to keep responses in
+        :param max_bytes: [int], maximum total size of cached bodies
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        # Recency survives restarts through the modification time, which is updated on every hit
+        entries = [
+            (os.path.getmtime(os.path.join(cache_dir, f)), f[:-len('.body')],
+             os.path.getsize(os.path.join(cache_dir, f)))
+            for f in os.listdir(cache_dir) if f.endswith('.body')
+        ]
+        self._entries = OrderedDict((name, size) for _, name, size in sorted(entries))
+        self.size = sum(self._entries.values())
+
+    @staticmethod
+    def _name(key):
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """
+        :param key: [str], cache key
+        :return: [optional[tuple]], (headers, body path) of the cached response
+        """
+        name = self._name(key)
+        with self._lock:
+            if name not in self._entries:
+                return None
+            self._entries.move_to_end(name)
+        body_path = os.path.join(self.cache_dir, name + '.body')
+        try:
+            with open(os.path.join(self.cache_dir, name + '.json')) as f:
+                headers = json.load(f)
+            os.utime(body_path)
+        except (OSError, ValueError):
+            return None
+        return headers, body_path
+
+    def writer(self):
+        """
+        :return: [file], temporary file to write a body to before it is added with put
+        """
+        return tempfile.NamedTemporaryFile(dir=self.cache_dir, suffix='.partial', delete=False)
+
+    def put(self, key, headers, body_file_path):
+        """
+        Add a response, evicting least recently used responses to stay within max_bytes
+        :param key: [str], cache key
+        :param headers: [dict], response headers to serve it with
+        :param body_file_path: [str], path of the complete body, from writer
+        """
+        name = self._name(key)
+        size = os.path.getsize(body_file_path)
+        if size > self.max_bytes:
+            os.remove(body_file_path)
+            return
+        with open(os.path.join(self.cache_dir, name + '.json'), 'w') as f:
+            json.dump(headers, f)
+        os.replace(body_file_path, os.path.join(self.cache_dir, name + '.body'))
+        with self._lock:
+            self.size += size - self._entries.pop(name, 0)
+            self._entries[name] = size
+            while self.size > self.max_bytes:
+                evicted, evicted_size = self._entries.popitem(last=False)
+                self.size -= evicted_size
+                for suffix in ('.body', '.json'):
+                    try:
+                        os.remove(os.path.join(self.cache_dir, evicted + suffix))
+                    except OSError:
+                        pass
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.proxy.handle(self, 'GET')
+
+    def do_HEAD(self):
+        self.server.proxy.handle(self, 'HEAD')
+
+    def _reject(self):
+        # The body is not read, the connection can't be reused
+        self.close_connection = True
+        self.send_response(405)
+        self.send_header('Allow', 'GET, HEAD')
+        self.send_header('Connection', 'close')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    do_PUT = do_POST = do_DELETE = do_PATCH = _reject
+
+
+class S3CachingProxy(object):
+    def __init__(self, aws_profile, aws_region, cache_dir=DEFAULT_CACHE_DIR, max_bytes=10 * 2 ** 30,
+                 host='127.0.0.1', port=0, upstream_url=None):
+        """
+        :param aws_profile: [str], profile whose credentials requests are signed with
+        :param aws_region: [str], region of the S3 endpoint requests are forwarded to
+        :param cache_dir: [str], directory of the on-disk cache
+        :param max_bytes: [int, default=10 GB], maximum size of the cache
+        :param host: [str, default='127.0.0.1'], address to listen on
+        :param port: [int, default=0], port to listen on, 0 picks a free one
+        :param upstream_url: [optional[str]], S3 endpoint, defaults to the regional endpoint
+        """
+        session = boto.session(aws_profile, aws_region)
+        self.credentials = session.get_credentials()
+        self.region = aws_region
+        # First segment of the path of every request, see container_options
+        self.token = secrets.token_urlsafe(32)
+        self.upstream_url = upstream_url or 'https://s3.{}.amazonaws.com'.format(aws_region)
+        self.cache = DiskLRUCache(cache_dir, max_bytes)
+        self.http = urllib3.PoolManager(maxsize=32, retries=False)
+        self.stats = {'hits': 0, 'revalidated': 0, 'misses': 0, 'offline_hits': 0, 'passed_through': 0,
+                      'errors': 0, 'bytes_from_cache': 0, 'bytes_from_s3': 0}
+        self._stats_lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.proxy = self
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def _count(self, stat, value=1):
+        with self._stats_lock:
+            self.stats[stat] += value
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _upstream(self, method, path, query, headers):
+        """Send a request to S3, signed with the credentials of the host"""
+        url = self.upstream_url + path + ('?' + query if query else '')
+        request = AWSRequest(method=method, url=url, headers=headers)
+        S3SigV4Auth(self.credentials.get_frozen_credentials(), 's3', self.region).add_auth(request)
+        prepared = request.prepare()
+        return self.http.urlopen(method, prepared.url, body=prepared.body, headers=dict(prepared.headers),
+                                 preload_content=False, redirect=False, decode_content=False)
+
+    def handle(self, handler, method):
+        split = urlsplit(handler.path)
+        token, _, path = split.path[1:].partition('/')
+        if not hmac.compare_digest(token.encode('utf-8'), self.token.encode('utf-8')):
+            self._count('errors')
+            return self._send_error(handler, 403, 'Missing or wrong token of the proxy')
+        path = '/' + path
+        # Keys of the same request are the same whatever the order of the query parameters
+        query = urlencode(sorted(parse_qsl(split.query, keep_blank_values=True)))
+        headers = {k: v for k, v in handler.headers.items() if k.lower() not in _REQUEST_HEADERS_NOT_FORWARDED}
+
+        cache_key = path + '?' + query
+        cacheable = 'range' not in {k.lower() for k in headers}
+        cached = self.cache.get(cache_key) if cacheable else None
+        if cached and cached[0].get('etag') and method == 'GET':
+            headers['If-None-Match'] = cached[0]['etag']
+
+        try:
+            response = self._upstream(method, path, query, headers)
+        except _OFFLINE_ERRORS:
+            if cached:
+                self._count('offline_hits')
+                return self._send_cached(handler, method, cached)
+            self._count('errors')
+            return self._send_error(handler, 502, 'S3 is unreachable and the response is not cached')
+
+        if response.status == 304 and cached:
+            response.release_conn()
+            self._count('revalidated')
+            return self._send_cached(handler, method, cached)
+
+        if method == 'GET' and cacheable and response.status == 200:
+            self._count('misses')
+            return self._send_and_cache(handler, response, cache_key)
+
+        if method == 'HEAD' and cached and response.status == 200 and \
+                response.headers.get('etag') == cached[0].get('etag'):
+            self._count('hits')
+        else:
+            self._count('passed_through')
+        self._send_upstream(handler, method, response)
+
+    def _send_headers(self, handler, status, headers, length):
+        handler.send_response(status)
+        for name, value in headers.items():
+            if name.lower() not in _RESPONSE_HEADERS_NOT_FORWARDED:
+                handler.send_header(name, value)
+        handler.send_header('Content-Length', str(length))
+        handler.end_headers()
+
+    def _send_cached(self, handler, method, cached):
+        headers, body_path = cached
+        size = os.path.getsize(body_path)
+        self._send_headers(handler, 200, headers, size)
+        if method == 'GET':
+            with open(body_path, 'rb') as f:
+                shutil.copyfileobj(f, handler.wfile, 2 ** 20)
+            self._count('bytes_from_cache', size)
+
+    def _send_and_cache(self, handler, response, cache_key):
+        """Stream a response to the client and into the cache at the same time"""
+        length = response.headers.get('content-length')
+        if length is None:
+            # Listings may come without a length, they are small enough to read first
+            data = response.read()
+            length, chunks = len(data), [data]
+        else:
+            length, chunks = int(length), response.stream(2 ** 20)
+        self._send_headers(handler, 200, response.headers, length)
+
+        headers = {k: response.headers[k] for k in _CACHED_RESPONSE_HEADERS if k in response.headers}
+        headers.update({k: v for k, v in response.headers.items() if k.lower().startswith('x-amz-meta-')})
+        writer = self.cache.writer()
+        try:
+            with writer:
+                for chunk in chunks:
+                    handler.wfile.write(chunk)
+                    writer.write(chunk)
+                    self._count('bytes_from_s3', len(chunk))
+            self.cache.put(cache_key, headers, writer.name)
+        finally:
+            response.release_conn()
+            if os.path.exists(writer.name):
+                os.remove(writer.name)
+
+    def _send_upstream(self, handler, method, response):
+        data = response.read() if method != 'HEAD' else b''
+        response.release_conn()
+        length = int(response.headers.get('content-length', 0)) if method == 'HEAD' else len(data)
+        self._send_headers(handler, response.status, response.headers, length)
+        if data:
+            handler.wfile.write(data)
+
+    def _send_error(self, handler, status, message):
+        body = message.encode('utf-8')
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'text/plain')
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def summary(self):
+        """One line summary of the cache hits and misses"""
+        stats = self.stats
+        return ("S3 cache: {} hits ({} revalidated, {} offline), {} misses, {} passed through, {} errors. "
+                "{} MB served from cache, {} MB downloaded, cache size {} MB").format(
+            stats['hits'] + stats['revalidated'] + stats['offline_hits'], stats['revalidated'],
+            stats['offline_hits'], stats['misses'], stats['passed_through'], stats['errors'],
+            round(stats['bytes_from_cache'] / 2 ** 20, 1), round(stats['bytes_from_s3'] / 2 ** 20, 1),
+            round(self.cache.size / 2 ** 20, 1))
+
+
+def docker_bridge_address():
+    """
+    Address of the host on the default docker network, which containers reach as host.docker.internal
+    with --add-host host.docker.internal:host-gateway. Falls back to localhost, which Docker Desktop forwards
+    :return: [str], address to listen on
+    """
+    try:
+        gateway = subprocess.check_output(
+            ["docker", "network", "inspect", "bridge", "--format", "{{(index .IPAM.Config 0).Gateway}}"],
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return '127.0.0.1'
+    # Docker Desktop reports the gateway of its VM, which is not an address of this host
+    try:
+        with socket.socket() as s:
+            s.bind((gateway, 0))
+        return gateway
+    except OSError:
+        return '127.0.0.1'
+
+
+def container_options(port, token, add_host=True):
+    """
+    docker run options pointing S3 clients in a container to the proxy
+    :param port: [int], port of the proxy
+    :param token: [str], token of the proxy, prefixed to the path of every request by S3 clients
+    :param add_host: [bool, default=True], map host.docker.internal to the host, which docker exec can't
+    :return: [list[str]], docker run options
+    """
+    options = ["--add-host", "host.docker.internal:host-gateway"] if add_host else []
+    return options + [
+        "-e", "AWS_ENDPOINT_URL_S3=http://host.docker.internal:{}/{}".format(port, token),
+    ]
@@ -0,0 +1,175 @@
+"""
+Central configuration of AWS clients: every client created from a session of this module uses adaptive
+retries, and calls are rate limited on the client side with a token bucket per API family, shared by all
+clients and threads, so bulk operations slow down instead of failing with ThrottlingException.
+Calls, retries, throttled responses and time waited for tokens are counted for the CLI summary.
+"""
+import os
+import json
+import time
+import threading
+
+import boto3
+import botocore.session
+from botocore.config import Config
+
+# Requests per second and burst of each API family, '<service>:read' for Describe/List/Get calls and
+# '<service>:write' for all others. Families without an entry are not limited, e.g. S3 which scales
+# with the number of prefixes. Point EASY_SM_API_RATE_LIMITS to a json file of {"family": [rate, burst]}
+# to change them, e.g. after a quota increase
+API_RATE_LIMITS = {
+    'sagemaker:read': (10, 20),
+    'sagemaker:write': (2, 5),
+    'logs:read': (5, 10),
+    'cloudwatch:read': (10, 20),
+    'cloudwatch:write': (5, 10),
+    'ecr:read': (10, 20),
+    'sts:read': (10, 20),
+}
+
+MAX_ATTEMPTS = 10
+
+# Threads of S3 transfers (boto3's default), the default connection pool is sized to match so transfer
+# threads don't wait for connections. Clients of concurrent downloads and invocations size their own pools
+S3_TRANSFER_CONCURRENCY = 10
+
+_READ_PREFIXES = ('Describe', 'List', 'Get', 'Head', 'Search', 'Query')
+# Error codes botocore's retry handler treats as throttling
+_THROTTLING_ERROR_CODES = {
+    'Throttling', 'ThrottlingException', 'ThrottledException', 'RequestThrottledException',
+    'TooManyRequestsException', 'ProvisionedThroughputExceededException', 'TransactionInProgressException',
+    'RequestLimitExceeded', 'BandwidthLimitExceeded', 'LimitExceededException', 'RequestThrottled', 'SlowDown',
+    'PriorRequestNotComplete', 'EC2ThrottledException',
+}
+
+
+class TokenBucket(object):
+    """Thread safe token bucket allowing rate requests per second with bursts of up to burst requests"""
+    def __init__(self, rate, burst):
+        """
+        :param rate: [float], tokens added per second
+        :param burst: [float], maximum number of tokens
+        """
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Take a token, waiting for one if there is none
+        :return: [float], seconds waited
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+
+class ApiStats(object):
+    """Counts of API calls across all clients"""
+    def __init__(self):
+        self.calls = 0
+        self.attempts = 0
+        self.throttled = 0
+        self.rate_limited_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    @property
+    def retries(self):
+        return self.attempts - self.calls
+
+    def summary(self):
+        """One line summary, None if no calls were made"""
+        if not self.calls:
+            return None
+        return "AWS API: {} calls, {} retries, {} throttled responses, {:.1f} s waited for rate limits".format(
+            self.calls, self.retries, self.throttled, self.rate_limited_seconds)
+
+
+stats = ApiStats()
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def _rate_limits():
+    limits = dict(API_RATE_LIMITS)
+    rate_limits_path = os.environ.get('EASY_SM_API_RATE_LIMITS')
+    if rate_limits_path:
+        with open(rate_limits_path) as rate_limits_file:
+            limits.update({family: tuple(limit) for family, limit in json.load(rate_limits_file).items()})
+    return limits
+
+
+def _bucket(family):
+    with _buckets_lock:
+        if family not in _buckets:
+            limit = _rate_limits().get(family)
+            _buckets[family] = TokenBucket(*limit) if limit else None
+        return _buckets[family]
+
+
+def api_family(service_name, operation_name):
+    """
+    :param service_name: [str], botocore service name e.g. sagemaker
+    :param operation_name: [str], operation name e.g. DescribeTrainingJob
+    :return: [str], family whose rate limit applies e.g. sagemaker:read
+    """
+    return '{}:{}'.format(service_name, 'read' if operation_name.startswith(_READ_PREFIXES) else 'write')
+
+
+def _before_call(model, **kwargs):
+    bucket = _bucket(api_family(model.service_model.service_name, model.name))
+    waited = bucket.acquire() if bucket else 0.0
+    stats.add(calls=1, rate_limited_seconds=waited)
+
+
+def _before_send(**kwargs):
+    stats.add(attempts=1)
+
+
+def _needs_retry(response=None, **kwargs):
+    # Only counts, whether to retry is decided by the retry handler
+    if response is not None and response[1].get('Error', {}).get('Code') in _THROTTLING_ERROR_CODES:
+        stats.add(throttled=1)
+
+
+def client_config(**kwargs):
+    """
+    Default config of clients, with adaptive retries
+    :param kwargs: other botocore Config arguments, e.g. max_pool_connections
+    :return: [botocore.config.Config]
+    """
+    kwargs.setdefault('max_pool_connections', S3_TRANSFER_CONCURRENCY)
+    return Config(retries={'mode': 'adaptive', 'total_max_attempts': MAX_ATTEMPTS}, **kwargs)
+
+
+def session(aws_profile=None, aws_region=None):
+    """
+    boto3 session whose clients use the default config, rate limits and counters of this module.
+    Config passed when creating a client is merged into the default config
+    :param aws_profile: [optional[str]], aws profile
+    :param aws_region: [optional[str]], aws region
+    :return: [boto3.Session]
+    """
+    botocore_session = botocore.session.get_session()
+    botocore_session.set_default_client_config(client_config())
+    # Handlers registered on the session are copied to every client created from it
+    botocore_session.register('before-call', _before_call)
+    botocore_session.register('before-send', _before_send)
+    botocore_session.register('needs-retry', _needs_retry)
+    return boto3.Session(botocore_session=botocore_session, profile_name=aws_profile, region_name=aws_region)
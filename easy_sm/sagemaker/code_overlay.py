@@ -0,0 +1,66 @@
+"""
+Code overlays ship the current code of the easy_sm module to cloud jobs without rebuilding the image.
+
+The module is packed into a deterministic archive, so unchanged code always has the same sha256
+and is only uploaded once, and executor.sh unpacks it over the code in the image when the job starts.
+"""
+import os
+import io
+import gzip
+import tarfile
+import hashlib
+
+# Not needed by cloud jobs, local_test can hold large test data
+_EXCLUDED_DIRS = {'__pycache__', '.git', '.ipynb_checkpoints', 'local_test'}
+_EXCLUDED_SUFFIXES = ('.pyc', '.pyo')
+
+S3_PREFIX = 'easy_sm/code-overlay'
+
+
+def build_archive(module_dir):
+    """
+    Pack a module directory into a tar.gz that is byte for byte the same for the same code
+    :param module_dir: [str], directory containing easy_sm_base
+    :return: [bytes], the archive
+    """
+    buffer = io.BytesIO()
+    # mtime=0 keeps the gzip header independent of when the archive is built
+    with gzip.GzipFile(fileobj=buffer, mode='wb', mtime=0) as compressed:
+        with tarfile.open(fileobj=compressed, mode='w', format=tarfile.PAX_FORMAT) as archive:
+            for root, dirs, files in os.walk(module_dir):
+                dirs[:] = sorted(d for d in dirs if d not in _EXCLUDED_DIRS)
+                for name in sorted(files):
+                    if name.endswith(_EXCLUDED_SUFFIXES):
+                        continue
+                    path = os.path.join(root, name)
+                    info = tarfile.TarInfo(os.path.relpath(path, module_dir))
+                    info.size = os.path.getsize(path)
+                    info.mode = 0o755 if os.access(path, os.X_OK) else 0o644
+                    info.mtime = 0
+                    with open(path, 'rb') as f:
+                        archive.addfile(info, f)
+
+    return buffer.getvalue()
+
+
+def upload(s3_client, bucket, module_dir):
+    """
+    Upload the code of a module directory to S3 under its sha256, unless it is there already
+    :param s3_client: [botocore client], s3 client
+    :param bucket: [str], bucket to upload to
+    :param module_dir: [str], directory containing easy_sm_base
+    :return: [str], S3 location of the archive
+    """
+    archive = build_archive(module_dir)
+    key = '{}/{}.tar.gz'.format(S3_PREFIX, hashlib.sha256(archive).hexdigest())
+
+    try:
+        s3_client.head_object(Bucket=bucket, Key=key)
+        print("Code overlay s3://{}/{} is already uploaded".format(bucket, key))
+    except s3_client.exceptions.ClientError as e:
+        if e.response['Error']['Code'] not in ('404', 'NoSuchKey', 'NotFound'):
+            raise
+        s3_client.put_object(Bucket=bucket, Key=key, Body=archive)
+        print("Uploaded code overlay ({} KB) to s3://{}/{}".format(len(archive) // 1024, bucket, key))
+
+    return 's3://{}/{}'.format(bucket, key)
@@ -0,0 +1,181 @@
+"""
+Download of job outputs and model artifacts from S3.
+
+Objects are fetched with concurrent ranged GETs. Archives (.tar.gz) are extracted while they download,
+parts are fetched ahead concurrently and fed to tarfile in order, so no tarball is written to disk.
+Downloads are kept in a local cache keyed by bucket, key and ETag, so fetching the same artifact again
+only copies it from the cache.
+"""
+import os
+import shutil
+import hashlib
+import tarfile
+from collections import deque
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'easy_sm', 'downloads')
+DEFAULT_PART_SIZE = 8 * 2 ** 20
+
+_ARCHIVE_SUFFIXES = ('.tar.gz', '.tgz')
+
+
+def _list_objects(s3_client, bucket, key):
+    """Objects at a key, or under it if it is a prefix, as (key, size, etag, path relative to the prefix)"""
+    if key and not key.endswith('/'):
+        try:
+            head = s3_client.head_object(Bucket=bucket, Key=key)
+            return [(key, head['ContentLength'], head['ETag'], os.path.basename(key))]
+        except s3_client.exceptions.ClientError as e:
+            if e.response['Error']['Code'] not in ('404', 'NoSuchKey', 'NotFound'):
+                raise
+        key += '/'
+
+    paginator = s3_client.get_paginator('list_objects_v2')
+    return [
+        (obj['Key'], obj['Size'], obj['ETag'], obj['Key'][len(key):])
+        for page in paginator.paginate(Bucket=bucket, Prefix=key)
+        for obj in page.get('Contents', []) if not obj['Key'].endswith('/')
+    ]
+
+
+def _ranges(size, part_size):
+    return [(offset, min(part_size, size - offset)) for offset in range(0, size, part_size)]
+
+
+class _RangedReader(object):
+    """File-like reader of an object that fetches parts ahead concurrently and returns them in order"""
+    def __init__(self, fetch, size, part_size, executor, prefetch):
+        """
+        :param fetch: [callable], fetch(offset, length) returning the bytes of a range
+        :param size: [int], object size
+        :param part_size: [int], bytes per ranged GET
+        :param executor: [ThreadPoolExecutor], executor fetching parts
+        :param prefetch: [int], parts fetched ahead, bounding memory to prefetch * part_size
+        """
+        self._fetch = fetch
+        self._ranges = deque(_ranges(size, part_size))
+        self._executor = executor
+        self._prefetch = prefetch
+        self._parts = deque()
+        self._buffer = memoryview(b'')
+        self._fill()
+
+    def _fill(self):
+        while self._ranges and len(self._parts) < self._prefetch:
+            self._parts.append(self._executor.submit(self._fetch, *self._ranges.popleft()))
+
+    def read(self, n=-1):
+        chunks = []
+        remaining = n
+        while remaining != 0:
+            if not self._buffer:
+                if not self._parts:
+                    break
+                self._buffer = memoryview(self._parts.popleft().result())
+                self._fill()
+            take = len(self._buffer) if remaining < 0 else min(remaining, len(self._buffer))
+            chunks.append(self._buffer[:take].tobytes())
+            self._buffer = self._buffer[take:]
+            if remaining > 0:
+                remaining -= take
+        return b''.join(chunks)
+
+    def close(self):
+        for part in self._parts:
+            part.cancel()
+
+
+def _copy(source, destination):
+    if os.path.isdir(source):
+        shutil.copytree(source, destination, dirs_exist_ok=True)
+    else:
+        os.makedirs(os.path.dirname(destination) or '.', exist_ok=True)
+        shutil.copy2(source, destination)
+
+
+def download(s3_client, s3_uri, output_dir, extract=True, cache_dir=DEFAULT_CACHE_DIR, part_size=DEFAULT_PART_SIZE,
+             max_workers=16):
+    """
+    Download an object or all objects under a prefix
+    :param s3_client: [botocore client], s3 client with a connection pool of at least max_workers
+    :param s3_uri: [str], S3 location of an object or prefix
+    :param output_dir: [str], local directory to download to, paths under a prefix are kept
+    :param extract: [bool, default=True], extract .tar.gz archives into output_dir instead of saving them
+    :param cache_dir: [optional[str]], local cache directory, None to not cache
+    :param part_size: [int, default=8 MB], bytes per ranged GET
+    :param max_workers: [int, default=16], concurrent GETs
+    :return: [dict], numbers of downloaded and cached objects and bytes downloaded
+    """
+    parsed = urlparse(s3_uri)
+    bucket, key = parsed.netloc, parsed.path.lstrip('/')
+    objects = _list_objects(s3_client, bucket, key)
+    if not objects:
+        raise ValueError("Nothing found at {}".format(s3_uri))
+
+    def fetcher(object_key, etag):
+        def fetch(offset, length):
+            # IfMatch fails the download if the object is replaced while its parts are fetched
+            response = s3_client.get_object(Bucket=bucket, Key=object_key, IfMatch=etag,
+                                            Range='bytes={}-{}'.format(offset, offset + length - 1))
+            return response['Body'].read()
+        return fetch
+
+    summary = {'downloaded': 0, 'cached': 0, 'bytes': 0}
+    staged = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        part_futures = []
+        for object_key, size, etag, relative_path in objects:
+            archive = extract and object_key.endswith(_ARCHIVE_SUFFIXES)
+            # Archives are extracted into output_dir itself, other objects keep their path under the prefix
+            destination = output_dir if archive else os.path.join(output_dir, relative_path)
+            entry = None
+            if cache_dir:
+                entry_key = '{}/{}:{}:{}'.format(bucket, object_key, etag, archive)
+                entry = os.path.join(cache_dir, hashlib.sha256(entry_key.encode('utf-8')).hexdigest())
+                if os.path.exists(entry):
+                    _copy(entry, destination)
+                    summary['cached'] += 1
+                    continue
+
+            target = entry + '.partial' if entry else destination
+            if entry and os.path.isdir(target):
+                # Left over from an interrupted download
+                shutil.rmtree(target)
+            summary['downloaded'] += 1
+            summary['bytes'] += size
+            if archive:
+                # Extracted one at a time, while the parts of each are fetched concurrently
+                reader = _RangedReader(fetcher(object_key, etag), size, part_size, executor, max_workers * 2)
+                try:
+                    with tarfile.open(fileobj=reader, mode='r|gz') as tar:
+                        tar.extractall(target, filter='data')
+                finally:
+                    reader.close()
+            else:
+                os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+                with open(target, 'wb') as f:
+                    f.truncate(size)
+                fetch = fetcher(object_key, etag)
+                part_futures += [executor.submit(_write_part, fetch, target, offset, length)
+                                 for offset, length in _ranges(size, part_size)]
+            staged.append((target, entry, destination))
+
+        for future in part_futures:
+            future.result()
+
+    for target, entry, destination in staged:
+        if entry:
+            # Renamed once complete, an interrupted download is never served from the cache
+            os.replace(target, entry)
+            _copy(entry, destination)
+
+    return summary
+
+
+def _write_part(fetch, path, offset, length):
+    data = fetch(offset, length)
+    with open(path, 'r+b') as f:
+        f.seek(offset)
+        f.write(data)
+
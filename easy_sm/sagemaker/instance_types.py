@@ -0,0 +1,74 @@
+import os
+import json
+
+# Indicative on-demand SageMaker prices (USD per instance hour, us-east-1) with vCPU and memory (GiB).
+# Prices differ per region and job type, point EASY_SM_PRICE_TABLE to a json file of
+# {"instance_type": usd_per_hour} to use your own prices.
+INSTANCE_TYPES = {
+    'ml.t3.medium': {'vcpu': 2, 'memory_gib': 4, 'usd_per_hour': 0.05},
+    'ml.t3.large': {'vcpu': 2, 'memory_gib': 8, 'usd_per_hour': 0.1},
+    'ml.t3.xlarge': {'vcpu': 4, 'memory_gib': 16, 'usd_per_hour': 0.2},
+    'ml.t3.2xlarge': {'vcpu': 8, 'memory_gib': 32, 'usd_per_hour': 0.399},
+    'ml.m5.large': {'vcpu': 2, 'memory_gib': 8, 'usd_per_hour': 0.115},
+    'ml.m5.xlarge': {'vcpu': 4, 'memory_gib': 16, 'usd_per_hour': 0.23},
+    'ml.m5.2xlarge': {'vcpu': 8, 'memory_gib': 32, 'usd_per_hour': 0.461},
+    'ml.m5.4xlarge': {'vcpu': 16, 'memory_gib': 64, 'usd_per_hour': 0.922},
+    'ml.m5.12xlarge': {'vcpu': 48, 'memory_gib': 192, 'usd_per_hour': 2.765},
+    'ml.m5.24xlarge': {'vcpu': 96, 'memory_gib': 384, 'usd_per_hour': 5.53},
+    'ml.c5.xlarge': {'vcpu': 4, 'memory_gib': 8, 'usd_per_hour': 0.204},
+    'ml.c5.2xlarge': {'vcpu': 8, 'memory_gib': 16, 'usd_per_hour': 0.408},
+    'ml.c5.4xlarge': {'vcpu': 16, 'memory_gib': 32, 'usd_per_hour': 0.816},
+    'ml.c5.9xlarge': {'vcpu': 36, 'memory_gib': 72, 'usd_per_hour': 1.836},
+    'ml.c5.18xlarge': {'vcpu': 72, 'memory_gib': 144, 'usd_per_hour': 3.672},
+    'ml.r5.large': {'vcpu': 2, 'memory_gib': 16, 'usd_per_hour': 0.151},
+    'ml.r5.xlarge': {'vcpu': 4, 'memory_gib': 32, 'usd_per_hour': 0.302},
+    'ml.r5.2xlarge': {'vcpu': 8, 'memory_gib': 64, 'usd_per_hour': 0.605},
+    'ml.r5.4xlarge': {'vcpu': 16, 'memory_gib': 128, 'usd_per_hour': 1.21},
+    'ml.r5.12xlarge': {'vcpu': 48, 'memory_gib': 384, 'usd_per_hour': 3.629},
+    'ml.r5.24xlarge': {'vcpu': 96, 'memory_gib': 768, 'usd_per_hour': 7.258},
+    'ml.g4dn.xlarge': {'vcpu': 4, 'memory_gib': 16, 'usd_per_hour': 0.736},
+    'ml.g4dn.2xlarge': {'vcpu': 8, 'memory_gib': 32, 'usd_per_hour': 0.94},
+    'ml.g4dn.4xlarge': {'vcpu': 16, 'memory_gib': 64, 'usd_per_hour': 1.505},
+    'ml.g4dn.8xlarge': {'vcpu': 32, 'memory_gib': 128, 'usd_per_hour': 2.72},
+    'ml.g4dn.12xlarge': {'vcpu': 48, 'memory_gib': 192, 'usd_per_hour': 4.89},
+    'ml.g5.xlarge': {'vcpu': 4, 'memory_gib': 16, 'usd_per_hour': 1.408},
+    'ml.g5.2xlarge': {'vcpu': 8, 'memory_gib': 32, 'usd_per_hour': 1.515},
+    'ml.g5.4xlarge': {'vcpu': 16, 'memory_gib': 64, 'usd_per_hour': 2.03},
+    'ml.p3.2xlarge': {'vcpu': 8, 'memory_gib': 61, 'usd_per_hour': 3.825},
+}
+
+
+def price_per_hour(instance_type):
+    """
+    Look up the on-demand price of an instance type
+    :param instance_type: [str], ec2 instance type
+    :return: [optional[float]], USD per instance hour, None if the instance type is unknown
+    """
+    price_table_path = os.environ.get('EASY_SM_PRICE_TABLE')
+    if price_table_path:
+        with open(price_table_path) as price_table_file:
+            prices = json.load(price_table_file)
+        if instance_type in prices:
+            return prices[instance_type]
+
+    return INSTANCE_TYPES.get(instance_type, {}).get('usd_per_hour')
+
+
+# Serverless inference is billed per GB-second of compute (us-east-1), the price table can override it
+# with a "serverless" entry
+SERVERLESS_USD_PER_GB_SECOND = 0.00002
+
+
+def serverless_price_per_second(memory_size_in_mb):
+    """
+    Look up the price of a serverless endpoint while processing requests
+    :param memory_size_in_mb: [int], memory size of the endpoint
+    :return: [float], USD per second of processing
+    """
+    usd_per_gb_second = SERVERLESS_USD_PER_GB_SECOND
+    price_table_path = os.environ.get('EASY_SM_PRICE_TABLE')
+    if price_table_path:
+        with open(price_table_path) as price_table_file:
+            usd_per_gb_second = json.load(price_table_file).get('serverless', usd_per_gb_second)
+
+    return usd_per_gb_second * memory_size_in_mb / 1024
@@ -0,0 +1,320 @@
+"""
+Scoring of a CSV or Parquet file through an endpoint, for files too large to load at once.
+
+The file is read in chunks of rows, rows are packed into payloads up to a byte limit and payloads are
+sent concurrently. Concurrency is increased while requests succeed and halved when the endpoint throttles.
+Predictions are written in the order of the input rows, chunk by chunk, and a progress file records the
+last written chunk so an interrupted run resumes from there.
+"""
+import os
+import json
+import time
+import random
+import asyncio
+import tempfile
+import threading
+import http.client
+from collections import deque
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from botocore.exceptions import ClientError
+
+# InvokeEndpoint accepts up to 6 MB, serverless endpoints up to 4 MB
+DEFAULT_MAX_PAYLOAD_BYTES = 4 * 2 ** 20
+
+_THROTTLING_ERRORS = ('ThrottlingException', 'ServiceUnavailable', 'ModelNotReadyException')
+
+
+class Throttled(Exception):
+    """The endpoint asked to slow down, the payload can be sent again"""
+    pass
+
+
+def http_invoker(url):
+    """
+    Invoke a serving container over HTTP, keeping one connection per thread
+    :param url: [str], invocations url e.g. http://localhost:8080/invocations
+    :return: [callable], sends a payload and returns the response body
+    """
+    parsed = urlparse(url)
+    local = threading.local()
+
+    def invoke(payload):
+        if not hasattr(local, 'connection'):
+            local.connection = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=60)
+        try:
+            local.connection.request('POST', parsed.path, body=payload, headers={'Content-Type': 'text/csv'})
+            response = local.connection.getresponse()
+            body = response.read()
+        except (OSError, http.client.HTTPException):
+            del local.connection
+            raise
+        # The container answers 503 until the model is loaded
+        if response.status in (429, 503):
+            raise Throttled('HTTP {}'.format(response.status))
+        if response.status >= 300:
+            raise RuntimeError('HTTP {}: {}'.format(response.status, body[:200]))
+        return body
+
+    return invoke
+
+
+def endpoint_invoker(runtime_client, endpoint_name):
+    """
+    Invoke a SageMaker endpoint
+    :param runtime_client: [botocore client], sagemaker-runtime client without retries, they are done here
+    :param endpoint_name: [str], name of the endpoint
+    :return: [callable], sends a payload and returns the response body
+    """
+    def invoke(payload):
+        try:
+            response = runtime_client.invoke_endpoint(EndpointName=endpoint_name, ContentType='text/csv',
+                                                      Body=payload)
+        except ClientError as e:
+            if e.response['Error']['Code'] in _THROTTLING_ERRORS:
+                raise Throttled(e.response['Error']['Code'])
+            raise
+        return response['Body'].read()
+
+    return invoke
+
+
+def read_chunks(path, chunk_rows, s3_client=None):
+    """
+    Read a CSV (without header) or Parquet file in chunks of rows
+    :param path: [str], local path or S3 uri
+    :param chunk_rows: [int], rows per chunk
+    :param s3_client: [optional[botocore client]], s3 client, required for S3 uris
+    :return: [generator], of pandas DataFrames
+    """
+    parsed = urlparse(path)
+    if parsed.scheme == 's3' and not path.endswith('.parquet'):
+        # CSV is streamed from the response body
+        body = s3_client.get_object(Bucket=parsed.netloc, Key=parsed.path.lstrip('/'))['Body']
+        yield from pd.read_csv(body, header=None, chunksize=chunk_rows)
+    elif parsed.scheme == 's3':
+        # Parquet needs random access to read the footer, it is downloaded to a temporary file first
+        with tempfile.NamedTemporaryFile(suffix='.parquet') as f:
+            s3_client.download_fileobj(parsed.netloc, parsed.path.lstrip('/'), f)
+            f.flush()
+            yield from read_chunks(f.name, chunk_rows)
+    elif path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, header=None, chunksize=chunk_rows)
+
+
+def pack_payloads(df, max_payload_bytes=DEFAULT_MAX_PAYLOAD_BYTES):
+    """
+    Pack rows into text/csv payloads of at most max_payload_bytes
+    :param df: [pandas.DataFrame], rows to pack
+    :param max_payload_bytes: [int], maximum payload size
+    :return: [list[bytes]], payloads, in the order of the rows
+    """
+    lines = df.to_csv(header=False, index=False).encode('utf-8').splitlines(keepends=True)
+    payloads, payload, size = [], [], 0
+    for line in lines:
+        if len(line) > max_payload_bytes:
+            raise ValueError("A row of {} bytes is larger than the payload limit of {} bytes".format(
+                len(line), max_payload_bytes))
+        if size + len(line) > max_payload_bytes:
+            payloads.append(b''.join(payload))
+            payload, size = [], 0
+        payload.append(line)
+        size += len(line)
+    if payload:
+        payloads.append(b''.join(payload))
+
+    return payloads
+
+
+class AdaptiveLimit(object):
+    """
+    Concurrency limit that grows by one after every `increase_after` successful requests and halves when
+    the endpoint throttles (additive increase, multiplicative decrease)
+    """
+    def __init__(self, initial, maximum, increase_after=10):
+        """
+        :param initial: [int], starting concurrency
+        :param maximum: [int], concurrency never exceeds this
+        :param increase_after: [int, default=10], successful requests per increase
+        """
+        self.limit = min(initial, maximum)
+        self.maximum = maximum
+        self.increase_after = increase_after
+        self.in_flight = 0
+        self.throttled = 0
+        self._successes = 0
+        self._generation = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self):
+        """
+        Wait until a request can be sent
+        :return: [int], generation of the limit, to pass to release
+        """
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+            return self._generation
+
+    async def release(self, generation, throttled):
+        """
+        :param generation: [int], from acquire
+        :param throttled: [bool], the request was throttled
+        """
+        async with self._condition:
+            self.in_flight -= 1
+            if throttled:
+                self.throttled += 1
+                self._successes = 0
+                # Requests sent before the last decrease don't decrease again, or a burst of throttled
+                # requests would take the limit down to 1
+                if generation == self._generation:
+                    self._generation += 1
+                    self.limit = max(1, self.limit // 2)
+            else:
+                self._successes += 1
+                if self._successes >= self.increase_after and self.limit < self.maximum:
+                    self._successes = 0
+                    self.limit += 1
+            self._condition.notify_all()
+
+
+class Progress(object):
+    """Progress file next to the output, recording how many chunks and output bytes were written to resume a run"""
+    def __init__(self, output_path, parameters):
+        """
+        :param output_path: [str], output file path
+        :param parameters: [dict], parameters of the run, progress of a run with other parameters is ignored
+        """
+        self.path = output_path + '.progress.json'
+        self.parameters = parameters
+        self.completed_chunks = 0
+        self.output_bytes = 0
+        if os.path.isfile(self.path):
+            with open(self.path) as f:
+                progress = json.load(f)
+            # Without the output written so far the run can't be resumed
+            output_bytes = os.path.getsize(output_path) if os.path.isfile(output_path) else -1
+            if progress['parameters'] == parameters and output_bytes >= progress['output_bytes']:
+                self.completed_chunks = progress['completed_chunks']
+                self.output_bytes = progress['output_bytes']
+
+    def record(self, output_bytes):
+        self.completed_chunks += 1
+        self.output_bytes = output_bytes
+        # Replaced atomically, an interruption leaves either the old or the new progress
+        with open(self.path + '.tmp', 'w') as f:
+            json.dump({'parameters': self.parameters, 'completed_chunks': self.completed_chunks,
+                       'output_bytes': self.output_bytes}, f)
+        os.replace(self.path + '.tmp', self.path)
+
+    def remove(self):
+        if os.path.isfile(self.path):
+            os.remove(self.path)
+
+
+async def _invoke(invoke, payload, limit, executor, max_attempts):
+    loop = asyncio.get_running_loop()
+    for attempt in range(max_attempts):
+        generation = await limit.acquire()
+        throttled = False
+        try:
+            return await loop.run_in_executor(executor, invoke, payload)
+        except Throttled:
+            throttled = True
+            if attempt == max_attempts - 1:
+                raise
+        finally:
+            await limit.release(generation, throttled)
+        # Full jitter backoff, so throttled requests don't come back all at once
+        await asyncio.sleep(random.uniform(0, min(20, 0.1 * 2 ** attempt)))
+
+
+async def _invoke_chunk(invoke, payloads, limit, executor, max_attempts):
+    responses = await asyncio.gather(*[_invoke(invoke, p, limit, executor, max_attempts) for p in payloads])
+    # Every row's prediction is a line, the last line of a response may not end with a newline
+    return b''.join(r if r.endswith(b'\n') or not r else r + b'\n' for r in responses)
+
+
+async def _run(chunks, invoke, output, progress, max_payload_bytes, initial_concurrency, max_concurrency,
+               max_attempts, chunks_in_flight, executor):
+    loop = asyncio.get_running_loop()
+    limit = AdaptiveLimit(initial_concurrency, max_concurrency)
+    pending = deque()
+    started = time.monotonic()
+    rows = 0
+
+    async def write_oldest():
+        nonlocal rows
+        index, chunk_rows, future = pending.popleft()
+        output.write(await future)
+        output.flush()
+        progress.record(output.tell())
+        rows += chunk_rows
+        print("Chunk {} written, {} rows in {:.0f} s, concurrency {}, {} throttled".format(
+            index, rows, time.monotonic() - started, limit.limit, limit.throttled), flush=True)
+
+    try:
+        index = 0
+        while True:
+            df = await loop.run_in_executor(None, next, chunks, None)
+            if df is None:
+                break
+            if index >= progress.completed_chunks:
+                # Chunks are scored concurrently, but only chunks_in_flight are held in memory
+                while len(pending) >= chunks_in_flight:
+                    await write_oldest()
+                payloads = pack_payloads(df, max_payload_bytes)
+                future = asyncio.ensure_future(_invoke_chunk(invoke, payloads, limit, executor, max_attempts))
+                pending.append((index, len(df), future))
+            index += 1
+        while pending:
+            await write_oldest()
+    finally:
+        for _, _, future in pending:
+            future.cancel()
+
+    return {'rows': rows, 'throttled': limit.throttled, 'concurrency': limit.limit}
+
+
+def score(input_path, output_path, invoke, chunk_rows=10000, max_payload_bytes=DEFAULT_MAX_PAYLOAD_BYTES,
+          initial_concurrency=4, max_concurrency=64, max_attempts=8, chunks_in_flight=4, s3_client=None):
+    """
+    Score a file through an endpoint, writing predictions in the order of the input rows
+    :param input_path: [str], local path or S3 uri of a CSV (without header) or Parquet file
+    :param output_path: [str], local file to write predictions to, one line per row
+    :param invoke: [callable], sends a payload and returns the response body, see http_invoker and endpoint_invoker
+    :param chunk_rows: [int, default=10000], rows read at a time
+    :param max_payload_bytes: [int, default=4 MB], maximum size of a request
+    :param initial_concurrency: [int, default=4], requests in flight at the start
+    :param max_concurrency: [int, default=64], requests in flight at most
+    :param max_attempts: [int, default=8], attempts per payload while the endpoint throttles
+    :param chunks_in_flight: [int, default=4], chunks scored at the same time
+    :param s3_client: [optional[botocore client]], s3 client, required for S3 input
+    :return: [dict], rows scored by this run, throttled requests, final concurrency and seconds
+    """
+    progress = Progress(output_path, {
+        'input_path': input_path, 'chunk_rows': chunk_rows, 'max_payload_bytes': max_payload_bytes
+    })
+    if progress.completed_chunks:
+        print("Resuming after chunk {} of an earlier run".format(progress.completed_chunks - 1))
+
+    start = time.monotonic()
+    with open(output_path, 'ab' if progress.completed_chunks else 'wb') as output:
+        # Whatever was written after the last recorded chunk is written again
+        output.truncate(progress.output_bytes)
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            result = asyncio.run(_run(
+                read_chunks(input_path, chunk_rows, s3_client), invoke, output, progress, max_payload_bytes,
+                initial_concurrency, max_concurrency, max_attempts, chunks_in_flight, executor
+            ))
+
+    progress.remove()
+    result['seconds'] = round(time.monotonic() - start, 1)
+    return result
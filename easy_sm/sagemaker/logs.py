@@ -0,0 +1,160 @@
+import time
+import queue
+import threading
+from botocore.exceptions import ClientError
+
+LOG_GROUPS = {
+    'training': '/aws/sagemaker/TrainingJobs',
+    'processing': '/aws/sagemaker/ProcessingJobs',
+    'transform': '/aws/sagemaker/TransformJobs',
+}
+
+_END = object()
+
+
+class LogTailer(object):
+    """
+    Streams CloudWatch log events of all instance streams of a SageMaker job, interleaved by timestamp.
+
+    Every log stream is read by its own thread into a bounded queue, so memory stays bounded by
+    buffer_size events per stream however far behind the consumer is. Events are merged by always
+    emitting the oldest event at the head of the queues. When following a running job, streams whose
+    reader has caught up and is waiting for new events are not waited for, so ordering across streams
+    is best effort there.
+    """
+    def __init__(
+            self,
+            logs_client,
+            log_group,
+            job_name,
+            follow=False,
+            is_job_running=None,
+            buffer_size=1000,
+            poll_interval=5
+    ):
+        """
+        :param logs_client: [botocore client], CloudWatch logs client (or anything with the same
+        describe_log_streams and get_log_events methods)
+        :param log_group: [str], log group of the job, see LOG_GROUPS
+        :param job_name: [str], name of the job
+        :param follow: [bool, default=False], keep polling for new events until the job has finished
+        :param is_job_running: [optional[callable]], returns True while the job is running, only used with follow
+        :param buffer_size: [int, default=1000], maximum number of buffered events per stream
+        :param poll_interval: [int, default=5], seconds between polls for new events and streams
+        """
+        self.logs_client = logs_client
+        self.log_group = log_group
+        self.job_name = job_name
+        self.follow = follow
+        self.is_job_running = is_job_running or (lambda: False)
+        self.buffer_size = buffer_size
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._caught_up = {}
+
+    def _stream_names(self):
+        """List the log streams of the job, following nextToken pagination"""
+        stream_names = []
+        kwargs = {'logGroupName': self.log_group, 'logStreamNamePrefix': self.job_name + '/'}
+        while True:
+            try:
+                response = self.logs_client.describe_log_streams(**kwargs)
+            except ClientError as e:
+                # Log group is only created once the first job of its kind writes logs
+                if e.response['Error']['Code'] == 'ResourceNotFoundException':
+                    return stream_names
+                raise
+            stream_names += [s['logStreamName'] for s in response['logStreams']]
+            if 'nextToken' not in response:
+                return stream_names
+            kwargs['nextToken'] = response['nextToken']
+
+    def _read_stream(self, stream_name, events):
+        """Read a log stream from the start into a bounded queue, resuming from nextForwardToken"""
+        next_token = None
+        caught_up = self._caught_up[stream_name]
+        try:
+            while not self._stop.is_set():
+                caught_up.clear()
+                kwargs = {'logGroupName': self.log_group, 'logStreamName': stream_name, 'startFromHead': True}
+                if next_token:
+                    kwargs['nextToken'] = next_token
+                response = self.logs_client.get_log_events(**kwargs)
+                for event in response['events']:
+                    self._put(events, (event['timestamp'], event['message']))
+
+                if response['nextForwardToken'] == next_token:
+                    # Caught up with the end of the stream
+                    if not self.follow or not self.is_job_running():
+                        break
+                    caught_up.set()
+                    self._stop.wait(self.poll_interval)
+                next_token = response['nextForwardToken']
+        finally:
+            self._put(events, _END)
+
+    def _put(self, events, item):
+        while not self._stop.is_set():
+            try:
+                events.put(item, timeout=1)
+                return
+            except queue.Full:
+                continue
+
+    def _start_readers(self, readers):
+        for stream_name in self._stream_names():
+            if stream_name not in readers:
+                readers[stream_name] = queue.Queue(maxsize=self.buffer_size)
+                self._caught_up[stream_name] = threading.Event()
+                threading.Thread(target=self._read_stream, args=(stream_name, readers[stream_name]), daemon=True).start()
+
+    def events(self):
+        """
+        Generate log events of the job ordered by timestamp
+        :return: [generator], of (stream name, timestamp in ms, message) tuples
+        """
+        readers = {}
+        heads = {}
+        finished = set()
+        last_discovery = 0
+        try:
+            while True:
+                if not last_discovery or (self.follow and time.monotonic() - last_discovery >= self.poll_interval):
+                    self._start_readers(readers)
+                    last_discovery = time.monotonic()
+
+                active = [name for name in readers if name not in finished]
+                if not active and not heads:
+                    if self.follow and self.is_job_running():
+                        self._stop.wait(self.poll_interval)
+                        continue
+                    # The job may have started more streams since the last discovery
+                    self._start_readers(readers)
+                    if all(name in finished for name in readers):
+                        return
+                    continue
+
+                for name in active:
+                    if name in heads:
+                        continue
+                    try:
+                        if self._caught_up[name].is_set():
+                            item = readers[name].get_nowait()
+                        else:
+                            item = readers[name].get(timeout=self.poll_interval if self.follow else None)
+                    except queue.Empty:
+                        continue
+                    if item is _END:
+                        finished.add(name)
+                    else:
+                        heads[name] = item
+
+                if heads:
+                    name = min(heads, key=lambda n: heads[n][0])
+                    timestamp, message = heads.pop(name)
+                    yield name, timestamp, message
+                elif self.follow:
+                    # All streams are caught up, wait for the readers' next poll
+                    self._stop.wait(min(1, self.poll_interval))
+        finally:
+            self._stop.set()
@@ -0,0 +1,131 @@
+"""
+Cache of training runs, so that training again with the same image, inputs and settings returns the
+model of the earlier run instead of starting a new job.
+
+Entries are json files in S3 next to the training output, <output_path>/.easy_sm-run-cache/<key>.json,
+where the key is a hash of everything that determines the model: the image digest, the ETags of all
+input objects, the instance configuration and the hyperparameters.
+"""
+import json
+import hashlib
+from urllib.parse import urlparse
+from datetime import datetime, timedelta, timezone
+
+from botocore.exceptions import ClientError
+
+CACHE_DIR = '.easy_sm-run-cache'
+
+
+def _split_s3_uri(s3_uri):
+    parsed = urlparse(s3_uri)
+    return parsed.netloc, parsed.path.lstrip('/')
+
+
+def image_digest(ecr_client, image):
+    """
+    Digest of an image in ECR, which unlike its tag changes whenever the image does
+    :param ecr_client: [botocore client], ecr client
+    :param image: [str], full image uri <account>.dkr.ecr.<region>.amazonaws.com/<repository>:<tag>
+    :return: [str], image digest
+    """
+    repository, _, tag = image.split('/', 1)[1].partition(':')
+    response = ecr_client.describe_images(repositoryName=repository, imageIds=[{'imageTag': tag or 'latest'}])
+    return response['imageDetails'][0]['imageDigest']
+
+
+def input_listing(s3_client, s3_uri):
+    """
+    Keys, sizes and ETags of all objects under an S3 location, which change whenever the input does
+    :param s3_client: [botocore client], s3 client
+    :param s3_uri: [str], S3 location of training input
+    :return: [list[list]], sorted [key, size, etag] entries
+    """
+    bucket, prefix = _split_s3_uri(s3_uri)
+    paginator = s3_client.get_paginator('list_objects_v2')
+    return sorted(
+        [obj['Key'], obj['Size'], obj['ETag']]
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix)
+        for obj in page.get('Contents', [])
+    )
+
+
+def run_key(**run):
+    """
+    Key of a training run
+    :param run: everything that determines the model, json serialisable
+    :return: [str], sha256 of the canonical json of the run
+    """
+    return hashlib.sha256(json.dumps(run, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class RunCache(object):
+    def __init__(self, s3_client, output_path, ttl_days=30):
+        """
+        :param s3_client: [botocore client], s3 client
+        :param output_path: [str], S3 location of the training output the cache is kept in
+        :param ttl_days: [float, default=30], days after which runs are trained again
+        """
+        self.s3_client = s3_client
+        self.bucket, prefix = _split_s3_uri(output_path)
+        self.prefix = '/'.join(p for p in (prefix.rstrip('/'), CACHE_DIR) if p) + '/'
+        self.ttl = timedelta(days=ttl_days)
+
+    def _model_exists(self, model_data):
+        bucket, key = _split_s3_uri(model_data)
+        response = self.s3_client.list_objects_v2(Bucket=bucket, Prefix=key, MaxKeys=1)
+        return response.get('KeyCount', 0) > 0
+
+    def get(self, key):
+        """
+        Look up a run, evicting it if it expired or its model was deleted
+        :param key: [str], from run_key
+        :return: [optional[dict]], the entry with 'model_data', 'job_name' and 'created_at'
+        """
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket, Key=self.prefix + key + '.json')
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                return None
+            raise
+        entry = json.loads(response['Body'].read())
+
+        expired = datetime.fromisoformat(entry['created_at']) + self.ttl < datetime.now(timezone.utc)
+        if expired or not self._model_exists(entry['model_data']):
+            self.s3_client.delete_object(Bucket=self.bucket, Key=self.prefix + key + '.json')
+            return None
+
+        return entry
+
+    def put(self, key, model_data, job_name, run):
+        """
+        Record the model of a run
+        :param key: [str], from run_key
+        :param model_data: [str], S3 location of the model
+        :param job_name: [str], name of the training job
+        :param run: [dict], what the key was computed from, stored for reference
+        """
+        entry = {
+            'model_data': model_data,
+            'job_name': job_name,
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'run': run,
+        }
+        self.s3_client.put_object(Bucket=self.bucket, Key=self.prefix + key + '.json',
+                                  Body=json.dumps(entry, indent=4).encode('utf-8'))
+
+    def evict_expired(self):
+        """
+        Delete entries older than the TTL
+        :return: [int], number of entries deleted
+        """
+        expired_before = datetime.now(timezone.utc) - self.ttl
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        expired = [
+            {'Key': obj['Key']}
+            for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix)
+            for obj in page.get('Contents', []) if obj['LastModified'] < expired_before
+        ]
+        for i in range(0, len(expired), 1000):
+            self.s3_client.delete_objects(Bucket=self.bucket, Delete={'Objects': expired[i:i + 1000]})
+
+        return len(expired)
@@ -1,10 +1,22 @@
 import os
+import re
 import sagemaker as sage
 from sagemaker import image_uris, payloads, model_uris
 from sagemaker.processing import ProcessingInput, ProcessingOutput
+from sagemaker.multidatamodel import MultiDataModel
 from urllib.parse import urlparse
-from datetime import datetime
-import boto3
+from datetime import datetime, timedelta, timezone
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from easy_sm.sagemaker import boto, telemetry, code_overlay, download, invoke
+from easy_sm.sagemaker.run_cache import RunCache, image_digest, input_listing, run_key
+from easy_sm.sagemaker.logs import LogTailer, LOG_GROUPS
+
+# Directory inside the training container that SageMaker syncs with checkpoint_s3_uri
+_CHECKPOINT_LOCAL_PATH = '/opt/ml/checkpoints'
+
+# Where processing jobs find the code overlay, executor.sh unpacks it from there
+_CODE_OVERLAY_PROCESSING_PATH = '/opt/ml/processing/easy_sm_code/'
 
 
 class SageMakerClient(object):
@@ -12,23 +24,27 @@ class SageMakerClient(object):
             self,
             aws_profile,
             aws_region,
-            aws_role=None
+            aws_role=None,
+            metrics_file=None
     ):
         print("Using profile {}.".format(aws_profile))
         if aws_role:
-            sts_client = boto3.client('sts')
+            sts_client = boto.session().client('sts')
             _ = sts_client.assume_role(
                     RoleArn=aws_role,
                     RoleSessionName="EasySMSession"
                 )
 
-        self.boto_session = boto3.Session(profile_name=aws_profile, region_name=aws_region)
+        # Clients created from this session, including those of the sagemaker SDK, use adaptive retries and
+        # client side rate limits
+        self.boto_session = boto.session(aws_profile, aws_region)
         self.sagemaker_session = sage.Session(boto_session=self.boto_session)
 
         self.aws_region = aws_region
         self.aws_profile = aws_profile
         self.role = sage.get_execution_role(self.sagemaker_session) if aws_role is None else aws_role
         self.sagemaker_client = self.boto_session.client('sagemaker', region_name=aws_region)
+        self.metrics_file = metrics_file
 
     def upload_data(self, input_dir, s3_dir):
         """
@@ -43,6 +59,34 @@ class SageMakerClient(object):
 
         return os.path.join('s3://', bucket, prefix)
 
+    def download(self, s3_uri, output_dir, max_workers=16, **kwargs):
+        """
+        Downloads an object or prefix from S3, extracting archives, see download.download
+        :param s3_uri: [str], S3 location of an object or prefix
+        :param output_dir: [str], local directory to download to
+        :param max_workers: [int, default=16], concurrent GETs
+        :param kwargs: other arguments of download.download
+        :return: [dict], numbers of downloaded and cached objects and bytes downloaded
+        """
+        s3_client = self.boto_session.client(
+            's3',
+            region_name=self.aws_region,
+            config=Config(max_pool_connections=max_workers)
+        )
+        return download.download(s3_client, s3_uri, output_dir, max_workers=max_workers, **kwargs)
+
+    def upload_code_overlay(self, module_dir):
+        """
+        Upload the code of the easy_sm module to the default bucket, for jobs to run instead of the code in the image
+        :param module_dir: [str], directory containing easy_sm_base
+        :return: [str], S3 location of the code overlay
+        """
+        return code_overlay.upload(
+            self.boto_session.client('s3', region_name=self.aws_region),
+            self.sagemaker_session.default_bucket(),
+            module_dir
+        )
+
     def train(
             self,
             image_name,
@@ -51,6 +95,17 @@ class SageMakerClient(object):
             instance_count,
             output_path,
             base_job_name,
+            use_spot_instances=False,
+            max_run=24 * 60 * 60,
+            max_wait=None,
+            checkpoint_s3_uri=None,
+            keep_alive_period_in_seconds=None,
+            warm_pools=None,
+            compress_model=True,
+            profile=False,
+            code_overlay_s3_uri=None,
+            run_cache_ttl_days=30,
+            force=False,
     ):
         """
         Train model on SageMaker
@@ -59,9 +114,72 @@ class SageMakerClient(object):
         :param train_instance_type: [str], ec2 instance type
         :param output_path: [str], S3 location for saving the training artefacts
         :param base_job_name: [str], Optional prefix for the SageMaker training job
+        :param use_spot_instances: [bool, default=False], use managed spot training
+        :param max_run: [int, default=86400], maximum training time in seconds
+        :param max_wait: [optional[int]], maximum seconds to wait for spot capacity plus training time.
+        Defaults to max_run for spot training
+        :param checkpoint_s3_uri: [optional[str]], S3 location that /opt/ml/checkpoints is synced to.
+        Defaults to <output_path>/checkpoints for spot training
+        :param keep_alive_period_in_seconds: [optional[int]], keep the instances in a warm pool for this long
+        after the job finishes so that subsequent jobs with the same configuration skip provisioning
+        :param warm_pools: [optional[StateManager]], local state used to find and record warm pools
+        :param compress_model: [bool, default=True], upload the model as model.tar.gz. Otherwise model files
+        are uploaded as they are under an S3 prefix, which large models can be loaded from without untarring
+        :param profile: [bool, default=False], profile training, the profile is uploaded with the job output
+        :param code_overlay_s3_uri: [optional[str]], code overlay from upload_code_overlay to run instead of
+        the code in the image
+        :param run_cache_ttl_days: [optional[float], default=30], return the model of an identical run (same image
+        digest, inputs, instance configuration and hyperparameters) from the last days instead of training.
+        None disables the run cache
+        :param force: [bool, default=False], train even if an identical run is cached, the cache is still updated
         :return: [str], the model location in S3
         """
         image = self._construct_image_location(image_name)
+        hyperparameters = {'easy_sm_profile': 'true'} if profile else None
+
+        run_cache, key, run = None, None, None
+        if run_cache_ttl_days is not None:
+            s3_client = self.boto_session.client('s3', region_name=self.aws_region)
+            try:
+                digest = image_digest(self.boto_session.client('ecr', region_name=self.aws_region), image)
+            except ClientError as e:
+                digest = None
+                print("Run cache not used, the digest of image {} is not available: {}".format(image, e))
+            if digest:
+                run = {
+                    'image_digest': digest,
+                    'inputs': input_listing(s3_client, input_s3_data_location),
+                    'instance_type': train_instance_type,
+                    'instance_count': instance_count,
+                    'hyperparameters': hyperparameters,
+                    'code_overlay': code_overlay_s3_uri,
+                    'compress_model': compress_model,
+                }
+                key = run_key(**run)
+                run_cache = RunCache(s3_client, output_path, ttl_days=run_cache_ttl_days)
+                entry = None if force else run_cache.get(key)
+                if entry:
+                    print("Identical training job {} from {} already produced a model, not training again. "
+                          "Use --force to train anyway".format(entry['job_name'], entry['created_at']))
+                    return entry['model_data']
+
+        if keep_alive_period_in_seconds and use_spot_instances:
+            raise ValueError("Warm pools are not supported with spot training")
+
+        # Spot jobs can't run in a warm pool, a pool recorded by an earlier on-demand job is not inherited
+        if warm_pools is not None and not use_spot_instances:
+            pool = warm_pools.find_warm_pool(image, train_instance_type, instance_count)
+            if pool and self._check_warm_pool_available(pool['job_name']):
+                print("Reusing warm pool retained by training job {}".format(pool['job_name']))
+                keep_alive_period_in_seconds = keep_alive_period_in_seconds or pool['keep_alive_period_in_seconds']
+            elif pool:
+                warm_pools.remove_warm_pool(pool['job_name'])
+
+        if use_spot_instances:
+            max_wait = max_wait or max_run
+            if max_wait < max_run:
+                raise ValueError("max_wait ({}) must be at least max_run ({})".format(max_wait, max_run))
+            checkpoint_s3_uri = checkpoint_s3_uri or os.path.join(output_path, 'checkpoints')
 
         estimator = sage.estimator.Estimator(
             image_uri=image,
@@ -73,31 +191,116 @@ class SageMakerClient(object):
             code_location=output_path,
             base_job_name=base_job_name,
             sagemaker_session=self.sagemaker_session,
+            use_spot_instances=use_spot_instances,
+            max_run=max_run,
+            max_wait=max_wait if use_spot_instances else None,
+            checkpoint_s3_uri=checkpoint_s3_uri,
+            checkpoint_local_path=_CHECKPOINT_LOCAL_PATH if checkpoint_s3_uri else None,
+            keep_alive_period_in_seconds=keep_alive_period_in_seconds,
+            disable_output_compression=not compress_model,
+            hyperparameters=hyperparameters,
         )
 
-        estimator.fit(input_s3_data_location)
+        try:
+            if code_overlay_s3_uri:
+                # Mounted at /opt/ml/input/data/code
+                estimator.fit({'training': input_s3_data_location, 'code': code_overlay_s3_uri})
+            else:
+                estimator.fit(input_s3_data_location)
+        finally:
+            # fit raises for failed and stopped jobs, which are recorded too
+            if estimator.latest_training_job is not None:
+                job_description = self._record_job_metrics('training', estimator.latest_training_job.name)
+
+        if keep_alive_period_in_seconds and warm_pools is not None:
+            warm_pools.set_warm_pool(
+                image,
+                train_instance_type,
+                instance_count,
+                job_description['TrainingJobName'],
+                keep_alive_period_in_seconds,
+                job_description['TrainingEndTime'] + timedelta(seconds=keep_alive_period_in_seconds)
+            )
+
+        model_data = estimator.model_data
+        if isinstance(model_data, dict):
+            # Uncompressed model, point to the S3 prefix containing the model files
+            model_data = model_data['S3DataSource']['S3Uri']
+
+        if run_cache is not None:
+            run_cache.put(key, model_data, job_description['TrainingJobName'], run)
+            run_cache.evict_expired()
+
+        return model_data
 
-        return estimator.model_data
+    @staticmethod
+    def _model_data_source(s3_model_location):
+        """
+        Model data for a model location in S3
+        :param s3_model_location: [str], S3 location of model.tar.gz or of a prefix with uncompressed model files
+        :return: [str or dict], model data as accepted by sagemaker.Model
+        """
+        if s3_model_location.endswith('.tar.gz'):
+            return s3_model_location
+
+        # SageMaker hosting requires a trailing slash for uncompressed model data
+        return {
+            "S3DataSource": {
+                "S3Uri": s3_model_location.rstrip('/') + '/',
+                "S3DataType": "S3Prefix",
+                "CompressionType": "None",
+            }
+        }
+
+    def _check_warm_pool_available(self, job_name: str) -> bool:
+        """Check if the warm pool retained by a training job can be reused"""
+        job_description = self.sagemaker_client.describe_training_job(TrainingJobName=job_name)
+        return job_description.get('WarmPoolStatus', {}).get('Status') == 'Available'
+
+    def _record_job_metrics(self, job_type, job_name):
+        """
+        Collect timing and cost metrics of a finished job, append them to the metrics file and print a summary
+        :param job_type: [str], one of 'training', 'processing', 'transform'
+        :param job_name: [str], name of the job
+        :return: [dict], the job description
+        """
+        job_description = self._describe_job(job_type, job_name)
+        telemetry.emit(telemetry.job_metrics(job_type, job_description), self.metrics_file)
+        return job_description
 
     def deploy_serverless(
             self,
             image_name,
             s3_model_location,
             memory_size_in_mb,
-            endpoint_name=None
+            endpoint_name=None,
+            deployment_config=None
     ):
         """
         Deploy model to SageMaker
         :param image_name: [str], name of Docker image
-        :param s3_model_location: [str], model location in S3
+        :param s3_model_location: [str], location of model.tar.gz or of a prefix of uncompressed model files in S3
         :param memory_size_in_mb: [str],
         :param endpoint_name: [optional[str]], Optional name for the SageMaker endpoint
+        :param deployment_config: [optional[dict]], guardrails for updating an existing endpoint,
+        see SageMakerClient.deployment_config. Only all-at-once traffic routing, serverless endpoints have no
+        instance capacity to shift in canary or linear steps
 
         :return: [str], endpoint name
         """
+        endpoint_exists = self._check_endpoint_exists(endpoint_name)
+        if deployment_config:
+            if not endpoint_exists:
+                raise ValueError(f"Endpoint {endpoint_name} does not exist, deployment guardrails only apply to "
+                                 f"updates of an existing endpoint")
+            traffic_routing = deployment_config['BlueGreenUpdatePolicy']['TrafficRoutingConfiguration']['Type']
+            if traffic_routing != 'ALL_AT_ONCE':
+                raise ValueError(f"{traffic_routing} traffic routing shifts instance capacity, serverless endpoints "
+                                 f"only support ALL_AT_ONCE")
+
         image = self._construct_image_location(image_name)
         model = sage.Model(
-            model_data=s3_model_location,
+            model_data=self._model_data_source(s3_model_location),
             image_uri=image,
             role=self.role,
             sagemaker_session=self.sagemaker_session,
@@ -105,7 +308,7 @@ class SageMakerClient(object):
         model.create()
         model_name = model.name
 
-        if not self._check_endpoint_exists(endpoint_name):
+        if not endpoint_exists:
 
             endpoint_config_name = f"{endpoint_name}-{datetime.now().strftime('%Y-%m-%dT%H-%M-%S')}"
             _ = self._create_serverless_epc(
@@ -132,11 +335,134 @@ class SageMakerClient(object):
                 5
             )
 
-            _ = self.sagemaker_client.update_endpoint(EndpointName=endpoint_name, EndpointConfigName=endpoint_config_name)
-
-            print(f"Update in progress for serverless endpoint: {endpoint_name}")
+            if deployment_config:
+                _ = self.sagemaker_client.update_endpoint(
+                    EndpointName=endpoint_name,
+                    EndpointConfigName=endpoint_config_name,
+                    DeploymentConfig=deployment_config
+                )
+                traffic_routing = deployment_config['BlueGreenUpdatePolicy']['TrafficRoutingConfiguration']['Type']
+                print(f"Blue/green update ({traffic_routing}) in progress for serverless endpoint: {endpoint_name}")
+            else:
+                _ = self.sagemaker_client.update_endpoint(
+                    EndpointName=endpoint_name,
+                    EndpointConfigName=endpoint_config_name
+                )
+                print(f"Update in progress for serverless endpoint: {endpoint_name}")
             return endpoint_name
 
+    @staticmethod
+    def deployment_config(traffic_routing='ALL_AT_ONCE', step_percent=10, wait_interval_in_seconds=300,
+                          termination_wait_in_seconds=600, alarm_names=None):
+        """
+        Guardrails for an endpoint update: traffic shifts from the old to the new fleet in steps, and the update is
+        rolled back if any of the alarms goes off while shifting or while baking
+        :param traffic_routing: [str, default='ALL_AT_ONCE'], one of 'ALL_AT_ONCE', 'CANARY', 'LINEAR', the latter
+        two only for endpoints backed by instances
+        :param step_percent: [int, default=10], share of capacity of the canary, or of each linear step
+        :param wait_interval_in_seconds: [int, default=300], seconds between traffic shifting steps
+        :param termination_wait_in_seconds: [int, default=600], seconds the new fleet bakes with all traffic
+        before the old fleet is terminated
+        :param alarm_names: [optional[list[str]]], CloudWatch alarms that trigger a rollback
+        :return: [dict], DeploymentConfig for update_endpoint
+        """
+        traffic_routing_config = {'Type': traffic_routing, 'WaitIntervalInSeconds': wait_interval_in_seconds}
+        step_size = {'Type': 'CAPACITY_PERCENT', 'Value': step_percent}
+        if traffic_routing == 'CANARY':
+            traffic_routing_config['CanarySize'] = step_size
+        elif traffic_routing == 'LINEAR':
+            traffic_routing_config['LinearStepSize'] = step_size
+
+        deployment_config = {
+            'BlueGreenUpdatePolicy': {
+                'TrafficRoutingConfiguration': traffic_routing_config,
+                'TerminationWaitInSeconds': termination_wait_in_seconds,
+            }
+        }
+        if alarm_names:
+            deployment_config['AutoRollbackConfiguration'] = {'Alarms': [{'AlarmName': a} for a in alarm_names]}
+
+        return deployment_config
+
+    def create_rollback_alarms(self, endpoint_name, p99_latency_ms=None, max_5xx_errors=None):
+        """
+        Create (or update) CloudWatch alarms on an endpoint to roll back deployments with
+        :param endpoint_name: [str], name of the endpoint
+        :param p99_latency_ms: [optional[float]], alarm when p99 model latency of a minute exceeds this
+        :param max_5xx_errors: [optional[int]], alarm when a minute has more 5xx errors than this
+        :return: [list[str]], names of the alarms
+        """
+        cloudwatch_client = self.boto_session.client('cloudwatch', region_name=self.aws_region)
+        dimensions = [{'Name': 'EndpointName', 'Value': endpoint_name},
+                      {'Name': 'VariantName', 'Value': 'AllTraffic'}]
+        alarm_names = []
+        if p99_latency_ms is not None:
+            alarm_names.append(f"{endpoint_name}-p99-model-latency")
+            cloudwatch_client.put_metric_alarm(
+                AlarmName=alarm_names[-1],
+                Namespace='AWS/SageMaker',
+                MetricName='ModelLatency',
+                Dimensions=dimensions,
+                ExtendedStatistic='p99',
+                Period=60,
+                EvaluationPeriods=1,
+                Threshold=p99_latency_ms * 1000,  # ModelLatency is in microseconds
+                ComparisonOperator='GreaterThanThreshold',
+                TreatMissingData='notBreaching'
+            )
+        if max_5xx_errors is not None:
+            alarm_names.append(f"{endpoint_name}-5xx-errors")
+            cloudwatch_client.put_metric_alarm(
+                AlarmName=alarm_names[-1],
+                Namespace='AWS/SageMaker',
+                MetricName='Invocation5XXErrors',
+                Dimensions=dimensions,
+                Statistic='Sum',
+                Period=60,
+                EvaluationPeriods=1,
+                Threshold=max_5xx_errors,
+                ComparisonOperator='GreaterThanThreshold',
+                TreatMissingData='notBreaching'
+            )
+
+        return alarm_names
+
+    def rollback_endpoint(self, endpoint_name, endpoint_config_name=None):
+        """
+        Restore the endpoint config an endpoint was deployed with before the current one
+        :param endpoint_name: [str], name of the endpoint
+        :param endpoint_config_name: [optional[str]], endpoint config to restore instead of the previous one
+        :return: [str], name of the restored endpoint config
+        """
+        endpoint = self.sagemaker_client.describe_endpoint(EndpointName=endpoint_name)
+        current_config_name = endpoint['EndpointConfigName']
+
+        if endpoint_config_name is None:
+            # Every deployment creates a new config named <endpoint name>-<timestamp>
+            pattern = re.compile(re.escape(endpoint_name) + r'-\d{4}-\d{2}-\d{2}T\d{2}-\d{2}-\d{2}$')
+            paginator = self.sagemaker_client.get_paginator('list_endpoint_configs')
+            config_names = sorted(
+                config['EndpointConfigName']
+                for page in paginator.paginate(NameContains=endpoint_name)
+                for config in page['EndpointConfigs'] if pattern.match(config['EndpointConfigName'])
+            )
+            previous_config_names = [name for name in config_names if name < current_config_name]
+            if not previous_config_names:
+                raise ValueError("No endpoint config older than {} found for endpoint {}".format(
+                    current_config_name, endpoint_name))
+            endpoint_config_name = previous_config_names[-1]
+
+        print(f"Rolling back endpoint {endpoint_name} from {current_config_name} to {endpoint_config_name}")
+        self.sagemaker_client.update_endpoint(EndpointName=endpoint_name, EndpointConfigName=endpoint_config_name)
+        return endpoint_config_name
+
+    def endpoint_exists(self, endpoint_name):
+        """
+        :param endpoint_name: [str], name of the endpoint
+        :return: [bool], whether the endpoint exists
+        """
+        return self._check_endpoint_exists(endpoint_name)
+
     def _check_endpoint_exists(self, endpoint_name: str) -> bool:
         """Check if an endpoint already exists"""
         response_blob = self.sagemaker_client.list_endpoints()
@@ -170,6 +496,59 @@ class SageMakerClient(object):
 
         return create_endpoint_config_response
 
+    def deploy_multi_model(
+            self,
+            image_name,
+            s3_model_prefix,
+            instance_type,
+            instance_count,
+            endpoint_name
+    ):
+        """
+        Deploy all models under an S3 prefix to a multi model endpoint. Models are loaded on demand
+        when invoked with TargetModel set to their path relative to the prefix, e.g. customer-a/model.tar.gz
+        :param image_name: [str], name of Docker image
+        :param s3_model_prefix: [str], S3 prefix containing the model.tar.gz files
+        :param instance_type: [str], ec2 instance type
+        :param instance_count: [int], number of ec2 instances
+        :param endpoint_name: [str], name for the SageMaker endpoint
+
+        :return: [str], endpoint name
+        """
+        image = self._construct_image_location(image_name)
+        model = MultiDataModel(
+            name=f"{endpoint_name}-{datetime.now().strftime('%Y-%m-%dT%H-%M-%S')}",
+            model_data_prefix=s3_model_prefix.rstrip('/') + '/',
+            image_uri=image,
+            role=self.role,
+            env={'EASY_SM_MULTI_MODEL': 'true'},
+            sagemaker_session=self.sagemaker_session,
+        )
+        model.create()
+
+        endpoint_config_name = f"{endpoint_name}-{datetime.now().strftime('%Y-%m-%dT%H-%M-%S')}"
+        _ = self.sagemaker_client.create_endpoint_config(
+            EndpointConfigName=endpoint_config_name,
+            ProductionVariants=[
+                {
+                    "ModelName": model.name,
+                    "VariantName": "AllTraffic",
+                    "InitialInstanceCount": instance_count,
+                    "InstanceType": instance_type,
+                }
+            ],
+        )
+
+        if not self._check_endpoint_exists(endpoint_name):
+            _ = self.sagemaker_client.create_endpoint(EndpointName=endpoint_name, EndpointConfigName=endpoint_config_name)
+            print(f"Creation in progress for multi model endpoint: {endpoint_name}")
+        else:
+            print(f"Multi model endpoint: {endpoint_name} already exists, updating...")
+            _ = self.sagemaker_client.update_endpoint(EndpointName=endpoint_name, EndpointConfigName=endpoint_config_name)
+            print(f"Update in progress for multi model endpoint: {endpoint_name}")
+
+        return endpoint_name
+
     def batch_transform(
             self,
             image_name,
@@ -198,7 +577,7 @@ class SageMakerClient(object):
         image = self._construct_image_location(image_name)
 
         model = sage.Model(
-            model_data=s3_model_location,
+            model_data=self._model_data_source(s3_model_location),
             image_uri=image,
             role=self.role,
             sagemaker_session=self.sagemaker_session
@@ -225,10 +604,137 @@ class SageMakerClient(object):
                 pass
             finally:
                 job_name = transformer.latest_transform_job.job_name
-                job_description = self.sagemaker_client.describe_transform_job(TransformJobName=job_name)
+                job_description = self._record_job_metrics('transform', job_name)
 
             return job_description['TransformJobStatus']
 
+    def _describe_job(self, job_type, job_name):
+        if job_type == 'training':
+            return self.sagemaker_client.describe_training_job(TrainingJobName=job_name)
+        elif job_type == 'processing':
+            return self.sagemaker_client.describe_processing_job(ProcessingJobName=job_name)
+        elif job_type == 'transform':
+            return self.sagemaker_client.describe_transform_job(TransformJobName=job_name)
+        raise ValueError("Unknown job type: {}".format(job_type))
+
+    def _job_type(self, job_name):
+        """Find whether a job is a training, processing or transform job"""
+        for job_type in LOG_GROUPS:
+            try:
+                self._describe_job(job_type, job_name)
+                return job_type
+            except ClientError:
+                continue
+        raise ValueError("No training, processing or transform job named: {}".format(job_name))
+
+    def _is_job_running(self, job_type, job_name):
+        status_key = {'training': 'TrainingJobStatus', 'processing': 'ProcessingJobStatus',
+                      'transform': 'TransformJobStatus'}[job_type]
+        return self._describe_job(job_type, job_name)[status_key] in ('InProgress', 'Stopping')
+
+    def tail_logs(self, job_name, job_type=None, follow=False, buffer_size=1000, poll_interval=5):
+        """
+        Stream CloudWatch log events of all instances of a job, interleaved by timestamp
+        :param job_name: [str], name of the training, processing or transform job
+        :param job_type: [optional[str]], one of 'training', 'processing', 'transform'. Looked up if not given
+        :param follow: [bool, default=False], keep streaming new events until the job has finished
+        :param buffer_size: [int, default=1000], maximum number of buffered events per instance stream
+        :param poll_interval: [int, default=5], seconds between polls for new events
+        :return: [generator], of (stream name, timestamp in ms, message) tuples
+        """
+        job_type = job_type or self._job_type(job_name)
+        tailer = LogTailer(
+            self.boto_session.client('logs', region_name=self.aws_region),
+            LOG_GROUPS[job_type],
+            job_name,
+            follow=follow,
+            is_job_running=lambda: self._is_job_running(job_type, job_name),
+            buffer_size=buffer_size,
+            poll_interval=poll_interval
+        )
+        return tailer.events()
+
+    def bench_endpoint(self, endpoint_name, payloads, levels, mode='closed', stage_seconds=30, latency_slo_ms=None):
+        """
+        Load test an endpoint and recommend serverless settings
+        :param endpoint_name: [str], name of the endpoint
+        :param payloads: [list[bytes]], text/csv payloads to send in turn
+        :param levels: [list[int]], concurrency levels (closed loop) or request rates per second (open loop)
+        :param mode: [str, default='closed'], 'closed' or 'open' loop
+        :param stage_seconds: [float, default=30], duration of each stage
+        :param latency_slo_ms: [optional[float]], p99 latency that must not be exceeded
+        :return: [tuple], (stages, recommendation)
+        """
+        from easy_sm.bench import load_test
+
+        runtime_client = self.boto_session.client(
+            'sagemaker-runtime',
+            region_name=self.aws_region,
+            config=Config(max_pool_connections=max(levels) if mode == 'closed' else 256,
+                          retries={'max_attempts': 1})  # Throttling has to show up as errors, not as latency
+        )
+        start = datetime.now(timezone.utc)
+        stages = load_test.run(load_test.endpoint_sender(runtime_client, endpoint_name), payloads, levels,
+                               mode=mode, stage_seconds=stage_seconds)
+
+        serverless_config = self._serverless_config(endpoint_name)
+        peak_memory_mb = None
+        if serverless_config:
+            utilization = self._max_memory_utilization(endpoint_name, start, datetime.now(timezone.utc))
+            if utilization is not None:
+                peak_memory_mb = round(serverless_config['MemorySizeInMB'] * utilization / 100, 1)
+            else:
+                print("Memory utilization is not in CloudWatch yet, no MemorySizeInMB recommendation")
+
+        recommendation = load_test.recommend(stages, latency_slo_ms=latency_slo_ms, peak_memory_mb=peak_memory_mb)
+        recommendation['current_serverless_config'] = serverless_config
+        return stages, recommendation
+
+    def score_file(self, endpoint_name, input_path, output_path, max_concurrency=64, **kwargs):
+        """
+        Score a CSV or Parquet file through an endpoint, see invoke.score
+        :param endpoint_name: [str], name of the endpoint
+        :param input_path: [str], local path or S3 uri of the input
+        :param output_path: [str], local file to write predictions to
+        :param max_concurrency: [int, default=64], requests in flight at most
+        :param kwargs: other arguments of invoke.score
+        :return: [dict], summary of the run
+        """
+        runtime_client = self.boto_session.client(
+            'sagemaker-runtime',
+            region_name=self.aws_region,
+            config=Config(max_pool_connections=max_concurrency,
+                          retries={'max_attempts': 1})  # Throttled requests are retried with less concurrency
+        )
+        return invoke.score(
+            input_path,
+            output_path,
+            invoke.endpoint_invoker(runtime_client, endpoint_name),
+            max_concurrency=max_concurrency,
+            s3_client=self.boto_session.client('s3', region_name=self.aws_region),
+            **kwargs
+        )
+
+    def _serverless_config(self, endpoint_name):
+        endpoint = self.sagemaker_client.describe_endpoint(EndpointName=endpoint_name)
+        endpoint_config = self.sagemaker_client.describe_endpoint_config(
+            EndpointConfigName=endpoint['EndpointConfigName'])
+        return endpoint_config['ProductionVariants'][0].get('ServerlessConfig')
+
+    def _max_memory_utilization(self, endpoint_name, start, end):
+        response = self.boto_session.client('cloudwatch', region_name=self.aws_region).get_metric_statistics(
+            Namespace='/aws/sagemaker/Endpoints',
+            MetricName='MemoryUtilization',
+            Dimensions=[{'Name': 'EndpointName', 'Value': endpoint_name},
+                        {'Name': 'VariantName', 'Value': 'AllTraffic'}],
+            StartTime=start - timedelta(minutes=1),
+            EndTime=end + timedelta(minutes=1),
+            Period=60,
+            Statistics=['Maximum']
+        )
+        datapoints = response['Datapoints']
+        return max(d['Maximum'] for d in datapoints) if datapoints else None
+
     def shutdown_endpoint(self, endpoint_name):
         """
         Shuts down a SageMaker endpoint.
@@ -274,7 +780,9 @@ class SageMakerClient(object):
             input_sharded,
             s3_output_location,
             base_job_name,
-
+            input_channels=None,
+            output_channels=None,
+            code_overlay_s3_uri=None,
     ):
         """
         Process python file on SageMaker
@@ -284,43 +792,22 @@ class SageMakerClient(object):
         :param s3_input_location: [str], S3 input data location
         :param s3_output_location: [str], S3 output data location
         :param base_job_name: [str], Optional prefix for the SageMaker processing job
+        :param input_channels: [optional[list[dict]]], additional named inputs, see _processing_inputs
+        :param output_channels: [optional[list[dict]]], additional named outputs, see _processing_outputs
+        :param code_overlay_s3_uri: [optional[str]], code overlay from upload_code_overlay to run instead of
+        the code in the image
         :return: None
         """
-        image = self._construct_image_location(image_name)
-
-        proc = sage.processing.Processor(
-            image_uri=image,
-            role=self.role,
-            instance_count=instance_count,
-            instance_type=processing_instance_type,
-            base_job_name=base_job_name,
-            sagemaker_session=self.sagemaker_session,
+        self._run_processor(
+            image_name,
+            processing_instance_type,
+            instance_count,
+            base_job_name,
+            ['process', f'{file}'],
+            self._processing_inputs(s3_input_location, input_sharded, input_channels, code_overlay_s3_uri),
+            self._processing_outputs(s3_output_location, output_channels),
         )
 
-        dist_map = {True: 'ShardedByS3Key', False: 'FullyReplicated'}
-        if s3_output_location:
-            proc_out = [
-            ProcessingOutput(
-                output_name="proc_out",
-                source="/opt/ml/processing/output/",
-                destination=s3_output_location,
-            )]
-        else:
-            proc_out = None
-
-        if s3_input_location:
-            proc_in = [
-            ProcessingInput(
-                input_name="proc_in",
-                source=s3_input_location,
-                destination="/opt/ml/processing/input/",
-                s3_data_distribution_type=dist_map[input_sharded],
-            )]
-        else:
-            proc_in = None
-
-        proc.run(wait=True, arguments=['process', f'{file}'], inputs=proc_in, outputs=proc_out)
-
         return None
 
 
@@ -334,6 +821,9 @@ class SageMakerClient(object):
             input_sharded,
             s3_output_location,
             base_job_name,
+            input_channels=None,
+            output_channels=None,
+            code_overlay_s3_uri=None,
     ):
         """
         build make targets defined in a Makefile in easy_sm_base/processing on Sagemaker
@@ -343,8 +833,27 @@ class SageMakerClient(object):
         :param s3_input_location: [str], S3 input data location
         :param s3_output_location: [str], S3 output data location
         :param base_job_name: [str], Optional prefix for the SageMaker processing job
+        :param input_channels: [optional[list[dict]]], additional named inputs, see _processing_inputs
+        :param output_channels: [optional[list[dict]]], additional named outputs, see _processing_outputs
+        :param code_overlay_s3_uri: [optional[str]], code overlay from upload_code_overlay to run instead of
+        the code in the image
         :return: None
         """
+        self._run_processor(
+            image_name,
+            processing_instance_type,
+            instance_count,
+            base_job_name,
+            ['make', f'{target}'],
+            self._processing_inputs(s3_input_location, input_sharded, input_channels, code_overlay_s3_uri),
+            self._processing_outputs(s3_output_location, output_channels),
+        )
+
+        return None
+
+    def _run_processor(self, image_name, processing_instance_type, instance_count, base_job_name, arguments,
+                       inputs, outputs):
+        """Run a processing job with the image entrypoint called with given arguments and wait for it"""
         image = self._construct_image_location(image_name)
 
         proc = sage.processing.Processor(
@@ -356,29 +865,88 @@ class SageMakerClient(object):
             sagemaker_session=self.sagemaker_session,
         )
 
-        dist_map = {True: 'ShardedByS3Key', False: 'FullyReplicated'}
+        try:
+            proc.run(wait=True, arguments=arguments, inputs=inputs or None, outputs=outputs or None)
+        finally:
+            # run raises for failed and stopped jobs, which are recorded too
+            if proc.latest_job is not None:
+                self._record_job_metrics('processing', proc.latest_job.job_name)
 
-        if s3_output_location:
-            proc_out = [
-            ProcessingOutput(
-                output_name="proc_out",
-                source="/opt/ml/processing/output/",
-                destination=s3_output_location,
-            )]
-        else:
-            proc_out = None
+    @staticmethod
+    def _processing_inputs(s3_input_location, input_sharded, input_channels=None, code_overlay_s3_uri=None):
+        """
+        Build processing inputs. The default input is mounted at /opt/ml/processing/input/, alternatively
+        every named channel is mounted at /opt/ml/processing/input/<name>/
+        :param s3_input_location: [optional[str]], S3 location of the default input
+        :param input_sharded: [bool], distribute default input files across instances
+        :param input_channels: [optional[list[dict]]], named inputs as dicts with keys
+        'name', 's3_uri', 'sharded' (distribute files across instances) and 'pipe' (stream with Pipe mode)
+        :param code_overlay_s3_uri: [optional[str]], code overlay, mounted outside of the inputs
+        :return: [list[ProcessingInput]]
+        """
+        if s3_input_location and input_channels:
+            raise ValueError("Named input channels are mounted inside the default input, use either of them")
 
+        dist_map = {True: 'ShardedByS3Key', False: 'FullyReplicated'}
+        inputs = []
         if s3_input_location:
-            proc_in = [
-            ProcessingInput(
-                input_name="proc_in",
-                source=s3_input_location,
-                destination="/opt/ml/processing/input/",
-                s3_data_distribution_type=dist_map[input_sharded],
-            )]
-        else:
-            proc_in = None
+            inputs.append(
+                ProcessingInput(
+                    input_name="proc_in",
+                    source=s3_input_location,
+                    destination="/opt/ml/processing/input/",
+                    s3_data_distribution_type=dist_map[input_sharded],
+                ))
+
+        for channel in input_channels or []:
+            inputs.append(
+                ProcessingInput(
+                    input_name=channel['name'],
+                    source=channel['s3_uri'],
+                    destination=f"/opt/ml/processing/input/{channel['name']}/",
+                    s3_data_distribution_type=dist_map[channel.get('sharded', False)],
+                    s3_input_mode='Pipe' if channel.get('pipe', False) else 'File',
+                ))
+
+        if code_overlay_s3_uri:
+            inputs.append(
+                ProcessingInput(
+                    input_name="easy_sm_code",
+                    source=code_overlay_s3_uri,
+                    destination=_CODE_OVERLAY_PROCESSING_PATH,
+                ))
+
+        return inputs
 
-        proc.run(wait=True, arguments=['make', f'{target}'], inputs=proc_in, outputs=proc_out)
+    @staticmethod
+    def _processing_outputs(s3_output_location, output_channels=None):
+        """
+        Build processing outputs. The default output is uploaded from /opt/ml/processing/output/, alternatively
+        every named channel is uploaded from /opt/ml/processing/output/<name>/
+        :param s3_output_location: [optional[str]], S3 location of the default output
+        :param output_channels: [optional[list[dict]]], named outputs as dicts with keys
+        'name', 's3_uri' and 'continuous' (upload files as they are written instead of at the end of the job)
+        :return: [list[ProcessingOutput]]
+        """
+        if s3_output_location and output_channels:
+            raise ValueError("Named output channels are located inside the default output, use either of them")
 
-        return None
\ No newline at end of file
+        outputs = []
+        if s3_output_location:
+            outputs.append(
+                ProcessingOutput(
+                    output_name="proc_out",
+                    source="/opt/ml/processing/output/",
+                    destination=s3_output_location,
+                ))
+
+        for channel in output_channels or []:
+            outputs.append(
+                ProcessingOutput(
+                    output_name=channel['name'],
+                    source=f"/opt/ml/processing/output/{channel['name']}/",
+                    destination=channel['s3_uri'],
+                    s3_upload_mode='Continuous' if channel.get('continuous', False) else 'EndOfJob',
+                ))
+
+        return outputs
\ No newline at end of file
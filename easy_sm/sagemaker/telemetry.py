@@ -0,0 +1,117 @@
+import json
+from datetime import datetime, timezone
+from easy_sm.sagemaker.instance_types import price_per_hour
+
+
+def _seconds(start, end):
+    return round((end - start).total_seconds(), 1) if start and end else None
+
+
+def _phases(transitions, end_time):
+    """Seconds spent in each secondary status, e.g. Starting, Downloading, Training, Uploading"""
+    phases = {}
+    for transition in transitions:
+        duration = _seconds(transition['StartTime'], transition.get('EndTime') or end_time)
+        if duration is not None:
+            phases[transition['Status']] = phases.get(transition['Status'], 0) + duration
+
+    return phases
+
+
+def job_metrics(job_type, job_description):
+    """
+    Extract timing and cost metrics from a finished SageMaker job
+    :param job_type: [str], one of 'training', 'processing', 'transform'
+    :param job_description: [dict], response of describe_training_job, describe_processing_job or
+    describe_transform_job
+    :return: [dict], metrics record
+    """
+    if job_type == 'training':
+        job_name = job_description['TrainingJobName']
+        status = job_description['TrainingJobStatus']
+        instance_type = job_description['ResourceConfig']['InstanceType']
+        instance_count = job_description['ResourceConfig']['InstanceCount']
+        started_at = job_description.get('TrainingStartTime')
+        ended_at = job_description.get('TrainingEndTime')
+        transitions = job_description.get('SecondaryStatusTransitions', [])
+        billable_seconds = job_description.get('BillableTimeInSeconds')
+        spot = job_description.get('EnableManagedSpotTraining', False)
+    elif job_type == 'processing':
+        job_name = job_description['ProcessingJobName']
+        status = job_description['ProcessingJobStatus']
+        instance_type = job_description['ProcessingResources']['ClusterConfig']['InstanceType']
+        instance_count = job_description['ProcessingResources']['ClusterConfig']['InstanceCount']
+        started_at = job_description.get('ProcessingStartTime')
+        ended_at = job_description.get('ProcessingEndTime')
+        transitions = []
+        billable_seconds = None
+        spot = False
+    elif job_type == 'transform':
+        job_name = job_description['TransformJobName']
+        status = job_description['TransformJobStatus']
+        instance_type = job_description['TransformResources']['InstanceType']
+        instance_count = job_description['TransformResources']['InstanceCount']
+        started_at = job_description.get('TransformStartTime')
+        ended_at = job_description.get('TransformEndTime')
+        transitions = []
+        billable_seconds = None
+        spot = False
+    else:
+        raise ValueError("Unknown job type: {}".format(job_type))
+
+    created_at = job_description['CreationTime']
+    if billable_seconds is None:
+        billable_seconds = _seconds(started_at, ended_at)
+
+    price = price_per_hour(instance_type)
+    estimated_cost = None
+    if price is not None and billable_seconds is not None:
+        estimated_cost = round(billable_seconds * instance_count * price / 3600, 4)
+
+    return {
+        'recorded_at': datetime.now(timezone.utc).isoformat(),
+        'job_type': job_type,
+        'job_name': job_name,
+        'status': status,
+        'instance_type': instance_type,
+        'instance_count': instance_count,
+        'spot': spot,
+        'created_at': created_at.isoformat(),
+        'started_at': started_at.isoformat() if started_at else None,
+        'ended_at': ended_at.isoformat() if ended_at else None,
+        'provisioning_seconds': _seconds(created_at, started_at),
+        'run_seconds': _seconds(started_at, ended_at),
+        'phases': _phases(transitions, ended_at),
+        'billable_seconds': billable_seconds,
+        'usd_per_instance_hour': price,
+        # billable seconds x instance count at the on-demand price. SageMaker already discounts the billable time
+        # of spot training jobs by the spot savings, so this is their cost too. Without a recorded billable time
+        # the run time is used, an upper bound for spot jobs
+        'estimated_cost_usd': estimated_cost,
+    }
+
+
+def emit(record, metrics_file=None):
+    """
+    Append a metrics record as a json line to the metrics file and print a summary
+    :param record: [dict], metrics record from job_metrics
+    :param metrics_file: [optional[str]], path of the json lines file to append to
+    """
+    if metrics_file:
+        with open(metrics_file, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+
+    phases = ', '.join('{} {:.0f}s'.format(k, v) for k, v in record['phases'].items())
+    cost = record['estimated_cost_usd']
+    print("{} job {} {}: provisioning {}s, run {}s{}, billable {}s on {} x {}, estimated cost {}".format(
+        record['job_type'].capitalize(),
+        record['job_name'],
+        record['status'],
+        record['provisioning_seconds'],
+        record['run_seconds'],
+        ' ({})'.format(phases) if phases else '',
+        record['billable_seconds'],
+        record['instance_count'],
+        record['instance_type'],
+        '${:.4f}'.format(cost) if cost is not None else 'unknown'
+    ))
@@ -2,8 +2,18 @@
 # Order of operations is important since when invoked from sagemaker for serving no argument is passed
 # For training, train argument is passed by default from sagemaker
 # Process is handled differently by overriding entrypoint during job definitions
+
+# Code uploaded with --code-overlay replaces the code in the image, except for this script which is running
+for overlay in /opt/ml/input/data/code/*.tar.gz /opt/ml/processing/easy_sm_code/*.tar.gz; do
+    if [ -f "${overlay}" ]; then
+        # -m gives files the current time, so compiled code from the image is not mistaken as up to date
+        tar -xzmf "${overlay}" --exclude=easy_sm_base/executor.sh -C .
+    fi
+done
+
 if [ $1 = "train" ]; then
-    python ./easy_sm_base/training/train
+    shift
+    python ./easy_sm_base/training/train "$@"
 elif [ $1 = "process" ]; then
     cd ./easy_sm_base/processing
     python $2
@@ -3,5 +3,13 @@
 test_path=$1
 tag=$2
 image=$3
+shift 3
 
-docker run -it -v ${test_path}:/opt/ml -p 8080:8080 --rm "${image}:${tag}" serve
+# Only attach a terminal when there is one, so the container can also be started from scripts
+interactive=""
+if [ -t 0 ]; then
+    interactive="-it"
+fi
+
+# Any remaining arguments are passed on as docker run options
+docker run "$@" ${interactive} -v ${test_path}:/opt/ml -p 8080:8080 --rm "${image}:${tag}" serve
@@ -6,5 +6,7 @@ image=$3
 file=$4
 aws_profile=$5
 aws_region=$6
+shift 6
 
-docker run -v ~/.aws:/root/.aws -v ${test_path}:/opt/ml -e AWS_PROFILE=${aws_profile} -e AWS_DEFAULT_REGION=${aws_region} --rm "${image}:${tag}" process ${file}
\ No newline at end of file
+# Any remaining arguments are passed on as docker run options
+docker run "$@" -v ~/.aws:/root/.aws -v ${test_path}:/opt/ml -e AWS_PROFILE=${aws_profile} -e AWS_DEFAULT_REGION=${aws_region} --rm "${image}:${tag}" process ${file}
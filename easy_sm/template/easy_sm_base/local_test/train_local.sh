@@ -3,5 +3,7 @@
 test_path=$1
 tag=$2
 image=$3
+shift 3
 
-docker run -v ${test_path}:/opt/ml --rm "${image}:${tag}" train
+# Any remaining arguments are passed on as docker run options
+docker run "$@" -v ${test_path}:/opt/ml --rm "${image}:${tag}" train
@@ -0,0 +1,252 @@
+"""
+Request metrics of the serving app in Prometheus text format, optional structured request logs and
+an opt-in sampling profiler.
+
+When neither metrics nor profiling are enabled every request gets the same no-op timer, so the
+instrumentation costs a few attribute lookups per request.
+"""
+import os
+import sys
+import json
+import time
+import bisect
+import cProfile
+import threading
+
+STAGES = ('decode', 'parse', 'predict', 'encode', 'load_model')
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (100, 1000, 10 ** 4, 10 ** 5, 10 ** 6, 6 * 10 ** 6)
+
+
+class Histogram(object):
+    def __init__(self, buckets):
+        """
+        :param buckets: [tuple], upper bounds of the buckets in increasing order
+        """
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.sum += value
+
+    def render(self, name, labels=''):
+        """Prometheus text format lines of the histogram, with cumulative bucket counts"""
+        with self._lock:
+            counts, total = list(self.counts), self.sum
+        separator = ',' if labels else ''
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), counts):
+            cumulative += count
+            lines.append('{}_bucket{{{}{}le="{}"}} {}'.format(name, labels, separator, bound, cumulative))
+        lines.append('{}_sum{} {}'.format(name, '{' + labels + '}' if labels else '', total))
+        lines.append('{}_count{} {}'.format(name, '{' + labels + '}' if labels else '', cumulative))
+        return lines
+
+
+class _NullContext(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+class _NullTimer(_NullContext):
+    """Timer handed out when metrics and profiling are disabled"""
+    status = None
+    response_bytes = 0
+    _stage = _NullContext()
+
+    def stage(self, name):
+        return self._stage
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Stage(object):
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *args):
+        self.timer.seconds[self.name] = self.timer.seconds.get(self.name, 0) + time.perf_counter() - self.start
+        return False
+
+
+class RequestTimer(object):
+    """Times the stages of one request, recorded in ServeMetrics when the request ends"""
+    def __init__(self, metrics, request_bytes, profile_path=None):
+        self.metrics = metrics
+        self.request_bytes = request_bytes
+        self.response_bytes = 0
+        self.status = None
+        self.seconds = {}
+        self.profile_path = profile_path
+        self._profiler = None
+
+    def stage(self, name):
+        """
+        Time a stage of the request, e.g. with timer.stage('parse'): ...
+        :param name: [str], name of the stage, see STAGES
+        """
+        return _Stage(self, name)
+
+    def __enter__(self):
+        if self.profile_path:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        self.start = time.perf_counter()
+        self.metrics.request_started()
+        return self
+
+    def __exit__(self, exc_type, *args):
+        self.seconds['total'] = time.perf_counter() - self.start
+        if self._profiler is not None:
+            self._profiler.disable()
+            self._profiler.dump_stats(self.profile_path)
+            self.metrics.profile_finished()
+        if exc_type is not None:
+            self.status = 500
+        self.metrics.request_finished(self)
+        return False
+
+
+class ServeMetrics(object):
+    def __init__(self, enabled=False, log_json=False, profile_every=0, profile_dir='/opt/ml/output/profiles'):
+        """
+        :param enabled: [bool, default=False], collect request metrics
+        :param log_json: [bool, default=False], print a json line with the stage timings of every request
+        :param profile_every: [int, default=0], profile every n-th request with cProfile, 0 disables profiling
+        :param profile_dir: [str, default='/opt/ml/output/profiles'], directory profiles are written to
+        """
+        self.enabled = enabled or log_json
+        self.log_json = log_json
+        self.profile_every = profile_every
+        self.profile_dir = profile_dir
+        self.stage_seconds = {stage: Histogram(LATENCY_BUCKETS) for stage in STAGES + ('total',)}
+        self.request_bytes = Histogram(SIZE_BUCKETS)
+        self.response_bytes = Histogram(SIZE_BUCKETS)
+        self.responses = {}  # status code -> count
+        self.in_flight = 0
+        self.model_load_seconds = None
+        self._requests = 0
+        self._profiling = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """Configure from EASY_SM_METRICS, EASY_SM_METRICS_LOG and EASY_SM_PROFILE_EVERY"""
+        return cls(
+            enabled=os.environ.get('EASY_SM_METRICS', '').lower() == 'true',
+            log_json=os.environ.get('EASY_SM_METRICS_LOG', '').lower() == 'true',
+            profile_every=int(os.environ.get('EASY_SM_PROFILE_EVERY', 0)),
+            profile_dir=os.environ.get('EASY_SM_PROFILE_DIR', '/opt/ml/output/profiles')
+        )
+
+    def track_request(self, request_bytes):
+        """
+        Timer of a request, use as a context manager around handling the request
+        :param request_bytes: [int], size of the request body
+        :return: [RequestTimer], or a no-op timer if metrics and profiling are disabled
+        """
+        if not self.enabled and not self.profile_every:
+            return _NULL_TIMER
+
+        profile_path = None
+        with self._lock:
+            self._requests += 1
+            # One profile at a time, the profiler only sees the thread handling the request
+            if self.profile_every and self._requests % self.profile_every == 0 and not self._profiling:
+                self._profiling = True
+                os.makedirs(self.profile_dir, exist_ok=True)
+                profile_path = os.path.join(self.profile_dir, 'request-{}.prof'.format(self._requests))
+
+        if not self.enabled:
+            return _ProfileOnlyTimer(self, profile_path) if profile_path else _NULL_TIMER
+        return RequestTimer(self, request_bytes, profile_path)
+
+    def request_started(self):
+        if self.enabled:
+            with self._lock:
+                self.in_flight += 1
+
+    def request_finished(self, timer):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.in_flight -= 1
+            self.responses[timer.status] = self.responses.get(timer.status, 0) + 1
+        for stage, seconds in timer.seconds.items():
+            self.stage_seconds[stage].observe(seconds)
+        self.request_bytes.observe(timer.request_bytes)
+        self.response_bytes.observe(timer.response_bytes)
+        if self.log_json:
+            print(json.dumps({
+                'event': 'request',
+                'status': timer.status,
+                'request_bytes': timer.request_bytes,
+                'response_bytes': timer.response_bytes,
+                'seconds': {stage: round(seconds, 6) for stage, seconds in timer.seconds.items()},
+            }), file=sys.stdout, flush=True)
+
+    def profile_finished(self):
+        with self._lock:
+            self._profiling = False
+
+    def render(self, extra_gauges=None):
+        """
+        All metrics in Prometheus text format
+        :param extra_gauges: [optional[dict]], more gauges to include, name -> value
+        :return: [str]
+        """
+        lines = []
+        if self.model_load_seconds is not None:
+            lines += ['# TYPE easy_sm_model_load_seconds gauge',
+                      'easy_sm_model_load_seconds {}'.format(self.model_load_seconds)]
+        for name, value in (extra_gauges or {}).items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                lines += ['# TYPE {} gauge'.format(name), '{} {}'.format(name, value)]
+
+        if self.enabled:
+            with self._lock:
+                in_flight, responses = self.in_flight, dict(self.responses)
+            lines += ['# TYPE easy_sm_requests_in_flight gauge', 'easy_sm_requests_in_flight {}'.format(in_flight)]
+            lines.append('# TYPE easy_sm_responses_total counter')
+            lines += ['easy_sm_responses_total{{status="{}"}} {}'.format(status, count)
+                      for status, count in sorted(responses.items(), key=lambda item: str(item[0]))]
+            lines.append('# TYPE easy_sm_stage_seconds histogram')
+            for stage, histogram in self.stage_seconds.items():
+                lines += histogram.render('easy_sm_stage_seconds', 'stage="{}"'.format(stage))
+            lines.append('# TYPE easy_sm_request_bytes histogram')
+            lines += self.request_bytes.render('easy_sm_request_bytes')
+            lines.append('# TYPE easy_sm_response_bytes histogram')
+            lines += self.response_bytes.render('easy_sm_response_bytes')
+
+        return '\n'.join(lines) + '\n'
+
+
+class _ProfileOnlyTimer(_NullTimer):
+    """Profiles a request without collecting metrics"""
+    def __init__(self, metrics, profile_path):
+        self.metrics = metrics
+        self.profile_path = profile_path
+
+    def __enter__(self):
+        self._profiler = cProfile.Profile()
+        self._profiler.enable()
+        return self
+
+    def __exit__(self, *args):
+        self._profiler.disable()
+        self._profiler.dump_stats(self.profile_path)
+        self.metrics.profile_finished()
+        return False
@@ -0,0 +1,172 @@
+"""
+In-memory LRU cache of models for multi model endpoints.
+
+The cache is bounded by the size of the model files on disk, which is used as an estimate of the
+memory a loaded model takes. Concurrent requests for a model that is not loaded yet wait for a
+single load instead of loading it several times.
+"""
+import os
+import sys
+import time
+import shutil
+import tarfile
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+def model_size_bytes(model_dir):
+    """
+    Total size of files in a model directory
+    :param model_dir: [str], model directory
+    :return: [int], size in bytes
+    """
+    return sum(
+        os.path.getsize(os.path.join(root, f))
+        for root, _, files in os.walk(model_dir) for f in files
+    )
+
+
+def default_max_bytes(fraction=0.5):
+    """
+    Fraction of the memory available to the container
+    :param fraction: [float, default=0.5], fraction of memory to use for the cache
+    :return: [int], size in bytes
+    """
+    try:
+        with open('/sys/fs/cgroup/memory.max') as f:
+            limit = f.read().strip()
+        if limit != 'max':
+            return int(int(limit) * fraction)
+    except OSError:
+        pass
+
+    return int(os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') * fraction)
+
+
+def _extract(model_path):
+    """Extract a model.tar.gz into a temporary directory, directories are returned as they are"""
+    if not model_path.endswith('.tar.gz'):
+        return model_path
+
+    model_dir = tempfile.mkdtemp(prefix='easy_sm_model_')
+    with tarfile.open(model_path) as tar:
+        tar.extractall(model_dir)
+    return model_dir
+
+
+class ModelCache(object):
+    def __init__(self, load_fn, max_bytes):
+        """
+        :param load_fn: [callable], loads a model given its model directory, e.g. model_fn
+        :param max_bytes: [int], maximum total size of loaded models
+        """
+        self._load_fn = load_fn
+        self.max_bytes = max_bytes
+        self._models = OrderedDict()  # name -> (model, size in bytes, model directory)
+        self._loading = {}  # name -> threading.Event set once loading has finished
+        self._errors = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.load_errors = 0
+        self.load_seconds = 0.0
+        self.evictions = 0
+
+    def get(self, name, model_path):
+        """
+        Get a model, loading it if it is not in the cache
+        :param name: [str], name of the model
+        :param model_path: [str], model directory or model.tar.gz to load the model from
+        :return: the loaded model
+        """
+        while True:
+            with self._lock:
+                if name in self._models:
+                    self._models.move_to_end(name)
+                    self.hits += 1
+                    return self._models[name][0]
+
+                loading = self._loading.get(name)
+                if loading is None:
+                    self.misses += 1
+                    loading = self._loading[name] = threading.Event()
+                    break
+
+            # Another request is loading this model, wait for it
+            loading.wait()
+            with self._lock:
+                if name in self._errors:
+                    raise self._errors[name]
+
+        try:
+            start = time.perf_counter()
+            model_dir = _extract(model_path)
+            size = model_size_bytes(model_dir)
+            model = self._load_fn(model_dir)
+            model_dir = model_dir if model_dir != model_path else None
+            elapsed = time.perf_counter() - start
+        except Exception as e:
+            with self._lock:
+                self.load_errors += 1
+                self._errors[name] = e
+                del self._loading[name]
+            loading.set()
+            raise
+
+        with self._lock:
+            self.loads += 1
+            self.load_seconds += elapsed
+            self._errors.pop(name, None)
+            self._models[name] = (model, size, model_dir)
+            self._evict_to_fit()
+            del self._loading[name]
+        loading.set()
+        print('Loaded model {} ({} bytes) in {:.2f}s'.format(name, size, elapsed), file=sys.stderr)
+
+        return model
+
+    def _evict_to_fit(self):
+        """Evict least recently used models until the cache fits, always keeping the most recent one"""
+        while len(self._models) > 1 and self.size_bytes() > self.max_bytes:
+            name, (_, size, model_dir) = self._models.popitem(last=False)
+            self.evictions += 1
+            if model_dir:
+                shutil.rmtree(model_dir, ignore_errors=True)
+            print('Evicted model {} ({} bytes)'.format(name, size), file=sys.stderr)
+
+    def evict(self, name):
+        """
+        Remove a model from the cache
+        :param name: [str], name of the model
+        :return: [bool], True if the model was in the cache
+        """
+        with self._lock:
+            if name not in self._models:
+                return False
+            _, _, model_dir = self._models.pop(name)
+        if model_dir:
+            shutil.rmtree(model_dir, ignore_errors=True)
+        return True
+
+    def __contains__(self, name):
+        with self._lock:
+            return name in self._models
+
+    def size_bytes(self):
+        return sum(size for _, size, _ in self._models.values())
+
+    def stats(self):
+        with self._lock:
+            return {
+                'models': len(self._models),
+                'size_bytes': self.size_bytes(),
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'loads': self.loads,
+                'load_errors': self.load_errors,
+                'load_seconds': round(self.load_seconds, 3),
+                'evictions': self.evictions,
+            }
@@ -0,0 +1,39 @@
+"""
+Helpers to load large models without reading them fully into memory.
+
+Memory mapped files are paged in from disk on first access and shared between processes,
+so loading is near instant and memory is only used for the parts of the model actually read.
+"""
+import mmap
+
+
+def mmap_file(path):
+    """
+    Memory map a file read only
+    :param path: [str], file path
+    :return: [mmap.mmap], bytes-like view of the file
+    """
+    with open(path, 'rb') as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def load_numpy(path):
+    """
+    Load a .npy array memory mapped
+    :param path: [str], file path
+    :return: [numpy.memmap], read only array
+    """
+    import numpy as np
+    return np.load(path, mmap_mode='r')
+
+
+def load_joblib(path):
+    """
+    Load an object saved with joblib.dump, with any numpy arrays in it memory mapped.
+    Only arrays of uncompressed dumps (compress=0, the default) can be memory mapped.
+    :param path: [str], file path
+    :return: the loaded object
+    """
+    import joblib
+    return joblib.load(path, mmap_mode='r')
+
@@ -0,0 +1,139 @@
+"""
+Row level cache of predictions for deterministic models.
+
+Each input row is normalised (whitespace stripped, numbers in canonical form) and hashed together
+with the model version. Only rows missing from the cache are passed to the model, so this is only
+valid if the prediction of a row does not depend on the other rows of the request.
+"""
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def normalise_row(row):
+    """
+    Canonical form of a CSV row, so that e.g. '1.0, 2' and '1,2.00' are the same row
+    :param row: [str], CSV row without line ending
+    :return: [str], normalised row
+    """
+    fields = []
+    for field in row.split(','):
+        field = field.strip()
+        try:
+            field = repr(float(field))
+        except ValueError:
+            pass
+        fields.append(field)
+
+    return ','.join(fields)
+
+
+class ResponseCache(object):
+    def __init__(self, max_entries=100000, ttl_seconds=3600):
+        """
+        :param max_entries: [int, default=100000], maximum number of cached predictions
+        :param ttl_seconds: [float, default=3600], seconds a cached prediction is valid for
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (prediction, expiry time)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def key(row, model_version):
+        """
+        Cache key of a row
+        :param row: [str], CSV row without line ending
+        :param model_version: [str], version of the model making the prediction
+        :return: [bytes], key
+        """
+        return hashlib.blake2b((model_version + '\0' + normalise_row(row)).encode('utf-8'), digest_size=16).digest()
+
+    def get_many(self, keys):
+        """
+        Look up cached predictions
+        :param keys: [list[bytes]], keys from ResponseCache.key
+        :return: [dict], key -> prediction for the keys found in the cache
+        """
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and entry[1] <= now:
+                    del self._entries[key]
+                    self.expirations += 1
+                    entry = None
+                if entry is None:
+                    self.misses += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    found[key] = entry[0]
+
+        return found
+
+    def set_many(self, items):
+        """
+        Cache predictions, evicting the least recently used ones beyond max_entries
+        :param items: [iterable], of (key, prediction) tuples
+        """
+        expiry = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            for key, prediction in items:
+                self._entries[key] = (prediction, expiry)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def record_bypass(self):
+        with self._lock:
+            self.bypasses += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'bypasses': self.bypasses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+
+def predict_rows(cache, rows, model_version, predict_fn):
+    """
+    Predict CSV rows, only passing rows missing from the cache to the model
+    :param cache: [ResponseCache], the cache
+    :param rows: [list[str]], CSV rows without line endings
+    :param model_version: [str], version of the model making the prediction
+    :param predict_fn: [callable], predicts a list of CSV rows, returning one prediction per row
+    :return: [list], one prediction per row
+    """
+    keys = [cache.key(row, model_version) for row in rows]
+    found = cache.get_many(keys)
+
+    # Rows repeated within the request are only predicted once
+    missing = OrderedDict()
+    for key, row in zip(keys, rows):
+        if key not in found:
+            missing.setdefault(key, row)
+    if missing:
+        predictions = predict_fn(list(missing.values()))
+        computed = dict(zip(missing.keys(), predictions))
+        cache.set_many(computed.items())
+        found.update(computed)
+
+    return [found[key] for key in keys]
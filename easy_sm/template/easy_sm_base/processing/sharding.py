@@ -0,0 +1,91 @@
+"""
+Helpers for processing jobs running on more than one instance.
+
+SageMaker describes the cluster a processing job runs on in /opt/ml/config/resourceconfig.json.
+With --input-sharded every instance receives a different subset of the input files, use rank()
+and world_size() to coordinate and part_path() to write outputs that do not collide across instances.
+
+    from sharding import rank, world_size, map_files, part_path
+
+    for path, result in map_files(process_file):
+        ...
+    result_df.to_csv(part_path('results.csv'))
+"""
+import os
+import json
+import glob
+from concurrent.futures import ProcessPoolExecutor
+
+RESOURCE_CONFIG_PATH = '/opt/ml/config/resourceconfig.json'
+INPUT_PATH = '/opt/ml/processing/input'
+OUTPUT_PATH = '/opt/ml/processing/output'
+
+
+def resource_config(path=RESOURCE_CONFIG_PATH):
+    """
+    Read the cluster configuration of the job
+    :param path: [str], path to resourceconfig.json
+    :return: [dict], with 'current_host' and 'hosts'. A single host when not running in a cluster
+    """
+    if not os.path.isfile(path):
+        return {'current_host': 'algo-1', 'hosts': ['algo-1']}
+
+    with open(path) as f:
+        return json.load(f)
+
+
+def rank():
+    """Index of the current instance in the cluster, from 0 to world_size() - 1"""
+    config = resource_config()
+    # resourceconfig.json lists hosts in SageMaker's order, sorting would put algo-10 before algo-2
+    return config['hosts'].index(config['current_host'])
+
+
+def world_size():
+    """Number of instances in the cluster"""
+    return len(resource_config()['hosts'])
+
+
+def list_files(input_path=INPUT_PATH, pattern='**/*', shard=False):
+    """
+    List input files in a stable order
+    :param input_path: [str], directory to list files in
+    :param pattern: [str], glob pattern relative to input_path
+    :param shard: [bool, default=False], only return every world_size()-th file starting at rank().
+    Useful when input is replicated to all instances rather than sharded by SageMaker
+    :return: [list[str]], file paths
+    """
+    files = sorted(f for f in glob.glob(os.path.join(input_path, pattern), recursive=True) if os.path.isfile(f))
+    if shard:
+        files = files[rank()::world_size()]
+
+    return files
+
+
+def map_files(fn, input_path=INPUT_PATH, pattern='**/*', shard=False, processes=None, chunksize=1):
+    """
+    Apply a function to input files in parallel using all cores of the instance
+    :param fn: [callable], picklable (module level) function taking a file path
+    :param input_path: [str], directory to list files in
+    :param pattern: [str], glob pattern relative to input_path
+    :param shard: [bool, default=False], see list_files
+    :param processes: [optional[int]], number of worker processes, defaults to number of cores
+    :param chunksize: [int, default=1], number of files sent to a worker at a time
+    :return: [generator], of (file path, result) tuples in file order
+    """
+    files = list_files(input_path, pattern, shard)
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        for path, result in zip(files, pool.map(fn, files, chunksize=chunksize)):
+            yield path, result
+
+
+def part_path(file_name, output_path=OUTPUT_PATH):
+    """
+    Path of this instance's part of an output file, e.g. results.csv -> results-part-00001.csv on rank 1
+    :param file_name: [str], name of the output file
+    :param output_path: [str], directory to write the output to
+    :return: [str], file path
+    """
+    root, ext = os.path.splitext(file_name)
+    os.makedirs(output_path, exist_ok=True)
+    return os.path.join(output_path, '{}-part-{:05d}{}'.format(root, rank(), ext))
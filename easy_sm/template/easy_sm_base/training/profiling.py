@@ -0,0 +1,216 @@
+"""
+Opt-in profiling of training: samples CPU, memory, disk and network usage at intervals and,
+optionally, the Python stack of the training thread.
+
+Everything is written to a directory under /opt/ml/output/data so it is uploaded to S3 with the
+job output:
+    resource_usage.jsonl  one json line per resource sample
+    stacks.folded         sampled stacks in folded format, for flamegraph.pl or speedscope
+    report.json           summary of the above
+"""
+import os
+import sys
+import json
+import time
+import threading
+from collections import Counter
+
+
+def _read_cpu_times():
+    """Busy and total jiffies of all cpus from /proc/stat"""
+    with open('/proc/stat') as f:
+        fields = [int(v) for v in f.readline().split()[1:]]
+    idle = fields[3] + fields[4]  # idle + iowait
+    return sum(fields) - idle, sum(fields)
+
+
+def _read_memory_bytes():
+    """Memory used by the container, from its cgroup if available, else RSS of this process"""
+    for path in ('/sys/fs/cgroup/memory.current', '/sys/fs/cgroup/memory/memory.usage_in_bytes'):
+        try:
+            with open(path) as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            pass
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def _read_disk_bytes():
+    """Bytes read and written on whole disks since boot, from /proc/diskstats"""
+    read = written = 0
+    with open('/proc/diskstats') as f:
+        for line in f:
+            fields = line.split()
+            # Skip partitions and virtual devices, their io is already counted on the disk
+            device = fields[2]
+            if device.startswith(('loop', 'ram')) or os.path.exists('/sys/class/block/{}/partition'.format(device)):
+                continue
+            read += int(fields[5]) * 512
+            written += int(fields[9]) * 512
+    return read, written
+
+
+def _read_network_bytes():
+    """Bytes received and sent on all interfaces but loopback, from /proc/net/dev"""
+    received = sent = 0
+    with open('/proc/net/dev') as f:
+        for line in f.readlines()[2:]:
+            interface, counters = line.split(':', 1)
+            if interface.strip() == 'lo':
+                continue
+            counters = counters.split()
+            received += int(counters[0])
+            sent += int(counters[8])
+    return received, sent
+
+
+class ResourceSampler(object):
+    """Samples resource usage every interval seconds in a background thread"""
+    def __init__(self, output_path, interval=1.0):
+        """
+        :param output_path: [str], json lines file to write samples to
+        :param interval: [float, default=1.0], seconds between samples
+        """
+        self.output_path = output_path
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        start = time.monotonic()
+        cpu = _read_cpu_times()
+        disk = _read_disk_bytes()
+        network = _read_network_bytes()
+        with open(self.output_path, 'w') as f:
+            while not self._stop.wait(self.interval):
+                new_cpu, new_disk, new_network = _read_cpu_times(), _read_disk_bytes(), _read_network_bytes()
+                sample = {
+                    'seconds': round(time.monotonic() - start, 2),
+                    'cpu_percent': round(100 * (new_cpu[0] - cpu[0]) / max(1, new_cpu[1] - cpu[1]), 1),
+                    'memory_mb': round(_read_memory_bytes() / 2 ** 20, 1),
+                    'disk_read_mb_s': round((new_disk[0] - disk[0]) / 2 ** 20 / self.interval, 2),
+                    'disk_write_mb_s': round((new_disk[1] - disk[1]) / 2 ** 20 / self.interval, 2),
+                    'network_rx_mb_s': round((new_network[0] - network[0]) / 2 ** 20 / self.interval, 2),
+                    'network_tx_mb_s': round((new_network[1] - network[1]) / 2 ** 20 / self.interval, 2),
+                }
+                cpu, disk, network = new_cpu, new_disk, new_network
+                self.samples.append(sample)
+                f.write(json.dumps(sample) + '\n')
+                f.flush()
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def summary(self):
+        """Mean and maximum of every resource"""
+        if not self.samples:
+            return {}
+        return {
+            key: {
+                'mean': round(sum(s[key] for s in self.samples) / len(self.samples), 2),
+                'max': max(s[key] for s in self.samples),
+            }
+            for key in self.samples[0] if key != 'seconds'
+        }
+
+
+class StackSampler(object):
+    """Samples the Python stack of a thread every interval seconds, a low overhead alternative to cProfile"""
+    def __init__(self, thread_id, interval=0.01):
+        """
+        :param thread_id: [int], ident of the thread to sample
+        :param interval: [float, default=0.01], seconds between samples
+        """
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append('{} ({}:{})'.format(code.co_name, os.path.basename(code.co_filename),
+                                                 code.co_firstlineno))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write_folded(self, path):
+        """Write stacks in folded format: one 'frame;frame;frame count' line per distinct stack"""
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write('{} {}\n'.format(stack, count))
+
+    def top_functions(self, n=10):
+        """Functions the sampled thread was most often executing, with their share of samples"""
+        total = sum(self.stacks.values())
+        own = Counter()
+        for stack, count in self.stacks.items():
+            own[stack.rsplit(';', 1)[-1]] += count
+        return [{'function': function, 'percent': round(100 * count / total, 1)}
+                for function, count in own.most_common(n)]
+
+
+def profile(fn, output_dir, interval=1.0, sample_stacks=True, stack_interval=0.01):
+    """
+    Run a function while profiling resource usage and, optionally, its Python stack
+    :param fn: [callable], function to run without arguments
+    :param output_dir: [str], directory to write the profile to
+    :param interval: [float, default=1.0], seconds between resource samples
+    :param sample_stacks: [bool, default=True], sample the stack of the thread running fn
+    :param stack_interval: [float, default=0.01], seconds between stack samples
+    :return: the return value of fn
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    resource_sampler = ResourceSampler(os.path.join(output_dir, 'resource_usage.jsonl'), interval)
+    stack_sampler = StackSampler(threading.get_ident(), stack_interval) if sample_stacks else None
+
+    start = time.monotonic()
+    resource_sampler.start()
+    if stack_sampler:
+        stack_sampler.start()
+    try:
+        return fn()
+    finally:
+        if stack_sampler:
+            stack_sampler.stop()
+        resource_sampler.stop()
+
+        report = {'seconds': round(time.monotonic() - start, 2), 'resources': resource_sampler.summary()}
+        if stack_sampler:
+            stack_sampler.write_folded(os.path.join(output_dir, 'stacks.folded'))
+            report['top_functions'] = stack_sampler.top_functions()
+        report['summary'] = _summary_lines(report, output_dir)
+        with open(os.path.join(output_dir, 'report.json'), 'w') as f:
+            json.dump(report, f, indent=4)
+        print('\n'.join(report['summary']))
+
+
+def _summary_lines(report, output_dir):
+    lines = ['Training profile ({} seconds), written to {}'.format(report['seconds'], output_dir)]
+    for resource, stats in report['resources'].items():
+        lines.append('  {:<16} mean {:>9} max {:>9}'.format(resource, stats['mean'], stats['max']))
+    if report.get('top_functions'):
+        lines.append('  Most sampled functions:')
+        lines += ['  {:>6}% {}'.format(f['percent'], f['function']) for f in report['top_functions']]
+    return lines
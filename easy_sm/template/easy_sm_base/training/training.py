@@ -1,10 +1,14 @@
-def train(input_data_path, model_save_path):
+def train(input_data_path, model_save_path, checkpoint_path=None):
     """
     The function to execute the training.
 
     :param input_data_path: [str], input directory path where all the training file(s) reside in
     :param model_save_path: [str], directory path to save your model(s)
+    :param checkpoint_path: [str], directory path to save checkpoints to. On spot training it is
+    synced to S3 and restored when an interrupted job restarts, so resume from any checkpoint found here
     """
     # TODO: Write your modeling logic
 
+    # TODO: (optional) periodically save checkpoints under 'checkpoint_path' and resume from the latest one
+
     # TODO: save the model(s) under 'model_save_path'
@@ -11,7 +11,8 @@ Recommended to validate before updating.
     author='Prateek',
     author_email='prteek@icloud.com',
     version="0.1.8",
-    python_requires='>=3.11',
+    # tarfile extraction filters, used to extract downloaded archives safely, came in 3.11.4
+    python_requires='>=3.11.4',
     packages=find_packages(where='.'),
     package_data={
         'easy_sm': [
@@ -26,6 +27,7 @@ Recommended to validate before updating.
             'template/easy_sm_base/local_test/*.sh',
             'template/easy_sm_base/local_test/test_dir/output/.gitkeep',
             'template/easy_sm_base/local_test/test_dir/model/.gitkeep',
+            'template/easy_sm_base/local_test/test_dir/checkpoints/.gitkeep',
             'template/easy_sm_base/local_test/test_dir/input/data/training/.gitkeep'
         ]
     },
@@ -34,6 +36,13 @@ Recommended to validate before updating.
         'docker>=7.1.0, <7.2.0',
         'sagemaker>=2.226.0, <2.228.0',
     ],
+    extras_require={
+        # Converting CSV into Parquet (prepare-data, upload-data --prepare) and reading Parquet files.
+        # pyarrow 26 requires NumPy 2, which the sagemaker SDK doesn't support
+        'data': ['pyarrow>=14.0.1, <26'],
+        # benchmarks/, the S3 stand-in of upload_data.py is a moto server, a flask app
+        'bench': ['moto[server]>=5.0.0, <6', 'flask>=3.0.0, <4'],
+    },
     entry_points={
         'console_scripts': [
             'easy_sm=easy_sm.__main__:cli',
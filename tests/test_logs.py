@@ -0,0 +1,124 @@
+import threading
+
+from botocore.exceptions import ClientError
+
+from easy_sm.sagemaker.logs import LogTailer, LOG_GROUPS
+
+LOG_GROUP = LOG_GROUPS['training']
+
+
+class FakeLogsClient(object):
+    """
+    In memory stand-in for the CloudWatch logs client, paginating like the service: describe_log_streams
+    returns nextToken until the last page, get_log_events returns the token it was given as nextForwardToken
+    once the end of the stream is reached
+    """
+    def __init__(self, streams=None, streams_per_page=50, events_per_page=10000, group_exists=True):
+        self.streams = {name: list(events) for name, events in (streams or {}).items()}
+        self.streams_per_page = streams_per_page
+        self.events_per_page = events_per_page
+        self.group_exists = group_exists
+        self.describe_calls = 0
+        self._lock = threading.Lock()
+
+    def add(self, stream_name, timestamp, message):
+        with self._lock:
+            self.streams.setdefault(stream_name, []).append((timestamp, message))
+
+    def describe_log_streams(self, logGroupName, logStreamNamePrefix, nextToken=None):
+        with self._lock:
+            self.describe_calls += 1
+            if not self.group_exists:
+                raise ClientError({'Error': {'Code': 'ResourceNotFoundException', 'Message': 'no group'}},
+                                  'DescribeLogStreams')
+            names = sorted(n for n in self.streams if n.startswith(logStreamNamePrefix))
+            start = int(nextToken or 0)
+            response = {'logStreams': [{'logStreamName': n} for n in names[start:start + self.streams_per_page]]}
+            if start + self.streams_per_page < len(names):
+                response['nextToken'] = str(start + self.streams_per_page)
+            return response
+
+    def get_log_events(self, logGroupName, logStreamName, startFromHead, nextToken=None):
+        with self._lock:
+            events = self.streams[logStreamName]
+            start = int(nextToken.split('/')[1]) if nextToken else 0
+            page = events[start:start + self.events_per_page]
+            return {
+                'events': [{'timestamp': t, 'message': m} for t, m in page],
+                'nextForwardToken': 'f/{}'.format(start + len(page)),
+            }
+
+
+def test_streams_and_events_are_paginated():
+    streams = {'job/algo-{}'.format(i): [(i * 100 + j, 'm{}-{}'.format(i, j)) for j in range(25)] for i in range(5)}
+    client = FakeLogsClient(streams, streams_per_page=2, events_per_page=7)
+
+    events = list(LogTailer(client, LOG_GROUP, 'job').events())
+
+    assert len(events) == 5 * 25
+    assert {e[0] for e in events} == set(streams)
+    assert [e[1] for e in events] == sorted(t for s in streams.values() for t, _ in s)
+
+
+def test_streams_of_other_jobs_are_ignored():
+    client = FakeLogsClient({'job/algo-1': [(1, 'a')], 'job-2/algo-1': [(2, 'b')]})
+
+    assert list(LogTailer(client, LOG_GROUP, 'job').events()) == [('job/algo-1', 1, 'a')]
+
+
+def test_streams_are_interleaved_by_timestamp():
+    client = FakeLogsClient({
+        'job/algo-1': [(1, 'a'), (4, 'd'), (5, 'e')],
+        'job/algo-2': [(2, 'b'), (3, 'c'), (6, 'f')],
+    }, events_per_page=2)
+
+    events = list(LogTailer(client, LOG_GROUP, 'job', buffer_size=1).events())
+
+    assert [(e[1], e[2]) for e in events] == [(1, 'a'), (2, 'b'), (3, 'c'), (4, 'd'), (5, 'e'), (6, 'f')]
+    assert [e[0] for e in events] == ['job/algo-1', 'job/algo-2', 'job/algo-2', 'job/algo-1', 'job/algo-1',
+                                      'job/algo-2']
+
+
+def test_follow_picks_up_new_events_and_streams():
+    client = FakeLogsClient({'job/algo-1': [(1, 'a')]})
+    running = threading.Event()
+    running.set()
+    tailer = LogTailer(client, LOG_GROUP, 'job', follow=True, is_job_running=running.is_set, poll_interval=0.05)
+    events = tailer.events()
+
+    assert next(events) == ('job/algo-1', 1, 'a')
+
+    client.add('job/algo-1', 3, 'c')
+    client.add('job/algo-2', 2, 'b')
+    # Ordering across streams is best effort while following
+    assert {next(events), next(events)} == {('job/algo-1', 3, 'c'), ('job/algo-2', 2, 'b')}
+
+    running.clear()
+    assert list(events) == []
+
+
+def test_missing_log_group_yields_nothing():
+    client = FakeLogsClient(group_exists=False)
+
+    assert list(LogTailer(client, LOG_GROUP, 'job').events()) == []
+
+
+def test_follow_waits_for_log_group_to_be_created():
+    client = FakeLogsClient(group_exists=False)
+    running = threading.Event()
+    running.set()
+    tailer = LogTailer(client, LOG_GROUP, 'job', follow=True, is_job_running=running.is_set, poll_interval=0.05)
+    events = tailer.events()
+
+    def create_group():
+        # Once the tailer has polled the missing group a few times
+        while client.describe_calls < 3:
+            running.wait(0.01)
+        client.add('job/algo-1', 1, 'a')
+        client.group_exists = True
+
+    threading.Thread(target=create_group, daemon=True).start()
+    assert next(events) == ('job/algo-1', 1, 'a')
+
+    running.clear()
+    assert list(events) == []